@@ -1,5 +1,6 @@
 import streamlit as st
-from energy_dashboard import load_data
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
 import os
 from dotenv import load_dotenv
 
@@ -134,16 +135,22 @@ def authenticate(password):
 
 # Main content function
 def show_main_content():
-    # Load data once at startup
-    tetarom_df = load_data()
+    # The manifest tells whether there is data without loading it
+    site = site_selector()
+    # Pages reuse the session's handle on the data; nothing is loaded yet
+    data = data_handle(site)
+    manifest = data.manifest
 
     # Main page title with icon
     st.title("⚡ Consumption Dashboard")
 
-    if tetarom_df.empty:
+    if not manifest or not manifest['rows']:
         st.warning("No data available. Please check if the data files are present in the 'data' directory.")
         return
 
+    st.caption(f"{site.name}: {', '.join(manifest['stations'])}, "
+               f"{manifest['start'][:10]} to {manifest['end'][:10]}")
+
     # Welcome message in a card-like container
     st.markdown("""
         <div class="welcome-container">
@@ -156,6 +163,12 @@ def show_main_content():
                 <div class="feature-item">⚡ <strong>Reactive Energy Usage</strong> - Monitor reactive energy consumption</div>
                 <div class="feature-item">📈 <strong>Reactive Energy %age Usage</strong> - Track reactive energy percentage metrics</div>
                 <div class="feature-item">🔮 <strong>Forecasts</strong> - View energy consumption forecasts and predictions</div>
+                <div class="feature-item">🧮 <strong>SQL Query</strong> - Ask ad-hoc questions of the raw and forecast data</div>
+                <div class="feature-item">🩺 <strong>Data Quality</strong> - Gaps, stuck meters, spikes and other data issues</div>
+                <div class="feature-item">🔺 <strong>Peak Demand</strong> - Load-duration curves, peak intervals and monthly p95/p99 demand</div>
+                <div class="feature-item">🔁 <strong>Period Comparison</strong> - This week, month or year against earlier ones</div>
+                <div class="feature-item">🟢 <strong>Live Feed</strong> - Intervals pushed by the meter feed, as they arrive</div>
+                <div class="feature-item">🔋 <strong>Compensation</strong> - Power factor and capacitor-bank sizing</div>
             </div>
         </div>
     """, unsafe_allow_html=True)
@@ -0,0 +1,86 @@
+"""
+Cost of evaluating the alert rules on appended batches.
+
+    python -m benchmarks.alert_engine --stations 50 --rules-per-station 40 --batch-rows 1 4 96
+
+A synthetic dataset with `--stations` locations is fed to an AlertEngine with
+`--rules-per-station` rules on each (ratio limits over several windows, peaks,
+gaps), `--batch-rows` intervals at a time. For each batch size it reports the
+median milliseconds per batch early and late in the history, and the cost per rule
+and interval. No batch looks at the history; late batches only pay for trailing
+windows that are full by then.
+The last column is the time to evaluate the same rules on the whole history at
+once, what a non-incremental check would pay for every batch.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_dataset
+
+
+def make_rules(stations, per_station, seed=0):
+    from energy_dashboard.alerts import Rule
+
+    rng = np.random.default_rng(seed)
+    windows = [None, '1h', '24h', '7D']
+    rules = []
+    for station in stations:
+        for i in range(per_station):
+            kind = ('ratio', 'ratio', 'peak', 'missing')[i % 4]
+            if kind == 'ratio':
+                rules.append(Rule(f"{station}/{i}", kind, station, float(rng.uniform(0.1, 0.3)),
+                                  measure='ER+', window=windows[i // 4 % len(windows)]))
+            elif kind == 'peak':
+                rules.append(Rule(f"{station}/{i}", kind, station, float(rng.uniform(3000, 5000))))
+            else:
+                rules.append(Rule(f"{station}/{i}", kind, station, float(rng.integers(1, 8))))
+    return rules
+
+
+def per_batch_ms(engine, history, batch_rows, start, batches):
+    times = []
+    for i in range(batches):
+        batch = history.iloc[start + i * batch_rows:start + (i + 1) * batch_rows]
+        t = time.perf_counter()
+        engine.evaluate(batch)
+        times.append(time.perf_counter() - t)
+    return 1000 * statistics.median(times)
+
+
+def main():
+    from energy_dashboard.alerts import AlertEngine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, default=50)
+    parser.add_argument('--rules-per-station', type=int, default=40)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--batch-rows', type=int, nargs='+', default=[1, 4, 96])
+    parser.add_argument('--batches', type=int, default=20, help="batches timed at each end of the history")
+    args = parser.parse_args()
+
+    stations = [f'Station {i + 1}' for i in range(args.stations)]
+    history = make_dataset(args.days * 96, stations=stations)
+    rules = make_rules(stations, args.rules_per_station)
+
+    start = time.perf_counter()
+    AlertEngine(rules).evaluate(history)
+    full_ms = 1000 * (time.perf_counter() - start)
+
+    print(f"{len(rules)} rules on {args.stations} stations, {len(history)} intervals of history")
+    print(f"{'batch':>6} {'early ms':>9} {'late ms':>8} {'us/rule/row':>12} {'full history ms':>16}")
+    for batch_rows in args.batch_rows:
+        engine = AlertEngine(rules)
+        span = args.batches * batch_rows
+        early = per_batch_ms(engine, history, batch_rows, 0, args.batches)
+        # Feed the middle in one go, then time batches at the end of the history
+        engine.evaluate(history.iloc[span:len(history) - span])
+        late = per_batch_ms(engine, history, batch_rows, len(history) - span, args.batches)
+        per_rule = 1000 * late / (len(rules) * batch_rows)
+        print(f"{batch_rows:>6} {early:>9.2f} {late:>8.2f} {per_rule:>12.3f} {full_ms:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Capacitor-bank sizing: all candidate sizes broadcast at once against one size at a time.
+
+    python -m benchmarks.bank_sizing --days 366 --sizes 50 250 1000
+
+Runs `bank_savings` on a synthetic station for `--sizes` candidate bank sizes, once
+with the whole array of sizes (broadcast against the intervals in blocks) and once
+calling it for each size alone, as a loop over sizes would. Both give the same
+table. The synthetic ER+ is about 15% of EA, so `--limit` defaults to 0.12 to give
+the banks something to compensate.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    from benchmarks.synthetic import write_dataset
+    from energy_dashboard.calendar_index import calendar_table
+    from energy_dashboard.compensation import BANK_MODES, bank_savings, candidate_sizes, required_kvar
+    from energy_dashboard.utils import load_data
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=366)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 250, 1000])
+    parser.add_argument('--mode', choices=BANK_MODES, default='switched')
+    parser.add_argument('--limit', type=float, default=0.12)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        df = load_data(write_dataset(os.path.join(tmp, 'station.feather'), args.days * 96))
+    calendar = calendar_table(df.index)
+    station = df.columns.get_level_values('location')[0]
+    kvar = required_kvar(df, calendar, args.limit)[station]
+    limits = dict(mode=args.mode, target=args.limit, limit_x1=args.limit)
+
+    print(f"{len(df)} intervals, {args.mode} bank, limit {args.limit}")
+    print(f"{'sizes':>6} {'broadcast s':>12} {'per size s':>11} {'speed-up':>9}")
+    for n in args.sizes:
+        sizes = candidate_sizes(kvar, n)
+        broadcast, table = timed(lambda: bank_savings(df, station, calendar, sizes, **limits), args.runs)
+        looped, rows = timed(lambda: [bank_savings(df, station, calendar, [size], **limits) for size in sizes], 1)
+        assert np.allclose(table.to_numpy(), np.concatenate([row.to_numpy() for row in rows]))
+        print(f"{n:>6} {broadcast:>12.3f} {looped:>11.3f} {looped / broadcast:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Peak RSS of the in-memory and chunked rollups as the dataset grows.
+
+    python -m benchmarks.chunked_memory --years 1 2 4 --freq 1min
+
+Every measurement runs in a fresh interpreter so ru_maxrss only covers that run.
+The in-memory working set grows roughly linearly with the data; the chunked one
+should stay flat. The results themselves are not bounded (at 1-minute resolution a
+per-week intra-week matrix holds one value per input row), so the working set is
+reported as peak RSS minus the size of the returned frames.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_dataset
+
+
+def peak_rss_mb():
+    # VmHWM belongs to this process image only; ru_maxrss keeps the parent's
+    # high-water mark across fork/exec on Linux
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _result_mb(result):
+    return sum(
+        frame.memory_usage(deep=True).sum()
+        for frames in result.values()
+        for frame in frames.values()
+    ) / 2**20
+
+
+def run_one(mode, data_path, batch_rows):
+    from energy_dashboard.chunked import aggregate_chunked, aggregate_in_memory
+    from energy_dashboard.utils import strip_unit_tup
+
+    start = time.perf_counter()
+    if mode == 'memory':
+        df = pd.read_feather(data_path)
+        df.columns = df.columns.map(strip_unit_tup)
+        result = aggregate_in_memory(df)
+    else:
+        result = aggregate_chunked(data_path, batch_rows)
+    elapsed = time.perf_counter() - start
+    print(f"{peak_rss_mb() - _result_mb(result):.0f} {elapsed:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--freq', default='1min')
+    parser.add_argument('--batch-rows', type=int, default=100_000)
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run[0], args.run[1], args.batch_rows)
+        return
+
+    rows_per_year = int(pd.Timedelta('365D') / pd.Timedelta(args.freq))
+    print("Working set (peak RSS - results), MB")
+    print(f"{'years':>6} {'rows':>10} {'memory MB':>10} {'s':>6} {'chunked MB':>11} {'s':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for years in args.years:
+            n_rows = int(years * rows_per_year)
+            data_path = write_dataset(os.path.join(tmp, f'{years}.feather'), n_rows,
+                                      batch_rows=args.batch_rows, freq=args.freq)
+            results = []
+            for mode in ('memory', 'chunked'):
+                out = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.chunked_memory', '--batch-rows', str(args.batch_rows),
+                     '--run', mode, data_path],
+                    capture_output=True, text=True, check=True
+                )
+                results.extend(out.stdout.split()[-2:])
+            print(f"{years:>6} {n_rows:>10} {results[0]:>10} {results[1]:>6} {results[2]:>11} {results[3]:>6}")
+            os.remove(data_path)
+
+
+if __name__ == '__main__':
+    main()
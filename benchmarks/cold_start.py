@@ -0,0 +1,105 @@
+"""
+Time to first paint of the dashboard pages in a fresh interpreter.
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --root ../other-checkout   # e.g. an older commit
+
+Each measurement runs one page script in a new process with streamlit already
+imported (the server has it loaded), in bare mode, and reports the median of:
+
+    paint   seconds until the page sends its first element
+    run     seconds for the whole script run
+    heavy   heavy modules the run imported
+
+Logged-out runs stop at the login check, as `st.stop()` would in the server.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('pandas', 'pyarrow', 'duckdb', 'plotly.graph_objects', 'energy_dashboard.utils')
+
+
+class _Stopped(Exception):
+    pass
+
+
+def run_one(root, page, authenticated):
+    os.chdir(root)
+    sys.path.insert(0, root)
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+
+    st.session_state['authenticated'] = authenticated
+    st.query_params['authentication_status'] = str(authenticated).lower()
+
+    def stop():
+        raise _Stopped()
+
+    first = []
+    enqueue = DeltaGenerator._enqueue
+
+    def timed_enqueue(self, *args, **kwargs):
+        if not first:
+            first.append(time.perf_counter())
+        return enqueue(self, *args, **kwargs)
+
+    st.stop = stop
+    DeltaGenerator._enqueue = timed_enqueue
+    loaded = set(sys.modules)
+
+    import runpy
+    start = time.perf_counter()
+    try:
+        runpy.run_path(page, run_name='__main__')
+    except _Stopped:
+        pass
+    end = time.perf_counter()
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules and m not in loaded]
+    print(json.dumps({'paint': (first[0] if first else end) - start, 'run': end - start, 'heavy': heavy}))
+
+
+def measure(root, page, authenticated, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.cold_start', '--root', root,
+             '--run', page, '1' if authenticated else '0'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)) or '.'
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return (statistics.median(r['paint'] for r in results),
+            statistics.median(r['run'] for r in results),
+            results[-1]['heavy'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default='.', help="checkout to measure")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--logged-in', nargs='*', default=None,
+                        help="pages to also measure logged in (default: the home page)")
+    parser.add_argument('--run', nargs=2, metavar=('PAGE', 'AUTH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+
+    if args.run:
+        run_one(root, args.run[0], args.run[1] == '1')
+        return
+
+    pages = sorted(glob.glob(os.path.join(root, '1_*.py'))) + sorted(glob.glob(os.path.join(root, 'pages', '*.py')))
+    logged_in = pages[:1] if args.logged_in is None else [p for p in pages if os.path.basename(p) in args.logged_in]
+    print(f"{'page':<36} {'auth':>5} {'paint s':>8} {'run s':>7}  heavy imports")
+    for page, authenticated in [(p, False) for p in pages] + [(p, True) for p in logged_in]:
+        paint, run, heavy = measure(root, page, authenticated, args.runs)
+        name = os.path.relpath(page, root)
+        print(f"{name:<36} {'yes' if authenticated else 'no':>5} {paint:>8.3f} {run:>7.3f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Peak and retained memory of each page's computation on synthetic data, checked against a budget.
+
+    python -m benchmarks.memory_budget                    # check against memory_budget.json
+    python -m benchmarks.memory_budget --years 1 2 4      # also report scales without a budget
+    python -m benchmarks.memory_budget --update           # store the measurements as the budget
+
+Each stage runs what a page computes, through the same functions as the page (no
+Streamlit caches), on a synthetic dataset of `--years` years of 15-minute data. The
+dataset and its calendar table are built first; every other stage starts from them.
+tracemalloc (which sees NumPy's buffers as well as Python objects) reports per stage:
+
+    peak MB      highest traced memory above what was allocated before the stage
+    kept MB      what the stage still holds at its end, its result included
+    net blocks   memory blocks the stage still holds at its end: blocks it allocated
+                 and did not free, less blocks allocated before it that it freed. This
+                 is not the number of allocations, which tracemalloc does not count
+
+Arrow allocates the buffers of the loaded dataset through its own memory pool, which
+tracemalloc does not see, so the load stage only counts the Python side of it.
+
+The budget file keeps, per scale, the peak and the kept MB of every stage as they were
+when last updated, plus BUDGET_HEADROOM (and at least BUDGET_MIN_MARGIN_MB). A check
+fails (exit status 1) when any stage of a budgeted scale peaks above its peak budget or
+keeps more than its kept budget. A change that adds a full-size temporary shows up in
+the peak, and one that makes a cached result larger shows up in what is kept, before
+either shows up in the memory of every session. Run with `--update` after a change that
+is meant to use more memory, and commit the new budget with it.
+
+The budgeted scales are half a year, one year and two years. Larger datasets are not
+budgeted, to keep the check quick; run `--years 4` by hand after changing how a stage
+scales with the data.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import write_dataset
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), 'memory_budget.json')
+# Margin over the measured peaks when the budget is stored, and at least this many MB
+BUDGET_HEADROOM = 1.25
+BUDGET_MIN_MARGIN_MB = 1.0
+# Rows of the dataset every stage runs on once before the measured runs, so imports
+# and other one-off allocations are not counted against the first scale
+WARMUP_ROWS = 7 * 96
+ROWS_PER_YEAR = 365 * 96
+# Scales of the budget when none is stored yet; tracemalloc slows the Python loops
+# behind the reactive ratio chart, so two years take about half a minute
+DEFAULT_YEARS = [0.5, 1, 2]
+# Measurements with a budget, as stored per stage in the budget file
+BUDGETED = ('peak', 'kept')
+
+
+def page_stages():
+    """(stage, page, function of (tetarom_df, calendar)) for each page computation"""
+    from energy_dashboard.compare import aligned_cube
+    from energy_dashboard.compensation import bank_savings, candidate_sizes, power_factor, required_kvar
+    from energy_dashboard.figures import completeness_figure, intra_week_figure, intra_week_series, \
+        overview_figure, overview_frame, ratio_frame, reactive_frame, reactive_ratio_figure, \
+        reactive_usage_figure, stations
+    from energy_dashboard.peaks import peak_stats
+    from energy_dashboard.quality import check_quality
+    from energy_dashboard.reactive import ReactiveRatio
+    from energy_dashboard.special_days import special_day_events, special_day_table
+    from energy_dashboard.utils import intra_week_pattern
+
+    def overview(df, calendar):
+        resampled_df = overview_frame(df, 'Day', 'MWh', calendar)
+        return overview_figure(resampled_df, 'Day', 'MWh', stations(df))
+
+    def intra_week(df, calendar):
+        series = intra_week_series(df, 'Total')
+        return intra_week_figure(intra_week_pattern(series, 'Week', calendar), 'Total', 'Week')
+
+    def reactive(df, calendar):
+        frame = reactive_frame(df, stations(df)[0])
+        return reactive_usage_figure(frame, stations(df)[0]), reactive_ratio_figure(ratio_frame(frame), stations(df)[0])
+
+    def rolling_ratio(df, calendar):
+        return ReactiveRatio(reactive_frame(df, stations(df)[0])).ratio(pd.Timedelta('1D'))
+
+    def quality(df, calendar):
+        issues, complete = check_quality(df)
+        return issues, completeness_figure(complete)
+
+    def special_days(df, calendar):
+        years = range(df.index.min().year, df.index.max().year + 2)
+        return special_day_table(calendar['day_id'].to_numpy(), special_day_events(years, {}), df.index)
+
+    def compensation(df, calendar):
+        kvar = required_kvar(df, calendar, 0.12)[stations(df)[0]]
+        return power_factor(df), bank_savings(df, stations(df)[0], calendar, candidate_sizes(kvar), limit_x1=0.12)
+
+    return [
+        ('overview', 'Data Overview', overview),
+        ('intra_week', 'Intra-Week', intra_week),
+        ('special_days', 'Intra-Week', special_days),
+        ('reactive', 'Reactive Energy', reactive),
+        ('rolling_ratio', 'Reactive Energy', rolling_ratio),
+        ('quality', 'Data Quality', quality),
+        ('peaks', 'Peak Demand', lambda df, calendar: peak_stats(df, calendar)),
+        ('compare', 'Period Comparison', lambda df, calendar: aligned_cube(df, calendar, 'Week')),
+        ('compensation', 'Compensation', compensation),
+    ]
+
+
+def measure(fn, *args):
+    """(result, peak MB, kept MB, net blocks, seconds) of `fn(*args)` under tracemalloc"""
+    gc.collect()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    net_blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+    return result, (peak - start) / 2**20, (current - start) / 2**20, net_blocks, elapsed
+
+
+def run_scale(n_rows, path):
+    from energy_dashboard.calendar_index import calendar_table
+    from energy_dashboard.utils import load_data
+
+    data_path = write_dataset(path, n_rows)
+    results = {}
+    df, *results['load'] = measure(load_data, data_path)
+    calendar, *results['calendar'] = measure(calendar_table, df.index)
+    for stage, _, fn in page_stages():
+        result, *results[stage] = measure(fn, df, calendar)
+        del result
+    return results
+
+
+def budget_for(mb):
+    return round(max(mb * BUDGET_HEADROOM, mb + BUDGET_MIN_MARGIN_MB), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=float, nargs='+', default=None,
+                        help="scales to run; by default the ones in the budget")
+    parser.add_argument('--budget', default=BUDGET_PATH)
+    parser.add_argument('--update', action='store_true', help="store the measurements as the new budget")
+    args = parser.parse_args()
+
+    try:
+        with open(args.budget) as f:
+            budget = json.load(f)
+    except FileNotFoundError:
+        budget = {}
+    scales = args.years or [float(years) for years in budget] or DEFAULT_YEARS
+
+    tracemalloc.start()
+    over = []
+    print(f"{'years':>6} {'rows':>9} {'stage':<14} {'peak MB':>8} {'kept MB':>8} {'net blocks':>10} {'s':>6} "
+          f"{'peak budget':>11} {'kept budget':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run_scale(WARMUP_ROWS, os.path.join(tmp, 'warmup.feather'))
+        for years in scales:
+            key = f"{years:g}"
+            n_rows = int(years * ROWS_PER_YEAR)
+            results = run_scale(n_rows, os.path.join(tmp, f'{key}y.feather'))
+            limits = budget.get(key, {}).get('stages', {})
+            for stage, (peak, kept, net_blocks, elapsed) in results.items():
+                measured = dict(zip(BUDGETED, (peak, kept)))
+                stage_limits = limits.get(stage, {})
+                stage_over = [name for name in BUDGETED if name in stage_limits and measured[name] > stage_limits[name]]
+                over += [(key, stage, name, measured[name], stage_limits[name]) for name in stage_over]
+                limit_text = ' '.join('-'.rjust(11) if name not in stage_limits else f"{stage_limits[name]:>11.1f}"
+                                      for name in BUDGETED)
+                flag = f"  OVER ({', '.join(stage_over)})" if stage_over else ''
+                print(f"{key:>6} {n_rows:>9} {stage:<14} {peak:>8.1f} {kept:>8.1f} {net_blocks:>10} {elapsed:>6.1f} "
+                      f"{limit_text}{flag}")
+            if args.update:
+                budget[key] = {'rows': n_rows, 'stages': {
+                    stage: {'peak': budget_for(peak), 'kept': budget_for(kept)}
+                    for stage, (peak, kept, *_) in results.items()}}
+
+    if args.update:
+        with open(args.budget, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"Budget written to {args.budget}")
+    elif over:
+        for key, stage, name, value, limit in over:
+            print(f"{stage} at {key} years: {name} {value:.1f} MB, over its budget of {limit:.1f} MB", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Time of a page rerun in an existing, logged-in session.
+
+    python -m benchmarks.rerun_overhead --runs 20
+    python -m benchmarks.rerun_overhead --root ../other-checkout   # e.g. an older commit
+
+Each page is run once to fill the caches, then rerun `--runs` times in the same
+session without changing any widget, as when a user interacts with another part of
+the page. Reports the median and best rerun time in milliseconds.
+
+Pages run in bare mode in one process, as in benchmarks.cold_start: widgets return
+their defaults and nothing is sent to a browser, so the times are the script's own
+work, caches included.
+
+A second table times fetching each dataset artifact the pages use, through the
+cache layers (`st.cache_data` unpickles a copy on every hit; the Reactive Energy
+page used to wrap `load_data` in one more) and through the session's data handle.
+"""
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_PAGES = ('2_*', '3_*', '4_*', '5_*', '7_*', '8_*', '9_*')
+
+
+def run_one(root, page, runs):
+    os.chdir(root)
+    sys.path.insert(0, root)
+    import runpy
+    import streamlit as st
+
+    st.session_state['authenticated'] = True
+    times = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        runpy.run_path(page, run_name='__main__')
+        times.append(time.perf_counter() - start)
+    times = times[1:]
+    print(f"{1000 * statistics.median(times)} {1000 * min(times)}")
+
+
+def data_access(runs):
+    import streamlit as st
+    from energy_dashboard.calendar_index import load_calendar
+    from energy_dashboard.compare import load_aligned
+    from energy_dashboard.peaks import load_peak_stats
+    from energy_dashboard.quality import load_quality
+    from energy_dashboard.session import data_handle
+    from energy_dashboard.sites import get_site
+    from energy_dashboard.utils import load_data
+
+    @st.cache_data
+    def get_data(data_path):
+        return load_data(data_path)
+
+    site = get_site()
+    path = site.data_path
+    artifacts = {
+        'frame': (lambda: get_data(path), lambda data: data.frame),
+        'calendar': (lambda: load_calendar(path), lambda data: data.calendar),
+        'quality': (lambda: load_quality(path), lambda data: data.derived(load_quality, path)),
+        'peak stats': (lambda: load_peak_stats(path), lambda data: data.derived(load_peak_stats, path)),
+        'aligned weeks': (lambda: load_aligned('Week', path),
+                          lambda data: data.derived(load_aligned, 'Week', path)),
+    }
+    print(f"{'artifact':<16} {'cache ms':>9} {'handle ms':>10}")
+    for name, (cached, handled) in artifacts.items():
+        cache_ms = _median_ms(cached, runs)
+        handle_ms = _median_ms(lambda: handled(data_handle(site)), runs)
+        print(f"{name:<16} {cache_ms:>9.3f} {handle_ms:>10.3f}")
+
+
+def _median_ms(fn, runs):
+    fn()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default='.', help="checkout to measure")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--pages', nargs='+', default=DEFAULT_PAGES, help="page file patterns under pages/")
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+
+    if args.run:
+        run_one(root, args.run, args.runs)
+        return
+    if os.path.samefile(root, '.'):
+        data_access(args.runs)
+        print()
+
+    print(f"{'page':<36} {'median ms':>10} {'best ms':>8}")
+    for pattern in args.pages:
+        for page in sorted(glob.glob(os.path.join(root, 'pages', pattern + '.py'))):
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.rerun_overhead', '--root', root, '--runs', str(args.runs),
+                 '--run', page],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)) or '.'
+            )
+            median, best = (float(v) for v in out.stdout.split()[-2:])
+            print(f"{os.path.relpath(page, root):<36} {median:>10.1f} {best:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
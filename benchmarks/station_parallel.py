@@ -0,0 +1,57 @@
+"""
+Speed-up of the station-parallel overview with the number of workers.
+
+    python -m benchmarks.station_parallel --stations 16 --days 90 --workers 1 2 4 8 16
+
+Runs the two per-station pipelines of the all-stations overview on a synthetic
+dataset with `--stations` locations: `ratio_summary` on threads and
+`segment_summary` on processes, as `load_station_overview` does. Each pool is
+warmed up first (process workers start and load the dataset), then the median of
+`--runs` calls is reported with the speed-up over one worker. Only as many workers
+as there are CPU cores can run at once.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import write_dataset
+
+
+def timed(fn, runs):
+    fn()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    from energy_dashboard.parallel import map_stations
+    from energy_dashboard.reactive import ratio_summary, segment_summary
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, default=16)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    stations = [f'Station {i + 1}' for i in range(args.stations)]
+    print(f"{args.stations} stations, {args.days} days of 15-minute data, {os.cpu_count()} CPU cores")
+    print(f"{'workers':>8} {'threads s':>10} {'speed-up':>9} {'processes s':>12} {'speed-up':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = write_dataset(os.path.join(tmp, 'stations.feather'), args.days * 96, stations=stations)
+        base = None
+        for workers in args.workers:
+            threads = timed(lambda: map_stations(ratio_summary, stations, data_path, 'thread', workers), args.runs)
+            processes = timed(lambda: map_stations(segment_summary, stations, data_path, 'process', workers), args.runs)
+            base = base or (threads, processes)
+            print(f"{workers:>8} {threads:>10.3f} {base[0] / threads:>9.2f} {processes:>12.3f} {base[1] / processes:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
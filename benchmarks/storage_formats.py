@@ -0,0 +1,89 @@
+"""
+Disk size, load time and memory of the dataset in each storage layout.
+
+    python -m benchmarks.storage_formats --runs 5
+    python -m benchmarks.storage_formats --years 4 --freq 5min --layouts feather-lz4 parquet-zstd
+
+The dataset (the Tetarom file by default, or a synthetic one with --years) is
+rewritten in every layout of energy_dashboard.storage, then each layout is loaded in
+a fresh interpreter and the medians are reported:
+
+    full     seconds to load the whole frame, as `load_data` does
+    station  seconds to load the columns of a single station
+    peak MB  peak RSS of the full load above the interpreter with its imports
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.chunked_memory import peak_rss_mb
+from benchmarks.synthetic import write_dataset
+
+
+def run_one(path, station):
+    from energy_dashboard.manifest import load_manifest
+    from energy_dashboard.storage import read_frame
+
+    fmt = load_manifest(path)['format']
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = read_frame(path, fmt)
+    full = time.perf_counter() - start
+    peak = peak_rss_mb() - baseline
+    frame_mb = df.memory_usage(index=True, deep=True).sum() / 2**20
+    del df
+    start = time.perf_counter()
+    read_frame(path, fmt, stations=[station])
+    station_s = time.perf_counter() - start
+    print(f"{full} {station_s} {peak} {frame_mb}")
+
+
+def measure(path, station, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.storage_formats', '--run', path, station],
+            capture_output=True, text=True, check=True
+        )
+        results.append([float(v) for v in out.stdout.split()[-4:]])
+    return [statistics.median(column) for column in zip(*results)]
+
+
+def main():
+    from energy_dashboard.manifest import DATA_PATH, load_manifest
+    from energy_dashboard.storage import LAYOUTS, rewrite
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=DATA_PATH, help="dataset to rewrite")
+    parser.add_argument('--years', type=float, help="use a synthetic dataset of this many years instead")
+    parser.add_argument('--freq', default='15min', help="interval of the synthetic dataset")
+    parser.add_argument('--layouts', nargs='+', choices=list(LAYOUTS), default=list(LAYOUTS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--run', nargs=2, metavar=('PATH', 'STATION'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source
+        if args.years:
+            import pandas as pd
+            n_rows = int(args.years * pd.Timedelta('365D') / pd.Timedelta(args.freq))
+            source = write_dataset(os.path.join(tmp, 'synthetic.feather'), n_rows, freq=args.freq)
+        station = load_manifest(source)['stations'][0]
+        print(f"{source}: {load_manifest(source)['rows']} rows, station subset '{station}'")
+        print(f"{'layout':<20} {'disk MB':>8} {'full s':>8} {'station s':>10} {'peak MB':>8} {'frame MB':>9}")
+        for layout, path in rewrite(source, args.layouts, tmp).items():
+            full, station_s, peak, frame_mb = measure(path, station, args.runs)
+            print(f"{layout:<20} {os.path.getsize(path) / 2**20:>8.2f} {full:>8.4f} {station_s:>10.4f} "
+                  f"{peak:>8.1f} {frame_mb:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
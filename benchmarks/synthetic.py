@@ -0,0 +1,33 @@
+"""Synthetic datasets shaped like tetarom_clean_merged_data, for benchmarks"""
+import numpy as np
+import pandas as pd
+
+MEASURES = ['EA+[kWh]', 'EA-[kWh]', 'ER+[kVArh]', 'ER-[kVArh]']
+
+
+def make_dataset(n_rows, freq='15min', stations=('Statia Jucu 1', 'Statia Jucu 2'),
+                 start='2024-01-01 00:15', seed=0):
+    """Meter readings with a daily/weekly shape and noise, in the on-disk column layout"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n_rows, freq=freq, name='time')
+    columns = pd.MultiIndex.from_product([MEASURES, list(stations)], names=['measure', 'location'])
+
+    hours = np.asarray(index.hour + index.minute / 60)
+    weekday = np.asarray(index.dayofweek < 5)
+    shape = 0.6 + 0.4 * np.sin((hours - 6) / 24 * 2 * np.pi).clip(0) + 0.3 * weekday
+
+    data = np.empty((n_rows, len(columns)))
+    for i, (measure, _) in enumerate(columns):
+        scale = {'EA+[kWh]': 1000, 'EA-[kWh]': 2, 'ER+[kVArh]': 150, 'ER-[kVArh]': 15}[measure]
+        data[:, i] = np.round(scale * shape * rng.uniform(0.8, 1.2, n_rows))
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def write_dataset(path, n_rows, batch_rows=100_000, **kwargs):
+    """Write a synthetic dataset as feather (in `batch_rows` record batches) or parquet"""
+    df = make_dataset(n_rows, **kwargs)
+    if str(path).endswith('.parquet'):
+        df.to_parquet(path, row_group_size=batch_rows)
+    else:
+        df.to_feather(path, chunksize=batch_rows)
+    return path
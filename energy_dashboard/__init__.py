@@ -1,3 +1,34 @@
-from .utils import strip_unit, strip_unit_tup, resample_data, update_plot_style, load_data, COLORS
+"""
+Public helpers of the dashboard. Submodules are imported on first use of one of
+their names, so `import energy_dashboard` (and the light `sites` and `manifest`
+modules) do not pull in pandas, plotly, pyarrow or duckdb.
+"""
+import importlib
 
-__all__ = ['strip_unit', 'strip_unit_tup', 'resample_data', 'update_plot_style', 'load_data', 'COLORS'] 
\ No newline at end of file
+# Public name -> submodule defining it
+_EXPORTS = {
+    'strip_unit': 'utils', 'strip_unit_tup': 'utils', 'resample_data': 'utils', 'update_plot_style': 'utils',
+    'load_data': 'utils', 'COLORS': 'utils', 'dataset_version': 'manifest', 'window_slice': 'utils',
+    'load_day_options': 'utils', 'station_totals': 'utils', 'intra_week_pattern': 'utils',
+    'make_trace': 'traces', 'make_band': 'traces', 'WEBGL_THRESHOLD': 'traces',
+    'aggregate_chunked': 'chunked', 'iter_batches': 'chunked',
+    'run_query': 'query',
+    'calendar_table': 'calendar_index', 'load_calendar': 'calendar_index',
+    'load_special_days': 'special_days',
+    'load_manifest': 'manifest',
+    'map_stations': 'parallel',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
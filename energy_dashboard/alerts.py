@@ -0,0 +1,374 @@
+"""
+Threshold alerts, evaluated incrementally as intervals are appended.
+
+A `Rule` watches one station:
+
+    ratio      ER+ (or ER-) / EA above `limit`, per interval or over a trailing
+               `window` such as '24h' (energy weighted, like the Reactive Energy page)
+    peak       average demand (EA+ per interval, in kW) above `limit`
+    missing    more than `limit` intervals without a complete reading of the station
+    forecast   EA off the forecast by more than `limit` (a fraction of the forecast)
+
+`AlertEngine.evaluate(batch)` takes the new intervals only. Rules on the same series
+(kind, station, measure, window) are evaluated together as one comparison against
+a vector of limits, and each group keeps the little state it needs between batches
+(whether each rule is in breach, the trailing window, the last complete reading), so
+a batch costs O(batch x rules), plus the length of the window for windowed ratios,
+whatever the length of the history.
+
+An alert is raised when a rule goes into breach, not on every interval it stays in
+breach, and at most once per `cooldown` (of data time) per rule. Alerts go to an
+outbox, which drops keys it has already delivered: `FileOutbox` appends JSON lines
+to a local file, `WebhookOutbox` POSTs them to a URL.
+
+Rules come from ENERGY_ALERT_RULES (a JSON list of rule fields), or `default_rules`.
+Replay a dataset through the engine, e.g. to backfill the outbox:
+
+    python -m energy_dashboard.alerts --batch-rows 96
+"""
+import argparse
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from .figures import LIMIT_X1, LIMIT_X3
+from .reactive import MIN_ENERGY
+from .utils import DATA_PATH, FORECAST_DATA_PATH, load_data, load_forecast_data
+
+KINDS = ('ratio', 'peak', 'missing', 'forecast')
+RULES_FILE = os.environ.get('ENERGY_ALERT_RULES', 'data/alert_rules.json')
+COOLDOWN = pd.Timedelta('4h')
+INTERVAL = pd.Timedelta('15min')
+OUTBOX_SUFFIX = '.alerts.jsonl'
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    kind: str
+    station: str
+    limit: float
+    measure: str = 'ER+'        # ratio rules: ER+ or ER-
+    window: str | None = None   # ratio rules: trailing window, None for each interval
+
+    def __post_init__(self):
+        if self.kind not in KINDS:
+            raise ValueError(f"Rule '{self.id}' has an invalid kind: {self.kind}")
+        if self.kind == 'ratio' and self.measure not in ('ER+', 'ER-'):
+            raise ValueError(f"Rule '{self.id}' has an invalid measure: {self.measure}")
+
+    def message(self, value):
+        if self.kind == 'ratio':
+            over = f" over {self.window}" if self.window else ""
+            return f"{self.station}: {self.measure} / EA{over} at {value:.2%}, above {self.limit:.2%}"
+        if self.kind == 'peak':
+            return f"{self.station}: demand {value:,.0f} kW, above {self.limit:,.0f} kW"
+        if self.kind == 'missing':
+            return f"{self.station}: no complete reading for {value:.0f} intervals"
+        return f"{self.station}: EA {value:.0%} off the forecast, tolerance {self.limit:.0%}"
+
+
+def default_rules(history):
+    """Limits x1/x3 on the interval and 24 h ratios, the top 0.1% of demand, gaps and forecast misses"""
+    rules = []
+    for station in history.columns.get_level_values('location').unique():
+        peak = (history[('EA+', station)] / (INTERVAL / pd.Timedelta('1h'))).quantile(0.999)
+        rules += [
+            Rule(f"{station}/ER+>x1", 'ratio', station, LIMIT_X1),
+            Rule(f"{station}/ER+>x3", 'ratio', station, LIMIT_X3),
+            Rule(f"{station}/ER+ 24h>x1", 'ratio', station, LIMIT_X1, window='24h'),
+            Rule(f"{station}/ER->x1", 'ratio', station, LIMIT_X1, measure='ER-'),
+            Rule(f"{station}/peak", 'peak', station, float(round(peak))),
+            Rule(f"{station}/missing", 'missing', station, 4),
+            Rule(f"{station}/forecast", 'forecast', station, 0.3),
+        ]
+    return rules
+
+
+def load_rules(history, path=RULES_FILE):
+    try:
+        with open(path) as f:
+            return [Rule(**entry) for entry in json.load(f)]
+    except FileNotFoundError:
+        return default_rules(history)
+
+
+def outbox_path(data_path):
+    return f"{data_path}{OUTBOX_SUFFIX}"
+
+
+class FileOutbox:
+    """Appends alerts as JSON lines to `path`, skipping keys the file already holds"""
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = {alert['key'] for alert in self.read()}
+        self._lock = threading.Lock()
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def send(self, alerts):
+        """Deliver the alerts not delivered before; returns those"""
+        with self._lock:
+            new = [alert for alert in alerts if alert['key'] not in self.keys]
+            if new:
+                with open(self.path, 'a') as f:
+                    f.writelines(json.dumps(alert) + '\n' for alert in new)
+                self.keys.update(alert['key'] for alert in new)
+        return new
+
+    def recent(self, n):
+        return self.read()[-n:]
+
+
+class WebhookOutbox:
+    """
+    POSTs each new alert as JSON to `url`, a stand-in for a notification service.
+    Alerts that could not be delivered are retried with the next batch.
+    """
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+        self.keys = set()
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def send(self, alerts):
+        with self._lock:
+            queue = self.pending + [alert for alert in alerts if alert['key'] not in self.keys]
+            self.pending, delivered = [], []
+            for alert in queue:
+                request = urllib.request.Request(self.url, data=json.dumps(alert).encode(), method='POST',
+                                                 headers={'Content-Type': 'application/json'})
+                try:
+                    urllib.request.urlopen(request, timeout=self.timeout).close()
+                except (urllib.error.URLError, OSError):
+                    self.pending.append(alert)
+                    continue
+                self.keys.add(alert['key'])
+                delivered.append(alert)
+        return delivered
+
+    def recent(self, n):
+        return []
+
+
+class _Columns:
+    """The values of a batch as one array, with a column lookup by (measure, station)"""
+
+    def __init__(self, batch):
+        self.values = batch.to_numpy(dtype=np.float64)
+        self.positions = {column: i for i, column in enumerate(batch.columns)}
+
+    def get(self, measure, station):
+        position = self.positions.get((measure, station))
+        if position is None:
+            return np.full(len(self.values), np.nan)
+        return self.values[:, position]
+
+
+class _Group:
+    """Rules sharing one series; `series` returns its values and the rows it applies to"""
+
+    def __init__(self, kind, station, measure, window, forecast):
+        self.kind, self.station, self.measure = kind, station, measure
+        self.window = pd.Timedelta(window).to_timedelta64() if window else None
+        self.rules = []
+        self.forecast = None
+        if kind == 'forecast' and forecast is not None and (station, 'yhat') in forecast.columns:
+            yhat = forecast[(station, 'yhat')]
+            self.forecast = (yhat.index.values.astype('datetime64[ns]'), yhat.to_numpy(dtype=np.float64))
+        # State carried between batches
+        self.last_complete = None
+        self.tail = (np.empty(0, dtype='datetime64[ns]'), np.empty(0), np.empty(0))
+
+    def finish(self):
+        self.limits = np.array([rule.limit for rule in self.rules], dtype=np.float64)
+        self.active = np.zeros(len(self.rules), dtype=bool)
+        self.last_alert = np.full(len(self.rules), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    def _expected(self, times):
+        forecast_times, yhat = self.forecast
+        positions = forecast_times.searchsorted(times).clip(max=len(forecast_times) - 1)
+        return np.where(forecast_times[positions] == times, yhat[positions], np.nan)
+
+    def series(self, columns, times):
+        ea_plus = columns.get('EA+', self.station)
+        ea_minus = columns.get('EA-', self.station)
+        present = ~np.isnan(ea_plus)
+
+        if self.kind == 'missing':
+            complete = present & ~np.isnan(ea_minus) & ~np.isnan(columns.get('ER+', self.station)) \
+                & ~np.isnan(columns.get('ER-', self.station))
+            # Latest complete reading before each row; NaT is the smallest int64
+            seen = np.where(complete, times, np.datetime64('NaT')).view(np.int64)
+            first = np.datetime64('NaT') if self.last_complete is None else self.last_complete
+            before = np.maximum.accumulate(np.concatenate([[first.astype('datetime64[ns]').view(np.int64)], seen]))
+            before = before.view('datetime64[ns]')
+            self.last_complete = before[-1] if not np.isnat(before[-1]) else None
+            before = before[:-1]
+            # Intervals skipped between that reading and this row
+            gap = np.where(np.isnat(before), np.nan, (times - before) / INTERVAL.to_timedelta64() - 1)
+            # Rows at or before a reading already seen, filled in by a lagging station, tell nothing
+            return gap, gap >= 0 if not np.isnat(first) else np.ones(len(times), dtype=bool)
+
+        if self.kind == 'peak':
+            return ea_plus / (INTERVAL / pd.Timedelta('1h')), present
+
+        ea = ea_plus - ea_minus
+        if self.kind == 'forecast':
+            if self.forecast is None or not len(self.forecast[0]):
+                return np.full(len(times), np.nan), present
+            expected = self._expected(times)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                deviation = np.where(expected >= MIN_ENERGY, np.abs(ea - expected) / expected, np.nan)
+            return deviation, present & ~np.isnan(expected)
+
+        reactive = columns.get(self.measure, self.station)
+        if self.window is None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(ea >= MIN_ENERGY, reactive / ea, np.nan), present
+
+        # Trailing window: the rows of the previous batches still inside it, then this batch
+        tail_times, tail_ea, tail_er = self.tail
+        all_times = np.concatenate([tail_times, times[present]])
+        all_ea = np.concatenate([tail_ea, np.nan_to_num(ea[present])])
+        all_er = np.concatenate([tail_er, np.nan_to_num(reactive[present])])
+        cum_ea = np.concatenate([[0.0], np.cumsum(all_ea)])
+        cum_er = np.concatenate([[0.0], np.cumsum(all_er)])
+        ends = np.arange(len(tail_times), len(all_times)) + 1
+        starts = all_times.searchsorted(all_times[ends - 1] - self.window, side='right')
+        sums_ea, sums_er = cum_ea[ends] - cum_ea[starts], cum_er[ends] - cum_er[starts]
+        keep = all_times > all_times[-1] - self.window if len(all_times) else slice(0)
+        self.tail = (all_times[keep], all_ea[keep], all_er[keep])
+
+        ratio = np.full(len(times), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio[present] = np.where(sums_ea >= MIN_ENERGY, sums_er / sums_ea, np.nan)
+        return ratio, present
+
+
+class AlertEngine:
+    """Evaluates `rules` on each appended batch and sends new alerts to `outbox`"""
+
+    def __init__(self, rules, outbox=None, forecast=None, cooldown=COOLDOWN):
+        self.outbox = outbox
+        self.cooldown = pd.Timedelta(cooldown).to_timedelta64()
+        self.rules = list(rules)
+        self._groups = {}
+        for rule in self.rules:
+            window = rule.window if rule.kind == 'ratio' else None
+            measure = rule.measure if rule.kind == 'ratio' else None
+            key = (rule.kind, rule.station, measure, window)
+            if key not in self._groups:
+                self._groups[key] = _Group(rule.kind, rule.station, measure, window, forecast)
+            self._groups[key].rules.append(rule)
+        for group in self._groups.values():
+            group.finish()
+        self.raised = 0
+        self.suppressed = 0
+
+    def evaluate(self, batch, send=True):
+        """
+        Alerts raised by the intervals of `batch`. Each station's values must follow its
+        values of the previous batches; the rows themselves may go back to intervals
+        other stations already sent
+        """
+        if batch.empty:
+            return []
+        times = batch.index.values.astype('datetime64[ns]')
+        columns = _Columns(batch)
+        alerts = []
+        for group in self._groups.values():
+            values, rows = group.series(columns, times)
+            if not rows.any():
+                continue
+            values, row_times = values[rows], times[rows]
+            with np.errstate(invalid='ignore'):
+                breach = values[:, None] > group.limits[None, :]
+            previous = np.vstack([group.active[None, :], breach[:-1]])
+            group.active = breach[-1]
+            for row, col in zip(*np.nonzero(breach & ~previous)):
+                time = row_times[row]
+                last = group.last_alert[col]
+                if not np.isnat(last) and time - last < self.cooldown:
+                    self.suppressed += 1
+                    continue
+                group.last_alert[col] = time
+                rule = group.rules[col]
+                stamp = pd.Timestamp(time).isoformat()
+                alerts.append({
+                    'key': f"{rule.id}@{stamp}",
+                    'rule': rule.id,
+                    'kind': rule.kind,
+                    'station': rule.station,
+                    'time': stamp,
+                    'value': float(values[row]),
+                    'limit': rule.limit,
+                    'message': rule.message(values[row]),
+                })
+        alerts.sort(key=lambda alert: alert['time'])
+        self.raised += len(alerts)
+        if send and self.outbox is not None and alerts:
+            self.outbox.send(alerts)
+        return alerts
+
+    def prime(self, history):
+        """
+        Take the state at the end of `history` without alerting, so that a breach
+        already going on when the engine starts is not reported as new.
+        """
+        windows = [pd.Timedelta(rule.window) for rule in self.rules if rule.kind == 'ratio' and rule.window]
+        span = max(windows, default=INTERVAL) + INTERVAL
+        self.evaluate(history.loc[history.index[-1] - span:] if len(history) else history, send=False)
+        for group in self._groups.values():
+            group.last_alert[:] = np.datetime64('NaT')
+        return self
+
+
+def replay(history, engine, batch_rows=96):
+    """Feed `history` to `engine` `batch_rows` intervals at a time; returns all alerts"""
+    alerts = []
+    for start in range(0, len(history), batch_rows):
+        alerts += engine.evaluate(history.iloc[start:start + batch_rows])
+    return alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a dataset through the alert rules")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--forecast', default=FORECAST_DATA_PATH)
+    parser.add_argument('--rules', default=RULES_FILE)
+    parser.add_argument('--outbox', help=f"JSON lines file (default: <data>{OUTBOX_SUFFIX})")
+    parser.add_argument('--batch-rows', type=int, default=96)
+    parser.add_argument('--print-rules', action='store_true', help="print the rules as JSON and exit")
+    args = parser.parse_args()
+
+    history = load_data(args.data)
+    rules = load_rules(history, args.rules)
+    if args.print_rules:
+        print(json.dumps([asdict(rule) for rule in rules], indent=1))
+        return
+    forecast = load_forecast_data(args.forecast) if args.forecast and os.path.exists(args.forecast) else None
+    engine = AlertEngine(rules, FileOutbox(args.outbox or outbox_path(args.data)), forecast)
+    alerts = replay(history, engine, args.batch_rows)
+    print(f"{len(rules)} rules, {len(alerts)} alerts ({engine.suppressed} within the cool-down)")
+    for (kind, station), count in sorted(Counter((a['kind'], a['station']) for a in alerts).items()):
+        print(f"  {kind:<10} {station:<20} {count}")
+
+
+if __name__ == '__main__':
+    main()
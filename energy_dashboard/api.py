@@ -0,0 +1,264 @@
+"""
+Local HTTP API over the energy dataset, for tools that should not read the feather
+files themselves.
+
+    python -m energy_dashboard.api --port 8600
+
+Endpoints (GET):
+
+    /meta       stations, quantities, periods, time range and dataset version (JSON)
+    /readings   station, quantity, start, end, period, format
+
+`station` and `quantity` may be repeated or comma separated; `station=Total` is the
+sum over all stations. `period` is one of the dashboard aggregation periods
+("6-hours", "Day", "Week", "Month"); without it the raw 15-minute intervals are
+returned. `format` is "arrow" (Arrow IPC stream, the default) or "csv".
+`start` and `end` are local times of the dataset (Europe/Bucharest); a time with a
+UTC offset is converted to local time first.
+
+Responses carry an ETag derived from the dataset version and the query, and
+honour If-None-Match. Bodies are sent with chunked transfer encoding, a batch of
+rows at a time.
+"""
+import argparse
+import hashlib
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from .calendar_index import TIMEZONE, load_calendar
+from .manifest import load_manifest
+from .sites import get_site
+from .utils import DATA_PATH, RESAMPLE_RULES, dataset_cache, dataset_version, load_data, resample_data, \
+    station_totals, window_slice
+
+STREAM_BATCH_ROWS = 50_000
+FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+# The derived frames live in the shared dataset cache next to the data itself: no
+# copy per request, and they count against ENERGY_MEMORY_BUDGET_MB
+def _with_total(data_path, version):
+    return dataset_cache().get((f"{data_path}#total", version), lambda: _build_with_total(data_path))
+
+
+def _build_with_total(data_path):
+    df = load_data(data_path)
+    totals = station_totals(df)
+    totals.columns = pd.MultiIndex.from_product([totals.columns, ['Total']], names=df.columns.names)
+    return pd.concat([df, totals], axis=1)
+
+
+def _rollup(data_path, version, period):
+    return dataset_cache().get(
+        (f"{data_path}#{period}", version),
+        lambda: resample_data(_with_total(data_path, version), period, load_calendar(data_path)),
+    )
+
+
+def _split(params, name):
+    values = []
+    for value in params.get(name, []):
+        values.extend(v.strip() for v in value.split(',') if v.strip())
+    return values
+
+
+def _local_time(value):
+    """`value` as a naive local time of the dataset; one with an offset is converted"""
+    time = pd.Timestamp(value)
+    return time.tz_convert(TIMEZONE).tz_localize(None) if time.tz is not None else time
+
+
+def select(params, data_path=DATA_PATH):
+    """The wide frame a /readings query asks for, columns flattened to 'measure - location'"""
+    version = dataset_version(data_path)
+    period = params.get('period', [None])[0]
+    if period is None:
+        df = _with_total(data_path, version)
+    elif period in RESAMPLE_RULES:
+        df = _rollup(data_path, version, period)
+    else:
+        raise QueryError(f"Invalid period: {period}")
+
+    stations = _split(params, 'station') or list(df.columns.get_level_values('location').unique())
+    quantities = _split(params, 'quantity') or list(df.columns.get_level_values('measure').unique())
+    missing = [c for c in stations if c not in df.columns.get_level_values('location')] + \
+              [c for c in quantities if c not in df.columns.get_level_values('measure')]
+    if missing:
+        raise QueryError(f"Unknown station or quantity: {', '.join(missing)}")
+
+    try:
+        start = _local_time(params.get('start', [df.index[0]])[0])
+        end = _local_time(params.get('end', [df.index[-1]])[0])
+    except ValueError as e:
+        raise QueryError(f"Invalid time: {e}")
+    # A bare date as the end of the window means the whole day
+    if 'end' in params and end == end.normalize() and len(params['end'][0]) <= 10:
+        end = end + pd.Timedelta(days=1) - pd.Timedelta(1)
+
+    df = df.iloc[window_slice(df.index, start, end)]
+    df = df.loc[:, pd.MultiIndex.from_product([quantities, stations])]
+    df.columns = [f"{measure} - {location}" for measure, location in df.columns]
+    return df
+
+
+def meta(data_path=DATA_PATH):
+    """From the manifest, without loading the data"""
+    manifest = load_manifest(data_path)
+    if manifest is None:
+        raise QueryError(f"No data file: {data_path}")
+    return {
+        'version': manifest['version'],
+        'stations': manifest['stations'] + ['Total'],
+        'quantities': manifest['quantities'],
+        'periods': list(RESAMPLE_RULES),
+        'start': manifest['start'],
+        'end': manifest['end'],
+        'rows': manifest['rows'],
+    }
+
+
+def etag(path, params, data_path=DATA_PATH):
+    query = json.dumps({k: sorted(v) for k, v in sorted(params.items())})
+    digest = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()[:16]
+    return f'"{dataset_version(data_path)}-{digest}"'
+
+
+class _ChunkedWriter:
+    """File-like wrapper that frames each write as an HTTP/1.1 chunk"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def close(self):
+        if not self.closed:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+            self.closed = True
+
+
+def write_arrow(df, sink, batch_rows=STREAM_BATCH_ROWS):
+    table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    with ipc.new_stream(pa.PythonFile(sink, mode='w'), table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+
+
+def write_csv(df, sink, batch_rows=STREAM_BATCH_ROWS):
+    for offset in range(0, max(len(df), 1), batch_rows):
+        chunk = df.iloc[offset:offset + batch_rows]
+        sink.write(chunk.to_csv(header=offset == 0).encode())
+
+
+class DataRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    data_path = DATA_PATH
+
+    def do_GET(self):
+        self._streaming = False
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        try:
+            if url.path == '/meta':
+                self._send_json(HTTPStatus.OK, meta(self.data_path))
+            elif url.path == '/readings':
+                self._send_readings(url.path, params)
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint: {url.path}"})
+        except QueryError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+        except Exception as e:
+            self.log_error("Error serving %s: %r", self.path, e)
+            if self._streaming:
+                # The status line is out; all that is left is to drop the connection
+                self.close_connection = True
+            else:
+                self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Internal error: {e}"})
+
+    def _send_readings(self, path, params):
+        fmt = params.pop('format', ['arrow'])[0]
+        if fmt not in FORMATS:
+            raise QueryError(f"Invalid format: {fmt}")
+
+        tag = etag(path, {**params, 'format': [fmt]}, self.data_path)
+        if tag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', tag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        df = select(params, self.data_path)
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', FORMATS[fmt])
+        self.send_header('ETag', tag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._streaming = True
+
+        sink = _ChunkedWriter(self.wfile)
+        if fmt == 'arrow':
+            write_arrow(df, sink)
+        else:
+            write_csv(df, sink)
+        sink.close()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the energy dataset over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--data', default=DATA_PATH, help="path to the merged data file")
+    parser.add_argument('--site', help="site from the registry; overrides --data")
+    args = parser.parse_args()
+
+    if args.site:
+        try:
+            args.data = get_site(args.site).data_path
+        except KeyError:
+            parser.error(f"Unknown site: {args.site}")
+
+    DataRequestHandler.data_path = args.data
+    server = ThreadingHTTPServer((args.host, args.port), DataRequestHandler)
+    print(f"Serving {args.data} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Calendar features of the data index, as compact integer columns.
+
+Built once per dataset version and aligned row for row with `load_data()`, so pages
+group through integer codes instead of recomputing Period objects or times of day on
+every rerun:
+
+    dow        int8   day of week, Monday = 0
+    slot       int16  interval of the day (0 .. 95 for 15-minute data)
+    week_id    int32  Monday-based week number; the ordinal of the pandas 'W' Period
+    month_id   int32  months since 1970-01; the ordinal of the pandas 'M' Period
+    day_id     int32  days since 1970-01-01
+    holiday    int8   1 on a Romanian public holiday (`public_holidays`)
+    dst        int8   1 while summer time is in effect
+
+Timestamps are naive wall-clock time in TIMEZONE, the plant's local time. Summer time follows the EU rule, from the last
+Sunday of March at 03:00 to the last Sunday of October at 04:00 local time, so the
+repeated hour in autumn counts as summer time. `attrs['slots_per_day']` holds the number of slots in a
+day. `public_holidays` is the one list of public holidays: the `holiday` column and
+the holiday windows of `special_days` are both built from it.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .utils import DATA_PATH, dataset_version, load_data
+
+# Local time of the data index
+TIMEZONE = 'Europe/Bucharest'
+DAY_NS = 86_400 * 10**9
+DEFAULT_INTERVAL = pd.Timedelta('15min')
+
+# Fixed-date public holidays in Romania, (month, day) -> name
+FIXED_HOLIDAYS = {
+    (1, 1): "New Year", (1, 2): "New Year",
+    (1, 6): "Epiphany", (1, 7): "St. John",
+    (1, 24): "Union Day",
+    (5, 1): "Labour Day",
+    (6, 1): "Children's Day",
+    (8, 15): "Assumption",
+    (11, 30): "St. Andrew",
+    (12, 1): "National Day",
+    (12, 25): "Christmas", (12, 26): "Christmas",
+}
+# Movable holidays, days relative to Orthodox Easter Sunday -> name
+EASTER_HOLIDAYS = {
+    -2: "Good Friday", 0: "Easter", 1: "Easter",
+    49: "Pentecost", 50: "Pentecost",
+}
+
+
+def orthodox_easter(year):
+    """Orthodox Easter Sunday (Gregorian date), Meeus' Julian algorithm"""
+    a, b, c = year % 4, year % 7, year % 19
+    d = (19 * c + 15) % 30
+    e = (2 * a + 4 * b - d + 34) % 7
+    month, day = divmod(d + e + 114, 31)
+    # Julian to Gregorian offset, valid 1900-2099
+    return datetime.date(year, month, day + 1) + datetime.timedelta(days=13)
+
+
+def public_holidays(years):
+    """Name of each public holiday of the given years, by date"""
+    days = {}
+    for year in years:
+        easter = orthodox_easter(year)
+        days.update((easter + datetime.timedelta(days=offset), name) for offset, name in EASTER_HOLIDAYS.items())
+        # A fixed holiday wins when both fall on the same day
+        days.update((datetime.date(year, month, day), name) for (month, day), name in FIXED_HOLIDAYS.items())
+    days = pd.Series(days, dtype=object).sort_index()
+    days.index = pd.DatetimeIndex(days.index)
+    return days
+
+
+def _last_sunday(year, month):
+    day = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return day - datetime.timedelta(days=(day.weekday() + 1) % 7)
+
+
+def summer_time(index):
+    """Whether the EU summer time rule is in effect at each local timestamp of `index`"""
+    ns = index.as_unit('ns').asi8
+    dst = np.zeros(len(ns), dtype=bool)
+    # Each summer lies inside its year, so one range per year covers every row
+    for year in range(index.min().year, index.max().year + 1) if len(ns) else []:
+        start = pd.Timestamp(_last_sunday(year, 3)) + pd.Timedelta(hours=3)
+        end = pd.Timestamp(_last_sunday(year, 10)) + pd.Timedelta(hours=4)
+        dst |= (ns >= start.value) & (ns < end.value)
+    return dst
+
+
+def infer_interval(index):
+    """Smallest step between consecutive timestamps, or 15 minutes if there is none"""
+    steps = np.diff(index.as_unit('ns').asi8)
+    steps = steps[steps > 0]
+    return pd.Timedelta(int(steps.min())) if len(steps) else DEFAULT_INTERVAL
+
+
+def calendar_table(index, interval=None):
+    """Calendar features for each timestamp of `index`, see the module docstring"""
+    ns = index.as_unit('ns').asi8
+    day_id = ns // DAY_NS
+    if interval is None:
+        interval = infer_interval(index)
+    slots = (ns - day_id * DAY_NS) // interval.value
+    slot_dtype = np.int16 if slots.max(initial=0) < 2**15 else np.int32
+    holidays = public_holidays(range(index.min().year, index.max().year + 1)) if len(index) else public_holidays([])
+    holiday_days = holidays.index.as_unit('ns').asi8 // DAY_NS
+
+    months = index.year.to_numpy() * 12 + index.month.to_numpy() - 1 - 1970 * 12
+    table = pd.DataFrame({
+        # 1970-01-01 was a Thursday
+        'dow': ((day_id + 3) % 7).astype(np.int8),
+        'slot': slots.astype(slot_dtype),
+        'week_id': ((day_id + 3) // 7 + 1).astype(np.int32),
+        'month_id': months.astype(np.int32),
+        'day_id': day_id.astype(np.int32),
+        'holiday': np.isin(day_id, holiday_days).astype(np.int8),
+        'dst': summer_time(index).astype(np.int8),
+    }, index=index)
+    table.attrs['slots_per_day'] = DAY_NS // interval.value
+    return table
+
+
+def week_periods(week_ids):
+    return pd.PeriodIndex.from_ordinals(np.asarray(week_ids), freq='W')
+
+
+def month_periods(month_ids):
+    return pd.PeriodIndex.from_ordinals(np.asarray(month_ids), freq='M')
+
+
+def load_calendar(data_path=DATA_PATH):
+    return _load_calendar(data_path, dataset_version(data_path))
+
+
+@st.cache_data
+def _load_calendar(data_path, version):
+    return calendar_table(load_data(data_path).index)
@@ -0,0 +1,158 @@
+"""
+Out-of-core versions of the dashboard rollups.
+
+The dataset is read from disk a batch of rows at a time and folded into the same
+outputs the in-memory helpers produce: `resample_data` for every period, the station
+totals and the intra-week patterns. Peak memory is bounded by the batch size plus at
+most one calendar month of carried-over rows, independently of how much history is
+on disk.
+
+Results are identical to `aggregate_in_memory`, not just close: rows are only handed
+to pandas once the week (or month) they belong to is complete, so every bucket is
+reduced by the same pandas operation over the same values in the same order.
+
+Feather files are read one record batch at a time; write them with
+`df.to_feather(path, chunksize=...)` so that a batch is a reasonable unit of memory.
+Parquet files are streamed by row group.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from .manifest import file_format
+from .utils import DATA_PATH, RESAMPLE_RULES, strip_unit_tup, resample_data, station_totals, intra_week_pattern
+
+DEFAULT_BATCH_ROWS = 200_000
+
+# Every rollup is complete once its calendar week or month is; '6-hours', 'Day' and
+# 'Week' buckets nest inside weeks, 'Month' buckets are months.
+ALIGNMENT = {
+    "6-hours": 'W',
+    "Day": 'W',
+    "Week": 'W',
+    "Month": 'M',
+}
+INTRA_WEEK_ALIGNMENT = {
+    "Week": 'W',
+    "Month": 'M',
+}
+
+
+def iter_batches(data_path=DATA_PATH, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yields the dataset as DataFrames of at most `batch_rows` rows, in file order"""
+    if file_format(data_path) == 'parquet':
+        parquet_file = pq.ParquetFile(data_path)
+        schema = parquet_file.schema_arrow
+        for batch in parquet_file.iter_batches(batch_size=batch_rows):
+            yield _to_frame(batch, schema)
+        return
+
+    with pa.OSFile(str(data_path)) as source:
+        reader = ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, batch_rows):
+                yield _to_frame(batch.slice(offset, batch_rows), reader.schema)
+
+
+def _to_frame(batch, schema):
+    # The schema carries the pandas metadata that restores the time index and column levels
+    df = pa.Table.from_batches([batch], schema=schema).to_pandas()
+    df.columns = df.columns.map(strip_unit_tup)
+    return df
+
+
+def _split_complete(carry, df, freq):
+    """
+    Split `carry` + `df` into rows whose `freq` period is complete and the rows of the
+    last (possibly still growing) period, which are carried into the next batch.
+    """
+    if carry is not None and len(carry):
+        df = pd.concat([carry, df])
+    if df.empty:
+        return df, df
+    last_start = df.index[-1].to_period(freq).start_time
+    cut = df.index.values.searchsorted(last_start.to_datetime64(), side='left')
+    return df.iloc[:cut], df.iloc[cut:]
+
+
+def _intra_week_series(df):
+    # EA+ for each station plus the all-station total, as on the Intra-Week page
+    series = {station: df[('EA+', station)] for station in df['EA+'].columns}
+    series['Total'] = station_totals(df)['EA+']
+    return series
+
+
+def _aggregate_block(df, freq, parts):
+    for period, align in ALIGNMENT.items():
+        if align == freq:
+            parts['periods'].setdefault(period, []).append(resample_data(df, period))
+            parts['totals'].setdefault(period, []).append(resample_data(station_totals(df), period))
+    for aggregation_period, align in INTRA_WEEK_ALIGNMENT.items():
+        if align == freq:
+            for station, series in _intra_week_series(df).items():
+                key = (station, aggregation_period)
+                parts['intra_week'].setdefault(key, []).append(intra_week_pattern(series, aggregation_period))
+
+
+def _merge_resampled(frames, period):
+    # Re-resampling bucket labels maps each onto itself and zero-fills buckets that
+    # fell in a gap between two blocks, exactly as a single resample would
+    return pd.concat(frames).resample(RESAMPLE_RULES[period]).sum()
+
+
+def _merge_patterns(frames):
+    merged = pd.concat(frames, axis=1).sort_index()
+    # The union of slot indexes may infer a freq that a single pivot_table never sets
+    merged.index = pd.TimedeltaIndex(merged.index.to_numpy(), name=merged.index.name)
+    return merged
+
+
+def aggregate_chunked(data_path=DATA_PATH, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Compute the dashboard rollups straight from the file at `data_path`.
+
+    Returns a dict with
+        'periods':    {period: resample_data(df, period)}
+        'totals':     {period: resample_data(station_totals(df), period)}
+        'intra_week': {(station or 'Total', 'Week' | 'Month'): intra_week_pattern(...)}
+    """
+    parts = {'periods': {}, 'totals': {}, 'intra_week': {}}
+    carries = {'W': None, 'M': None}
+
+    for batch in iter_batches(data_path, batch_rows):
+        for freq in carries:
+            complete, carries[freq] = _split_complete(carries[freq], batch, freq)
+            if len(complete):
+                _aggregate_block(complete, freq, parts)
+
+    for freq, carry in carries.items():
+        if carry is not None and len(carry):
+            _aggregate_block(carry, freq, parts)
+
+    # Merge one output at a time, dropping its parts straight away, so the merge
+    # never holds two copies of all the results at once
+    result = {'periods': {}, 'totals': {}, 'intra_week': {}}
+    for name, outputs in parts.items():
+        for key in list(outputs):
+            frames = outputs.pop(key)
+            if name == 'intra_week':
+                result[name][key] = _merge_patterns(frames)
+            else:
+                result[name][key] = _merge_resampled(frames, key)
+            del frames
+    return result
+
+
+def aggregate_in_memory(df):
+    """Reference rollups over a fully loaded frame, same layout as `aggregate_chunked`"""
+    intra_week = {}
+    for aggregation_period in INTRA_WEEK_ALIGNMENT:
+        for station, series in _intra_week_series(df).items():
+            intra_week[(station, aggregation_period)] = intra_week_pattern(series, aggregation_period)
+    return {
+        'periods': {period: resample_data(df, period) for period in ALIGNMENT},
+        'totals': {period: resample_data(station_totals(df), period) for period in ALIGNMENT},
+        'intra_week': intra_week,
+    }
@@ -0,0 +1,194 @@
+"""
+Period-over-period comparison of weeks, months or years.
+
+Every interval is placed on a grid of (period, position) through the integer codes
+of the calendar table, where the position is the slot counted from the start of the
+period: slot of the week, slot of the month (day of month x slots per day) or slot of
+the year. Periods of different lengths share the grid, and positions a period does
+not have (day 31 of a 30-day month, the hour skipped when summer time starts) are
+NaN rather than shifted. An hour repeated when summer time ends adds up in its slot.
+
+`aligned_cube` returns a (periods x positions x columns) array of energy per slot
+for every station and quantity, plus a 'Total' per quantity. `compare` takes one
+period and any number of reference periods and computes, with array operations
+over the whole cube slice:
+
+    profiles  energy per slot of each period
+    delta     current - reference per slot
+    pct       delta as a percentage of the reference
+    summary   per (measure, location): totals, mean per day (which makes months of
+              different length comparable) and their changes for each reference
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .calendar_index import DAY_NS, load_calendar, month_periods, week_periods
+from .utils import DATA_PATH, dataset_version, load_data, station_totals
+
+PERIOD_KINDS = ["Week", "Month", "Year"]
+# Longest period of each kind, in days
+PERIOD_DAYS = {"Week": 7, "Month": 31, "Year": 366}
+# Reference periods relative to the current one, in periods of the same kind
+REFERENCES = {
+    "Week": {"Previous week": 1, "Same week last year": 52},
+    "Month": {"Previous month": 1, "Same month last year": 12},
+    "Year": {"Previous year": 1},
+}
+
+
+def with_totals(tetarom_df):
+    """`tetarom_df` with a 'Total' location per measure"""
+    totals = station_totals(tetarom_df)
+    totals.columns = pd.MultiIndex.from_product([totals.columns, ['Total']], names=tetarom_df.columns.names)
+    return pd.concat([tetarom_df, totals], axis=1)
+
+
+def _period_start_days(period_index):
+    return period_index.start_time.as_unit('ns').asi8 // DAY_NS
+
+
+def period_codes(calendar, kind):
+    """
+    (period ids, position in period, PeriodIndex of ids 0 .. n - 1) for every row of
+    `calendar`; ids start at the first period in the data.
+    """
+    spd = calendar.attrs['slots_per_day']
+    day_id = calendar['day_id'].to_numpy(np.int64)
+    slot = calendar['slot'].to_numpy(np.int64)
+    if kind == "Week":
+        ordinals = calendar['week_id'].to_numpy(np.int64)
+        first = ordinals.min() if len(ordinals) else 0
+        periods = week_periods(np.arange(first, ordinals.max() + 1 if len(ordinals) else first))
+    elif kind in ("Month", "Year"):
+        ordinals = calendar['month_id'].to_numpy(np.int64)
+        if kind == "Year":
+            ordinals = ordinals // 12
+        first = ordinals.min() if len(ordinals) else 0
+        span = np.arange(first, ordinals.max() + 1 if len(ordinals) else first)
+        periods = month_periods(span) if kind == "Month" else pd.PeriodIndex.from_ordinals(span, freq='Y')
+    else:
+        raise ValueError(f"Invalid period: {kind}")
+
+    ids = ordinals - first
+    start_day = _period_start_days(periods)[ids] if len(ids) else ids
+    position = (day_id - start_day) * spd + slot
+    return ids, position, periods
+
+
+def aligned_cube(tetarom_df, calendar, kind):
+    """
+    (periods, cube, present, columns): cube[p, s, c] is the energy of column c in
+    slot s of period p, NaN where the slot has no reading, and present[p, c] counts
+    the slots of period p with a reading of column c.
+    """
+    df = with_totals(tetarom_df)
+    ids, position, periods = period_codes(calendar, kind)
+    n_positions = PERIOD_DAYS[kind] * calendar.attrs['slots_per_day']
+    values = df.to_numpy(dtype=np.float64)
+    n_cols = values.shape[1]
+
+    # Sum everything that lands in the same cell with one bincount over flat cell codes
+    cells = (ids * n_positions + position)[:, None] * n_cols + np.arange(n_cols)
+    valid = np.isfinite(values)
+    size = len(periods) * n_positions * n_cols
+    sums = np.bincount(cells[valid], weights=values[valid], minlength=size)
+    counts = np.bincount(cells[valid], minlength=size)
+    cube = np.where(counts > 0, sums, np.nan).reshape(len(periods), n_positions, n_cols)
+    present = counts.reshape(len(periods), n_positions, n_cols).astype(bool).sum(axis=1)
+    return periods, cube, present, df.columns
+
+
+def compare(periods, cube, present, columns, current, references, slots_per_day):
+    """
+    Compare period `current` with each of `references` (all labels of `periods`).
+    See the module docstring for the returned frames.
+    """
+    positions = np.arange(cube.shape[1])
+    labels = pd.PeriodIndex([current, *references], freq=periods.freq)
+    idx = periods.get_indexer(labels)
+    if (idx < 0).any():
+        missing = [str(label) for label, i in zip(labels, idx) if i < 0]
+        raise KeyError(f"No data for period: {', '.join(missing)}")
+
+    selected = cube[idx]                       # (1 + refs, positions, columns)
+    cur, ref = selected[:1], selected[1:]
+    delta = cur - ref
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct = np.where(ref != 0, 100 * delta / np.abs(ref), np.nan)
+
+    # Drop positions no selected period has (e.g. days 29-31 when comparing Februaries)
+    keep = ~np.isnan(selected).all(axis=(0, 2))
+    offsets = pd.TimedeltaIndex(positions[keep] * (DAY_NS // slots_per_day), name='offset')
+
+    def frame(arr, names):
+        flat = arr[:, keep].transpose(1, 0, 2).reshape(keep.sum(), -1)
+        cols = pd.MultiIndex.from_tuples(
+            [(name, *col) for name in names for col in columns],
+            names=['period', *columns.names]
+        )
+        return pd.DataFrame(flat, index=offsets, columns=cols)
+
+    names = [str(label) for label in labels]
+    totals = np.nansum(selected, axis=1)      # (1 + refs, columns)
+    days = present[idx] / slots_per_day
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_day = np.where(days > 0, totals / days, np.nan)
+        summary = {('', 'days'): days[0], ('', 'total'): totals[0], ('', 'per day'): per_day[0]}
+        for name, t, d in zip(names[1:], totals[1:], per_day[1:]):
+            summary[(name, 'total')] = t
+            summary[(name, 'total change %')] = np.where(t != 0, 100 * (totals[0] - t) / np.abs(t), np.nan)
+            summary[(name, 'per day')] = d
+            summary[(name, 'per day change %')] = np.where(d != 0, 100 * (per_day[0] - d) / np.abs(d), np.nan)
+    summary = pd.DataFrame(summary, index=columns)
+    summary.columns = pd.MultiIndex.from_tuples(summary.columns, names=['reference', 'value'])
+
+    return {
+        'profiles': frame(selected, names),
+        'delta': frame(delta, names[1:]),
+        'pct': frame(pct, names[1:]),
+        'summary': summary,
+    }
+
+
+def reference_periods(periods, current, kind, choices):
+    """Labels of the reference periods named in `choices` that exist in `periods`"""
+    refs = []
+    for choice in choices:
+        ref = current - REFERENCES[kind][choice]
+        if ref in periods and ref not in refs:
+            refs.append(ref)
+    return refs
+
+
+def default_period(periods, present):
+    """Latest period with at least 90% of the coverage of the best covered one"""
+    coverage = present.max(axis=1) if present.size else np.zeros(len(periods))
+    if not len(coverage) or coverage.max() == 0:
+        return None
+    return periods[np.nonzero(coverage >= 0.9 * coverage.max())[0][-1]]
+
+
+def load_aligned(kind, data_path=DATA_PATH):
+    return _load_aligned(data_path, dataset_version(data_path), kind)
+
+
+@st.cache_data
+def _load_aligned(data_path, version, kind):
+    return aligned_cube(load_data(data_path), load_calendar(data_path), kind)
+
+
+@st.cache_data
+def _compare(data_path, version, kind, current, references):
+    periods, cube, present, columns = _load_aligned(data_path, version, kind)
+    by_label = dict(zip(periods.astype(str), periods))
+    missing = [label for label in (current, *references) if label not in by_label]
+    if missing:
+        raise KeyError(f"No data for period: {', '.join(missing)}")
+    return compare(periods, cube, present, columns, by_label[current], [by_label[r] for r in references],
+                   load_calendar(data_path).attrs['slots_per_day'])
+
+
+def load_comparison(kind, current, references, data_path=DATA_PATH):
+    """Cached `compare` for the current dataset version; periods are given as their labels"""
+    return _compare(data_path, dataset_version(data_path), kind, str(current), tuple(str(r) for r in references))
@@ -0,0 +1,182 @@
+"""
+Power factor and capacitor-bank sizing on the per-station EA, ER+ and ER- columns.
+
+    power_factor      cos φ of each interval, from the net active and reactive energy
+    monthly_billing   energy, cos φ and billed reactive energy per billing period (month)
+    required_kvar     reactive power (kvar) a bank must supply in each interval to bring
+                      ER+ / EA down to `limit_x1`
+    bank_savings      billed reactive energy and savings for a whole array of bank sizes
+
+Reactive energy is billed per month on the energy accumulated over the month: what
+exceeds `limit_x1` times EA is billed once, and what also exceeds `limit_x3` times
+EA counts three times. ER- is billed the same way, so an oversized fixed bank shows
+up as capacitive energy.
+
+A bank of size B kvar supplies up to B times the interval length kvarh per interval:
+
+    switched   an automatic bank switches in only what brings the interval down to
+               `target` (tan φ, `limit_x1` by default), so it never overcompensates
+    fixed      a fixed bank supplies its full output all the time; what exceeds the
+               interval's ER+ comes back as ER-
+
+`bank_savings` evaluates hundreds of sizes at once: the sizes are broadcast against
+the interval arrays in blocks of BLOCK_CELLS (size, interval) cells, and the monthly
+sums of a whole block are one `np.bincount` over (size, month) codes.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .calendar_index import load_calendar, month_periods
+from .figures import LIMIT_X1, LIMIT_X3, reactive_frame, stations
+from .reactive import MIN_ENERGY
+from .utils import DATA_PATH, dataset_version, load_data
+
+BANK_MODES = ('switched', 'fixed')
+# Sizes x intervals evaluated at once; about 8 MB per float64 temporary
+BLOCK_CELLS = 2**20
+# Candidate sizes evaluated by default, from 0 to the largest requirement
+N_SIZES = 250
+
+
+def _arrays(tetarom_df, station):
+    """EA, ER+ and ER- of one station as float64 arrays, NaN as 0"""
+    values = np.nan_to_num(reactive_frame(tetarom_df, station).to_numpy(dtype=np.float64))
+    return values.T
+
+
+def _interval_hours(calendar):
+    return 24 / calendar.attrs['slots_per_day']
+
+
+def power_factor(tetarom_df):
+    """cos φ per interval and station; NaN where EA is below MIN_ENERGY"""
+    result = {}
+    for station in stations(tetarom_df):
+        ea, er_plus, er_minus = _arrays(tetarom_df, station)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cos_phi = ea / np.hypot(ea, er_plus - er_minus)
+        result[station] = np.where(ea >= MIN_ENERGY, cos_phi, np.nan)
+    return pd.DataFrame(result, index=tetarom_df.index).rename_axis(columns='location')
+
+
+def billed_energy(ea, er, limit_x1=LIMIT_X1, limit_x3=LIMIT_X3):
+    """Billed kvarh of reactive energy `er` against active energy `ea` (broadcast)"""
+    return np.maximum(er - limit_x1 * ea, 0) + 2 * np.maximum(er - limit_x3 * ea, 0)
+
+
+def month_codes(month_ids):
+    """Month code (0, 1, ...) of each interval, and the months of the codes"""
+    months, codes = np.unique(month_ids, return_inverse=True)
+    return codes, month_periods(months)
+
+
+def month_sums(values, codes, n_months):
+    """(rows x months) sums of each row of `values` (rows x intervals) per month code"""
+    values = np.atleast_2d(values)
+    # Row r, month m is bin r * n_months + m
+    bins = codes + n_months * np.arange(len(values))[:, None]
+    sums = np.bincount(bins.ravel(), weights=values.ravel(), minlength=len(values) * n_months)
+    return sums.reshape(len(values), n_months)
+
+
+def monthly_billing(tetarom_df, station, calendar, limit_x1=LIMIT_X1, limit_x3=LIMIT_X3):
+    """Energy, cos φ and billed reactive energy of one station per month"""
+    ea, er_plus, er_minus = _arrays(tetarom_df, station)
+    codes, months = month_codes(calendar['month_id'].to_numpy())
+    ea_m, plus_m, minus_m = month_sums(np.stack([ea, er_plus, er_minus]), codes, len(months))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_phi = np.where(ea_m >= MIN_ENERGY, ea_m / np.hypot(ea_m, plus_m - minus_m), np.nan)
+    return pd.DataFrame({
+        'EA kWh': ea_m,
+        'ER+ kvarh': plus_m,
+        'ER- kvarh': minus_m,
+        'cos φ': cos_phi,
+        'Billed ER+ kvarh': billed_energy(ea_m, plus_m, limit_x1, limit_x3),
+        'Billed ER- kvarh': billed_energy(ea_m, minus_m, limit_x1, limit_x3),
+    }, index=months.rename('month'))
+
+
+def required_kvar(tetarom_df, calendar, limit_x1=LIMIT_X1):
+    """kvar needed per interval and station to bring ER+ / EA down to `limit_x1`"""
+    hours = _interval_hours(calendar)
+    result = {}
+    for station in stations(tetarom_df):
+        ea, er_plus, _ = _arrays(tetarom_df, station)
+        result[station] = np.maximum(er_plus - limit_x1 * np.maximum(ea, 0), 0) / hours
+    return pd.DataFrame(result, index=tetarom_df.index).rename_axis(columns='location')
+
+
+def bank_savings(tetarom_df, station, calendar, sizes, mode='switched', target=LIMIT_X1,
+                 limit_x1=LIMIT_X1, limit_x3=LIMIT_X3):
+    """
+    Billed reactive energy with a bank of each size in `sizes` (kvar), the kvarh saved
+    against no bank, and the share of intervals left above `limit_x1`
+    """
+    if mode not in BANK_MODES:
+        raise ValueError(f"Invalid bank mode: {mode}")
+    sizes = np.asarray(sizes, dtype=np.float64)
+    ea, er_plus, er_minus = _arrays(tetarom_df, station)
+    codes, months = month_codes(calendar['month_id'].to_numpy())
+    ea_m = month_sums(ea, codes, len(months))[0]
+    valid = ea >= MIN_ENERGY
+    # What a switched bank compensates at most in each interval
+    need = np.maximum(er_plus - target * np.maximum(ea, 0), 0)
+
+    billed = np.empty(len(sizes))
+    over = np.empty(len(sizes))
+    block = max(BLOCK_CELLS // max(len(ea), 1), 1)
+    for start in range(0, len(sizes), block):
+        # (sizes, 1) against (intervals,): one row per candidate bank
+        output = sizes[start:start + block, None] * _interval_hours(calendar)
+        if mode == 'switched':
+            plus = er_plus - np.minimum(output, need)
+            minus = er_minus
+        else:
+            plus = np.maximum(er_plus - output, 0)
+            minus = er_minus + np.maximum(output - er_plus, 0)
+        plus_m = month_sums(plus, codes, len(months))
+        minus_m = month_sums(minus, codes, len(months))
+        billed[start:start + block] = (billed_energy(ea_m, plus_m, limit_x1, limit_x3)
+                                       + billed_energy(ea_m, minus_m, limit_x1, limit_x3)).sum(axis=1)
+        over[start:start + block] = np.count_nonzero((plus > limit_x1 * ea) & valid, axis=1)
+
+    plus_m, minus_m = month_sums(np.stack([er_plus, er_minus]), codes, len(months))
+    baseline = (billed_energy(ea_m, plus_m, limit_x1, limit_x3) + billed_energy(ea_m, minus_m, limit_x1, limit_x3)).sum()
+    return pd.DataFrame({
+        'Billed kvarh': billed,
+        'Saved kvarh': baseline - billed,
+        'Intervals over x1 %': 100 * over / max(int(valid.sum()), 1),
+    }, index=pd.Index(sizes, name='kvar'))
+
+
+def candidate_sizes(kvar, n=N_SIZES):
+    """`n` evenly spaced bank sizes from 0 to the largest requirement, rounded up to a kvar"""
+    return np.linspace(0, np.ceil(np.nanmax(kvar.to_numpy(), initial=0)), n)
+
+
+def load_compensation(data_path=DATA_PATH):
+    return _load_compensation(data_path, dataset_version(data_path))
+
+
+@st.cache_data
+def _load_compensation(data_path, version):
+    tetarom_df = load_data(data_path)
+    calendar = load_calendar(data_path)
+    return {
+        'cos_phi': power_factor(tetarom_df),
+        'kvar': required_kvar(tetarom_df, calendar),
+        'monthly': {station: monthly_billing(tetarom_df, station, calendar) for station in stations(tetarom_df)},
+    }
+
+
+def load_bank_savings(station, mode, n_sizes=N_SIZES, data_path=DATA_PATH):
+    return _load_bank_savings(data_path, dataset_version(data_path), station, mode, n_sizes)
+
+
+@st.cache_data
+def _load_bank_savings(data_path, version, station, mode, n_sizes):
+    tetarom_df = load_data(data_path)
+    calendar = load_calendar(data_path)
+    sizes = candidate_sizes(load_compensation(data_path)['kvar'][station], n_sizes)
+    return bank_savings(tetarom_df, station, calendar, sizes, mode)
@@ -0,0 +1,264 @@
+"""
+Headless batch export of the dashboard pages.
+
+    python -m energy_dashboard.export --out reports --formats html csv parquet --workers 8
+
+Renders Data Overview (per aggregation period), Intra-Week (per station and view),
+Reactive Energy (per station and calendar month) and Forecasts (per station) with
+the same functions the pages use, writing each figure as HTML/PNG and the data
+behind it as CSV/Parquet.
+
+Each output is fingerprinted from the slice of data it is computed from, its
+parameters and the plotting code. `manifest.json` in the output directory keeps
+the fingerprints of the last run, and only outputs whose fingerprint changed (or
+whose files are missing) are rendered again, spread over a process pool.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .utils import DATA_PATH, FORECAST_DATA_PATH, load_data, load_forecast_data, intra_week_pattern, window_slice
+from .calendar_index import calendar_table
+from .sites import get_site
+from . import figures
+
+FORMATS = ('html', 'png', 'csv', 'parquet')
+SECTIONS = ('overview', 'intra_week', 'reactive', 'forecast')
+OVERVIEW_PERIODS = ["6-hours", "Day", "Week", "Month"]
+OVERVIEW_UNIT = "MWh"
+INTRA_WEEK_PERIODS = ["Week", "Month"]
+MANIFEST = 'manifest.json'
+
+# Code that shapes the outputs (the figures, the calendar aggregations and the
+# rendering here); editing any of it invalidates every fingerprint
+_SOURCES = ('figures.py', 'traces.py', 'utils.py', 'calendar_index.py', 'export.py')
+
+# Per-process copies of the datasets, filled by _init_worker
+_DATA = {}
+
+
+def _code_fingerprint():
+    digest = hashlib.sha1()
+    for name in _SOURCES:
+        with open(os.path.join(os.path.dirname(__file__), name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _frame_fingerprint(*objs):
+    digest = hashlib.sha1()
+    for obj in objs:
+        digest.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def _month_window(tetarom_df, month):
+    return tetarom_df.iloc[window_slice(tetarom_df.index, month.start_time, month.end_time)]
+
+
+def _forecast_history(tetarom_df, forecast_df):
+    # Same rows forecast_figure draws
+    index = tetarom_df.index
+    return tetarom_df[(index >= figures.FORECAST_HISTORY_START) & (index <= forecast_df.index[0])]
+
+
+def _slug(text):
+    return str(text).replace(' ', '_').replace('/', '-')
+
+
+def plan(tetarom_df, forecast_df, sections=SECTIONS):
+    """
+    Every export job as (stem, section, params, input frames).
+
+    The input frames are what the job's fingerprint is computed from: exactly the
+    data the corresponding figure is drawn from.
+    """
+    jobs = []
+    if 'overview' in sections:
+        for period in OVERVIEW_PERIODS:
+            jobs.append((f"overview/{_slug(period)}", 'overview', {'period': period}, [tetarom_df]))
+
+    if 'intra_week' in sections:
+        for station in figures.stations(tetarom_df) + ['Total']:
+            series = figures.intra_week_series(tetarom_df, station)
+            for period in INTRA_WEEK_PERIODS:
+                stem = f"intra_week/{_slug(station)}_{period.lower()}"
+                jobs.append((stem, 'intra_week', {'station': station, 'period': period}, [series]))
+
+    if 'reactive' in sections:
+        for station in figures.stations(tetarom_df):
+            for month in tetarom_df.index.to_period('M').unique():
+                window = _month_window(tetarom_df, month)
+                stem = f"reactive/{_slug(station)}/{month}"
+                jobs.append((stem, 'reactive', {'station': station, 'month': str(month)},
+                             [figures.reactive_frame(window, station)]))
+
+    if 'forecast' in sections and not forecast_df.empty:
+        history = _forecast_history(tetarom_df, forecast_df)
+        for station in forecast_df.columns.get_level_values(0).unique():
+            stem = f"forecast/{_slug(station)}"
+            jobs.append((stem, 'forecast', {'station': station}, [forecast_df[station], history]))
+    return jobs
+
+
+def _init_worker(data_path, forecast_path):
+    _DATA['tetarom'] = load_data(data_path)
+    _DATA['calendar'] = calendar_table(_DATA['tetarom'].index)
+    _DATA['forecast'] = load_forecast_data(forecast_path) if forecast_path else pd.DataFrame()
+
+
+def _render(section, params):
+    """Figures and data frames of one job, keyed by file name suffix"""
+    tetarom_df = _DATA['tetarom']
+    if section == 'overview':
+        resampled_df = figures.overview_frame(tetarom_df, params['period'], OVERVIEW_UNIT, _DATA['calendar'])
+        fig = figures.overview_figure(resampled_df, params['period'], OVERVIEW_UNIT, figures.stations(tetarom_df))
+        return {'': fig}, {'': resampled_df}
+
+    if section == 'intra_week':
+        series = figures.intra_week_series(tetarom_df, params['station'])
+        pattern = intra_week_pattern(series, params['period'], _DATA['calendar'])
+        fig = figures.intra_week_figure(pattern, params['station'], params['period'])
+        pattern = pattern.set_axis(pattern.columns.astype(str), axis=1)
+        return {'': fig}, {'': pattern}
+
+    if section == 'reactive':
+        window = _month_window(tetarom_df, pd.Period(params['month'], 'M'))
+        df = figures.reactive_frame(window, params['station'])
+        erpc = figures.ratio_frame(df)
+        usage = figures.reactive_usage_figure(df, params['station'])
+        ratio = figures.reactive_ratio_figure(erpc, params['station'])
+        return {'_usage': usage, '_ratio': ratio}, {'': df.join(erpc[['ER+ %age', 'ER- %age']])}
+
+    if section == 'forecast':
+        forecast_df = _DATA['forecast']
+        fig = figures.forecast_figure(forecast_df, tetarom_df, params['station'])
+        return {'': fig}, {'': forecast_df[params['station']]}
+
+    raise ValueError(f"Invalid section: {section}")
+
+
+def _outputs(stem, section, formats):
+    figure_suffixes = ['_usage', '_ratio'] if section == 'reactive' else ['']
+    paths = []
+    for fmt in formats:
+        suffixes = figure_suffixes if fmt in ('html', 'png') else ['']
+        paths.extend(f"{stem}{suffix}.{fmt}" for suffix in suffixes)
+    return paths
+
+
+def run_job(out_dir, stem, section, params, formats):
+    figs, frames = _render(section, params)
+    base = os.path.join(out_dir, stem)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    for suffix, fig in figs.items():
+        if 'html' in formats:
+            fig.write_html(f"{base}{suffix}.html", include_plotlyjs='cdn')
+        if 'png' in formats:
+            fig.write_image(f"{base}{suffix}.png", width=1600, height=fig.layout.height or 600)
+    for suffix, frame in frames.items():
+        if 'csv' in formats:
+            frame.to_csv(f"{base}{suffix}.csv")
+        if 'parquet' in formats:
+            frame.to_parquet(f"{base}{suffix}.parquet")
+    return stem
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def export(out_dir, formats=('html', 'csv'), sections=SECTIONS, workers=None, force=False,
+           data_path=DATA_PATH, forecast_path=FORECAST_DATA_PATH):
+    """Render every changed output into `out_dir`; returns (written, skipped) stems"""
+    os.makedirs(out_dir, exist_ok=True)
+    tetarom_df = load_data(data_path)
+    # Sites without forecasts simply have no forecast outputs
+    forecast_df = load_forecast_data(forecast_path) if forecast_path else pd.DataFrame()
+    code = _code_fingerprint()
+
+    manifest = {} if force else _load_manifest(out_dir)
+    todo, skipped = [], []
+    for stem, section, params, inputs in plan(tetarom_df, forecast_df, sections):
+        key = hashlib.sha1(json.dumps([code, sorted(formats), params]).encode())
+        key.update(_frame_fingerprint(*inputs).encode())
+        key = key.hexdigest()
+        outputs = _outputs(stem, section, formats)
+        if manifest.get(stem) == key and all(os.path.exists(os.path.join(out_dir, p)) for p in outputs):
+            skipped.append(stem)
+        else:
+            todo.append((stem, section, params, key))
+
+    written = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_path, forecast_path)) as pool:
+            futures = {
+                pool.submit(run_job, out_dir, stem, section, params, formats): (stem, key)
+                for stem, section, params, key in todo
+            }
+            try:
+                for future in as_completed(futures):
+                    stem, key = futures[future]
+                    future.result()
+                    manifest[stem] = key
+                    written.append(stem)
+                    # Record progress as we go so an interrupted run keeps what it finished
+                    if len(written) % 20 == 0:
+                        _save_manifest(out_dir, manifest)
+            finally:
+                # Also when a job failed: the finished ones need not be rendered again
+                _save_manifest(out_dir, manifest)
+    else:
+        _save_manifest(out_dir, manifest)
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every dashboard page for every station and period")
+    parser.add_argument('--out', default='reports', help="output directory")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['html', 'csv'])
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument('--workers', type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="render everything, ignoring the manifest")
+    parser.add_argument('--site', help="site from the registry; overrides --data and --forecast-data")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--forecast-data', default=FORECAST_DATA_PATH)
+    args = parser.parse_args()
+
+    if args.site:
+        try:
+            site = get_site(args.site)
+        except KeyError:
+            parser.error(f"Unknown site: {args.site}")
+        args.data, args.forecast_data = site.data_path, site.forecast_path
+
+    if 'png' in args.formats:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error("PNG export needs the 'kaleido' package")
+
+    written, skipped = export(args.out, args.formats, args.sections, args.workers, args.force,
+                              args.data, args.forecast_data)
+    print(f"Wrote {len(written)} outputs, {len(skipped)} unchanged, into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
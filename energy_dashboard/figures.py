@@ -0,0 +1,734 @@
+"""
+Data preparation and figures behind each dashboard page.
+
+The pages only read their widgets and call these; the headless exporter calls the
+same functions, so an exported report is exactly what the page would show.
+"""
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from .utils import COLORS, resample_data, station_totals, update_plot_style
+from .traces import make_trace, make_band
+
+# Reactive energy limits, as a fraction of active energy
+LIMIT_X1 = 0.4843  # 48.43%
+LIMIT_X3 = 1.1691  # 116.91%
+
+# History shown before the forecast starts
+FORECAST_HISTORY_START = '2024-11-01'
+
+# Color scheme for stations on the overview
+STATION_COLORS = {
+    'Statia Jucu 1': '#1f77b4',  # blue
+    'Statia Jucu 2': '#2ca02c',  # green
+}
+
+# Line style of each measure on the overview
+MEASURE_STYLES = {
+    'EA+': dict(symbol=None, dash=None, opacity=None),
+    'EA-': dict(symbol='x', dash='dash', opacity=None),
+    'ER+': dict(symbol='diamond', dash='dot', opacity=0.7),
+    'ER-': dict(symbol='triangle-up', dash='dashdot', opacity=0.7),
+}
+
+
+def stations(tetarom_df):
+    return list(tetarom_df.columns.get_level_values('location').unique())
+
+
+# Data Overview
+
+def overview_frame(tetarom_df, resample_period, unit, calendar=None):
+    """Resampled data with flattened 'measure - location' columns, in kWh or MWh"""
+    # Convert MultiIndex DataFrame to regular DataFrame with flattened column names
+    flat_df = tetarom_df.copy()
+    flat_df.columns = [f"{col[0]} - {col[1]}" for col in tetarom_df.columns]
+
+    resampled_df = resample_data(flat_df, resample_period, calendar)
+
+    # Convert to MWh only if selected
+    if unit == "MWh":
+        resampled_df = resampled_df / 1000
+    return resampled_df
+
+
+def overview_figure(resampled_df, resample_period, unit, station_names):
+    fig1 = go.Figure()
+
+    # Add traces with consistent colors
+    for station in station_names:
+        color = STATION_COLORS.get(station)
+        for measure, style in MEASURE_STYLES.items():
+            marker = dict(color=color, size=1)
+            if style['symbol']:
+                marker['symbol'] = style['symbol']
+            line = dict(color=color, shape='linear')
+            if style['dash']:
+                line['dash'] = style['dash']
+            extra = dict(opacity=style['opacity']) if style['opacity'] else {}
+            fig1.add_trace(make_trace(
+                x=resampled_df.index,
+                y=resampled_df[f'{measure} - {station}'],
+                name=f'{measure} - {station}',
+                mode='lines+markers',
+                marker=marker,
+                line=line,
+                connectgaps=False,
+                legendgroup=f'group_{station}',
+                **extra
+            ))
+
+    fig1.update_layout(
+        height=600,
+        showlegend=True,
+        xaxis_title="Time",
+        yaxis_title=f"Energy Consumption ({unit})",
+        hovermode='x unified',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title=dict(
+            text=f"Energy Consumption Overview ({resample_period}ly)",
+            y=0.98,
+            x=0.5,
+            xanchor='center',
+            yanchor='top'
+        ),
+        margin=dict(l=50, r=20, t=80, b=20),
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor='rgba(255,255,255,0.8)',
+            groupclick="toggleitem"
+        ),
+        xaxis=dict(
+            type="date"
+        )
+    )
+
+    # Update axes formatting
+    fig1.update_yaxes(
+        gridcolor='rgba(128,128,128,0.1)',
+        zeroline=False,
+        tickformat=",.1f",
+        ticksuffix=f" {unit}"
+    )
+
+    fig1.update_xaxes(gridcolor='rgba(128,128,128,0.1)', zeroline=False)
+
+    # Update hover template
+    fig1.update_traces(
+        hovertemplate="%{y:,.1f} " + unit + "<br>%{x}<extra></extra>"
+    )
+
+    # Apply the styling
+    return update_plot_style(fig1)
+
+
+# Intra-Week Analysis
+
+def intra_week_series(tetarom_df, station):
+    """EA+ of one station, or of all stations summed for 'Total'"""
+    if station != "Total":
+        return tetarom_df[('EA+', station)]
+    return station_totals(tetarom_df)['EA+']
+
+
+def intra_week_figure(pattern, station, aggregation_period):
+    fig4 = go.Figure()
+
+    # Calculate color intensities based on chronological order
+    n_periods = len(pattern.columns)
+    x = pattern.index.total_seconds()/3600/24
+
+    # Add a line for each period in reverse order
+    for idx, column in enumerate(reversed(pattern.columns)):
+        opacity = 1 - (0.92 * idx / max(n_periods - 1, 1))
+        label = column.strftime('%Y-%m') if aggregation_period == "Month" else column.strftime('%Y-%m-%d')
+        fig4.add_trace(
+            make_trace(
+                x=x,
+                y=pattern[column],
+                name=label,
+                mode='lines',
+                line=dict(
+                    width=1.5,
+                    color=f'rgba(31, 119, 180, {opacity})',
+                    shape='spline',
+                    smoothing=0.3
+                ),
+                hovertemplate='%{y:.1f} kWh<br>%{text}<extra></extra>',
+                text=[label] * len(pattern.index)
+            )
+        )
+
+    # Update layout and styling
+    fig4.update_layout(
+        title=dict(
+            text=f"Intra-Week Consumption Pattern - {station}",
+            y=0.98,
+            x=0.5,
+            xanchor='center',
+            yanchor='top'
+        ),
+        height=600,
+        xaxis_title="Day of Week",
+        yaxis_title="Energy Consumption (kWh)",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=50, r=20, t=80, b=20),
+        legend=dict(
+            title=f"{aggregation_period}",
+            yanchor="top",
+            y=0.99,
+            xanchor="right",
+            x=0.99,
+            bgcolor='rgba(255,255,255,0.9)',
+            bordercolor='rgba(0,0,0,0.1)',
+            borderwidth=1,
+            font=dict(size=8)
+        ),
+        showlegend=True
+    )
+
+    # Update axes
+    fig4.update_xaxes(
+        gridcolor='rgba(128,128,128,0.1)',
+        zeroline=False,
+        ticktext=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+        tickvals=[0, 1, 2, 3, 4, 5, 6],
+        tickmode='array',
+        tickangle=0,
+        showgrid=True
+    )
+
+    fig4.update_yaxes(
+        gridcolor='rgba(128,128,128,0.1)',
+        zeroline=False,
+        ticksuffix=" kWh",
+        showgrid=True
+    )
+
+    # Apply the styling
+    return update_plot_style(fig4)
+
+
+# Reactive Energy
+
+def reactive_frame(tetarom_df, station):
+    """Net active energy and both reactive energies of one station"""
+    df = tetarom_df.loc[:, pd.IndexSlice[:, station]].copy().droplevel('location', axis=1)
+    df['EA'] = df['EA+'] - df['EA-']
+    return df[['EA', 'ER+', 'ER-']]
+
+
+def ratio_frame(df):
+    # Calculate percentages
+    return pd.DataFrame({
+        'ER+ %age': df['ER+'] / df['EA'],
+        'ER- %age': df['ER-'] / df['EA'],
+        'EA': df['EA']
+    })
+
+
+def find_intersection_point(x1, y1, x2, y2, limit):
+    """Find the point where the line crosses the limit"""
+    if pd.isna(y1) or pd.isna(y2):  # Handle NaN values
+        return None
+
+    if (y1 > limit and y2 < limit) or (y1 < limit and y2 > limit):
+        # Linear interpolation to find exact crossing point
+        try:
+            dx = (x2 - x1).total_seconds()
+            dy = y2 - y1
+            slope = dy / dx
+            dx_intersection = (limit - y1) / slope
+            x_intersection = x1 + pd.Timedelta(seconds=float(dx_intersection))
+            return x_intersection, limit
+        except (ValueError, TypeError):
+            return None
+    return None
+
+
+def ratio_segments(ratio, limit, color):
+    """
+    Split a ratio series into line segments at the points where it crosses `limit`.
+
+    Returns (segments, dates, colors); segments above the limit are red.
+    """
+    segments = []
+    segment_dates = []
+    colors = []
+    current_segment = []
+    current_dates = []
+
+    for i in range(len(ratio.index) - 1):
+        date = ratio.index[i]
+        next_date = ratio.index[i + 1]
+        value = ratio.iloc[i]
+        next_value = ratio.iloc[i + 1]
+
+        if pd.isna(value) or pd.isna(next_value):
+            if current_segment:
+                segments.append(current_segment)
+                segment_dates.append(current_dates)
+                colors.append('red' if current_segment[-1] > limit else color)
+                current_segment = []
+                current_dates = []
+            continue
+
+        if not current_segment:
+            current_segment.append(value)
+            current_dates.append(date)
+
+        intersection = find_intersection_point(date, value, next_date, next_value, limit)
+
+        if intersection:
+            # Add the intersection point to current segment and start new segment
+            current_segment.append(limit)
+            current_dates.append(intersection[0])
+            segments.append(current_segment)
+            segment_dates.append(current_dates)
+            colors.append('red' if value > limit else color)
+
+            # Start new segment from intersection point
+            current_segment = [limit, next_value]
+            current_dates = [intersection[0], next_date]
+        else:
+            current_segment.append(next_value)
+            current_dates.append(next_date)
+
+    if current_segment:
+        segments.append(current_segment)
+        segment_dates.append(current_dates)
+        colors.append('red' if current_segment[-1] > limit else color)
+
+    return segments, segment_dates, colors
+
+
+def reactive_usage_figure(df, station):
+    # First plot - Reactive Energy Usage
+    fig1 = go.Figure()
+    for column in df.columns:
+        fig1.add_trace(make_trace(x=df.index, y=df[column], name=column, mode='lines'))
+
+    fig1.update_layout(
+        title=f"{station} Energy Usage",
+        template="plotly_white",
+        height=500,
+        xaxis_title="Time",
+        yaxis_title="Energy",
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01
+        ),
+        xaxis=dict(
+            type="date"
+        )
+    )
+
+    # Add traces to the rangeslider
+    for column in df.columns:
+        fig1.add_trace(
+            make_trace(
+                x=df.index,
+                y=df[column],
+                name=column,
+                showlegend=False,
+                xaxis='x',
+                yaxis='y2'
+            )
+        )
+
+    return update_plot_style(fig1)
+
+
+def reactive_ratio_figure(erpc, station, limit_x1=LIMIT_X1, limit_x3=LIMIT_X3):
+    fig2 = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # ER+ and ER- lines with color segments based on limit
+    for column, measure in [('ER+ %age', 'ER+'), ('ER- %age', 'ER-')]:
+        segments, dates, colors = ratio_segments(erpc[column], limit_x1, COLORS[measure])
+        first = True  # Show legend only for first segment
+        for segment, segment_dates, color in zip(segments, dates, colors):
+            fig2.add_trace(
+                make_trace(
+                    x=segment_dates,
+                    y=segment,
+                    name=column,
+                    line=dict(width=2, color=color),
+                    mode='lines',
+                    showlegend=first,
+                    connectgaps=False,
+                    hovertemplate="<b>Time</b>: %{x}<br>" +
+                                f"<b>{column}</b>: %{{y:.4f}}<br><extra></extra>"
+                ),
+                secondary_y=False
+            )
+            first = False
+
+    # Add EA trace with hover template
+    fig2.add_trace(
+        make_trace(
+            x=erpc.index,
+            y=erpc['EA'],
+            name="EA",
+            line=dict(color=COLORS['EA'], width=1),
+            opacity=0.1,
+            hovertemplate="<b>Time</b>: %{x}<br>" +
+                         "<b>EA</b>: %{y:.4f}<br><extra></extra>"
+        ),
+        secondary_y=True
+    )
+
+    # Add limit lines with names in legend
+    fig2.add_trace(
+        go.Scatter(
+            x=[None],
+            y=[None],
+            name=f"Limit x1 ({limit_x1})",
+            line=dict(color="red", dash="dash"),
+            showlegend=True,
+            legendgroup="limits"
+        )
+    )
+    fig2.add_trace(
+        go.Scatter(
+            x=[None],
+            y=[None],
+            name=f"Limit x3 ({limit_x3})",
+            line=dict(color="black", dash="dash"),
+            showlegend=True,
+            legendgroup="limits"
+        )
+    )
+
+    # Add the actual limit lines (without legend entries)
+    fig2.add_hline(y=limit_x1, line_dash="dash", line_color="red", showlegend=False)
+    fig2.add_hline(y=limit_x3, line_dash="dash", line_color="black", showlegend=False)
+
+    fig2.update_layout(
+        height=500,
+        title=f"{station} Reactive Energy %age Usage",
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            title_text="Data Series"
+        ),
+        xaxis=dict(
+            type="date"
+        )
+    )
+
+    fig2.update_yaxes(title_text="Percentage", secondary_y=False)
+    fig2.update_yaxes(title_text="EA", secondary_y=True)
+
+    return update_plot_style(fig2)
+
+
+# Data quality
+
+def add_incomplete_overlay(fig, ranges, interval=pd.Timedelta('15min')):
+    """Shade each (start, end) range of missing intervals, as returned by `incomplete_ranges`"""
+    for start, end in ranges:
+        fig.add_vrect(
+            x0=start - interval,
+            x1=end,
+            fillcolor='rgba(128,128,128,0.2)',
+            line_width=0,
+            layer='below'
+        )
+    return fig
+
+
+def completeness_figure(complete):
+    """Daily share of complete intervals per station, as a heatmap"""
+    daily = complete.resample('D').mean()
+    fig = go.Figure(
+        go.Heatmap(
+            x=daily.index,
+            y=daily.columns,
+            z=daily.T.to_numpy() * 100,
+            zmin=0,
+            zmax=100,
+            colorscale=[[0, '#d62728'], [0.9, '#ff7f0e'], [1, '#2ca02c']],
+            colorbar=dict(title='%', ticksuffix='%'),
+            hovertemplate="%{y}<br>%{x|%Y-%m-%d}: %{z:.1f}% complete<extra></extra>"
+        )
+    )
+    fig.update_layout(
+        title="Data Completeness",
+        height=150 + 60 * len(daily.columns),
+        xaxis=dict(type="date")
+    )
+    return update_plot_style(fig)
+
+
+# Forecasts
+
+def historical_ea(historical_df, station):
+    """Net active energy of a station, or of all stations for 'All'"""
+    if station == 'All':
+        locations = stations(historical_df)
+    else:
+        locations = [station]
+    ea = 0
+    for location in locations:
+        ea = ea + (historical_df[('EA+', location)] - historical_df[('EA-', location)])
+    return ea
+
+
+def forecast_figure(forecast_df, historical_df, station, history_start=FORECAST_HISTORY_START):
+    """
+    Historical EA followed by the forecast and its confidence band.
+
+    Raises KeyError if `station` has no forecast or history columns.
+    """
+    # Filter historical data from `history_start` until the start of forecast
+    historical_df = historical_df[
+        (historical_df.index >= history_start) &
+        (historical_df.index <= forecast_df.index[0])
+    ]
+    ea = historical_ea(historical_df, station)
+
+    fig = go.Figure()
+
+    # Add historical EA values
+    fig.add_trace(
+        make_trace(
+            x=historical_df.index,
+            y=ea,
+            name='y',
+            line=dict(color='blue')
+        )
+    )
+
+    # Add confidence interval (shaded area only, always SVG because of the fill)
+    fig.add_traces(
+        make_band(
+            x=forecast_df.index,
+            upper=forecast_df[(station, 'yhat_upper')],
+            lower=forecast_df[(station, 'yhat_lower')],
+            name='Confidence Interval',
+            fillcolor='rgba(68, 68, 68, 0.1)'
+        )
+    )
+
+    # Add forecast line
+    fig.add_trace(
+        make_trace(
+            x=forecast_df.index,
+            y=forecast_df[(station, 'yhat')],
+            name='ŷ',
+            line=dict(color='orange'),
+            mode='lines'
+        )
+    )
+
+    # Update plot style using the utility function
+    fig = update_plot_style(fig)
+
+    fig.update_layout(
+        title=f'Energy Consumption Forecast - {station}',
+        xaxis_title='Date',
+        yaxis_title='Energy Consumption',
+        height=600,
+        showlegend=True,
+        hovermode='x unified',
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor='rgba(255,255,255,0.8)',
+            title=dict(
+                text='EA Values',
+                side='top'
+            )
+        ),
+        xaxis=dict(
+            type="date"
+        )
+    )
+
+    # Update hover template
+    fig.update_traces(
+        hovertemplate="%{y:,.1f}<br>%{x}<extra></extra>"
+    )
+
+    return fig
+
+
+# Peak Demand
+
+def load_duration_figure(curve, quantiles=None):
+    """Load-duration curve of each column of `curve`, with optional horizontal quantile markers"""
+    fig = go.Figure()
+    for location in curve.columns:
+        fig.add_trace(
+            make_trace(
+                x=curve.index,
+                y=curve[location],
+                name=location,
+                mode='lines',
+                line=dict(color=STATION_COLORS.get(location, COLORS['Total']), width=1.5),
+                hovertemplate='%{y:.0f} kW exceeded %{x:.1f}% of the time<extra>' + location + '</extra>'
+            )
+        )
+    for q, value in (quantiles or {}).items():
+        fig.add_hline(y=value, line_dash='dot', line_color='gray', annotation_text=f"p{q * 100:g}")
+
+    fig = update_plot_style(fig)
+    fig.update_layout(
+        title="Load-Duration Curve",
+        xaxis_title="Share of time (%)",
+        yaxis_title="Demand (kW)",
+        height=500,
+        hovermode='x unified',
+        xaxis=dict(range=[0, 100], ticksuffix='%')
+    )
+    return fig
+
+
+def monthly_peaks_figure(monthly, station):
+    """Monthly maximum and quantiles of one station's demand"""
+    fig = go.Figure()
+    x = monthly.index.strftime('%Y-%m')
+    levels = monthly.columns.get_level_values('quantile').unique()
+    for level in levels:
+        name = 'Max' if level == 'max' else f"p{level * 100:g}"
+        fig.add_trace(
+            go.Bar(
+                x=x,
+                y=monthly[(level, station)],
+                name=name,
+                hovertemplate='%{y:.0f} kW<extra>' + name + '</extra>'
+            )
+        )
+
+    fig = update_plot_style(fig)
+    fig.update_layout(
+        title=f"Monthly Peak Demand - {station}",
+        xaxis_title="Month",
+        yaxis_title="Demand (kW)",
+        barmode='group',
+        height=450
+    )
+    return fig
+
+
+# Period Comparison
+
+COMPARISON_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#9467bd', '#8c564b', '#e377c2']
+
+
+def comparison_figure(result, measure, location, kind):
+    """Profiles of the compared periods (top) and the change against each reference (bottom)"""
+    profiles = result['profiles'].xs((measure, location), axis=1, level=['measure', 'location'])
+    delta = result['delta'].xs((measure, location), axis=1, level=['measure', 'location'])
+    x = profiles.index.total_seconds() / 3600 / 24
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.65, 0.35], vertical_spacing=0.06)
+    for i, period in enumerate(profiles.columns):
+        fig.add_trace(
+            make_trace(
+                x=x,
+                y=profiles[period],
+                name=period,
+                mode='lines',
+                line=dict(color=COMPARISON_COLORS[i % len(COMPARISON_COLORS)], width=2 if i == 0 else 1),
+                hovertemplate='%{y:.1f}<extra>' + period + '</extra>'
+            ),
+            row=1, col=1
+        )
+    for i, period in enumerate(delta.columns, start=1):
+        fig.add_trace(
+            make_trace(
+                x=x,
+                y=delta[period],
+                name=f"Δ vs {period}",
+                mode='lines',
+                line=dict(color=COMPARISON_COLORS[i % len(COMPARISON_COLORS)], width=1),
+                hovertemplate='%{y:+.1f}<extra>Δ vs ' + period + '</extra>'
+            ),
+            row=2, col=1
+        )
+    fig.add_hline(y=0, line_color='gray', line_width=1, row=2, col=1)
+
+    fig = update_plot_style(fig)
+    fig.update_layout(
+        title=f"{measure} - {location}: {profiles.columns[0]} compared",
+        height=700,
+        hovermode='x unified'
+    )
+    fig.update_xaxes(title_text=f"Days into the {kind.lower()}", row=2, col=1)
+    fig.update_yaxes(title_text=measure, row=1, col=1)
+    fig.update_yaxes(title_text="Change", row=2, col=1)
+    return fig
+
+
+# Compensation
+
+def kvar_distribution_figure(kvar, station):
+    """Histogram of the compensation one station needs, over the intervals that need any"""
+    needed = kvar[kvar > 0]
+    fig = go.Figure(
+        go.Histogram(
+            x=needed,
+            nbinsx=50,
+            marker_color=COLORS['ER+'],
+            hovertemplate='%{x} kvar: %{y} intervals<extra></extra>'
+        )
+    )
+    fig = update_plot_style(fig)
+    fig.update_layout(
+        title=f"Required Compensation - {station} ({len(needed)} of {len(kvar)} intervals)",
+        xaxis_title="Compensation (kvar)",
+        yaxis_title="Intervals",
+        height=450
+    )
+    return fig
+
+
+def bank_sizing_figure(savings, station, mode):
+    """Billed reactive energy saved and intervals left over the limit, against the bank size"""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(
+        make_trace(
+            x=savings.index,
+            y=savings['Saved kvarh'],
+            name="Saved kvarh",
+            mode='lines',
+            line=dict(color=COLORS['EA'], width=2),
+            hovertemplate='%{x:.0f} kvar: %{y:,.0f} kvarh saved<extra></extra>'
+        ),
+        secondary_y=False
+    )
+    fig.add_trace(
+        make_trace(
+            x=savings.index,
+            y=savings['Intervals over x1 %'],
+            name="Intervals over x1",
+            mode='lines',
+            line=dict(color=COLORS['ER+'], width=1.5, dash='dot'),
+            hovertemplate='%{x:.0f} kvar: %{y:.2f}% of intervals over x1<extra></extra>'
+        ),
+        secondary_y=True
+    )
+
+    fig = update_plot_style(fig)
+    fig.update_layout(
+        title=f"Capacitor Bank Sizing - {station} ({mode} bank)",
+        xaxis_title="Bank size (kvar)",
+        height=500,
+        hovermode='x unified'
+    )
+    fig.update_yaxes(title_text="Billed reactive energy saved (kvarh)", secondary_y=False)
+    fig.update_yaxes(title_text="Intervals over x1", ticksuffix='%', secondary_y=True)
+    return fig
@@ -0,0 +1,418 @@
+"""
+Live tail: new 15-minute intervals pushed by a local meter feed, on top of the
+historical dataset.
+
+The feed sends one JSON object per station and interval,
+
+    {"time": "2025-01-01T00:15:00", "location": "Statia Jucu 1",
+     "EA+": 812.0, "EA-": 0.0, "ER+": 95.0, "ER-": 1.0}
+
+either as lines on a TCP socket or as `*.jsonl` files dropped in a directory
+(write them under another name and rename them into place; they are renamed to
+`*.jsonl.done` once read). ENERGY_LIVE_SOURCE picks the feed:
+
+    dir:data/live              file-drop directory (default)
+    tcp:127.0.0.1:8601         socket the concentrator connects to
+
+`LiveTail` keeps the received intervals in a `RingBuffer` and updates, for the new
+intervals only:
+
+    rollups      bucket totals of each period, starting from the history; only the
+                 trailing buckets change
+    ratios       the `ReactiveRatio` running totals of each station
+    exceedance   whether each station's interval ER+ ratio is above limit x1 or x3,
+                 since when, and how many excursions there were
+    alerts       the rules of energy_dashboard.alerts, whose new alerts are written to
+                 `<data file>.alerts.jsonl`
+
+Intervals at or before a station's newest one are rejected, so nothing of the history
+is recomputed and each station's intervals come in time order. Stations need not keep
+pace with each other: one that lags behind fills in its values of intervals the others
+already sent, as long as they are still in the buffer, and the rollups, its ratios and
+its alert rules take them in the same way as new intervals. Intervals older than the
+whole buffer are rejected. `start_live` runs the feed on an asyncio loop in a
+background thread, shared by all sessions.
+
+A stand-in for the concentrator replays the last week of the dataset into a feed:
+
+    python -m energy_dashboard.live --to dir:data/live --intervals 96 --every 2
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .figures import LIMIT_X1, LIMIT_X3, reactive_frame
+from .reactive import MIN_ENERGY, ReactiveRatio
+from .alerts import AlertEngine, FileOutbox, load_rules, outbox_path
+from .utils import DATA_PATH, load_data, load_forecast_data, resample_data
+
+LIVE_SOURCE = os.environ.get('ENERGY_LIVE_SOURCE', 'dir:data/live')
+# Intervals kept in memory, four weeks of 15-minute data
+RING_CAPACITY = 4 * 7 * 96
+ROLLUP_PERIODS = ["6-hours", "Day", "Week", "Month"]
+# How often the directory feed looks for new files, in seconds
+POLL_SECONDS = 1.0
+DONE_SUFFIX = '.done'
+
+
+class RingBuffer:
+    """The newest `capacity` intervals as rows of `columns`; the oldest rows are overwritten"""
+
+    def __init__(self, capacity, columns, index_name='time'):
+        self.capacity = capacity
+        self.columns = columns
+        self.index_name = index_name
+        self.n = 0
+        self._end = 0  # slot after the newest row
+        self._times = np.empty(capacity, dtype='datetime64[ns]')
+        self._values = np.full((capacity, len(columns)), np.nan)
+
+    def _rows(self):
+        """Slots of the rows, oldest first"""
+        return (np.arange(self.n) + self._end - self.n) % self.capacity
+
+    @property
+    def first(self):
+        return self._times[(self._end - self.n) % self.capacity] if self.n else None
+
+    @property
+    def last(self):
+        return self._times[(self._end - 1) % self.capacity] if self.n else None
+
+    def accepts(self, time):
+        """Whether `put` can place an interval at `time`: anywhere until the buffer is full, then not before its oldest row"""
+        return self.n < self.capacity or time >= self.first
+
+    def put(self, time, values):
+        """
+        Add an interval, or fill in the values (the non-NaN ones of `values`) still
+        missing from the buffered interval at `time`
+        """
+        if not self.accepts(time):
+            raise ValueError("Interval older than the buffered ones")
+        if self.n and time <= self.last:
+            rows = self._rows()
+            times = self._times[rows]
+            position = times.searchsorted(time)
+            if times[position] == time:
+                np.copyto(self._values[rows[position]], values, where=~np.isnan(values))
+                return
+            # No station has sent this interval yet: rewrite the rows in order with it
+            # inserted, dropping the oldest if the buffer is full
+            times = np.insert(times, position, time)[-self.capacity:]
+            rows_values = np.insert(self._values[rows], position, values, axis=0)[-self.capacity:]
+            self.n = len(times)
+            self._times[:self.n], self._values[:self.n] = times, rows_values
+            self._end = self.n % self.capacity
+            return
+        self._times[self._end] = time
+        self._values[self._end] = values
+        self._end = (self._end + 1) % self.capacity
+        self.n = min(self.n + 1, self.capacity)
+
+    def frame(self):
+        rows = self._rows()
+        index = pd.DatetimeIndex(self._times[rows], name=self.index_name)
+        return pd.DataFrame(self._values[rows], index=index, columns=self.columns)
+
+
+def _add_buckets(totals, part):
+    """`totals` with the bucket sums of `part` added"""
+    new = ~part.index.isin(totals.index)
+    existing = part.index[~new]
+    if len(existing):
+        totals.loc[existing] = totals.loc[existing].to_numpy() + part.loc[existing].to_numpy()
+    if new.any():
+        totals = pd.concat([totals, part[new]])
+        if not totals.index.is_monotonic_increasing:
+            # A bucket skipped by an earlier batch, filled in by a lagging station
+            totals = totals.sort_index()
+    return totals
+
+
+class LiveTail:
+    """Historical dataset plus the intervals received since; see the module docstring"""
+
+    def __init__(self, history, capacity=RING_CAPACITY, periods=ROLLUP_PERIODS):
+        self.history = history
+        self.columns = history.columns
+        self.measures = list(history.columns.get_level_values('measure').unique())
+        self.stations = list(history.columns.get_level_values('location').unique())
+        self._positions = {
+            station: [self.columns.get_loc((measure, station)) for measure in self.measures]
+            for station in self.stations
+        }
+        self.buffer = RingBuffer(capacity, self.columns, history.index.name)
+        # The only passes over the history; everything after works on new intervals
+        self.rollups = {period: resample_data(history, period) for period in periods}
+        self.ratios = {station: ReactiveRatio(reactive_frame(history, station)) for station in self.stations}
+        end = history.index[-1].to_datetime64() if len(history) else pd.Timestamp.min.to_datetime64()
+        self.last = {station: end for station in self.stations}
+        self.exceedance = {
+            station: {'time': None, 'ratio': np.nan, 'level': None, 'since': None, 'excursions': 0}
+            for station in self.stations
+        }
+        self.received = 0
+        self.rejected = 0
+        self.error = None
+        # Optional AlertEngine, evaluated on every accepted batch
+        self.engine = None
+        self.lock = threading.Lock()
+
+    def _parse(self, record):
+        """(time, station, values) of a feed record, or None if it is malformed or of an unknown station"""
+        try:
+            time = pd.Timestamp(record['time']).as_unit('ns').to_datetime64()
+            station = record['location']
+            values = [float(record[measure]) for measure in self.measures]
+        except (KeyError, TypeError, ValueError):
+            return None
+        if station not in self.last:
+            return None
+        return time, station, values
+
+    def ingest(self, records):
+        """Add feed records (dicts, or None for unreadable ones); returns how many were accepted"""
+        parsed = sorted((p for p in map(self._parse, filter(None, records)) if p is not None), key=lambda p: p[0])
+        with self.lock:
+            accepted = []
+            last = dict(self.last)
+            for time, station, values in parsed:
+                # Rows are put in time order, so the buffer takes every row after one it takes
+                if not time > last[station] or not self.buffer.accepts(time):
+                    continue
+                last[station] = time
+                accepted.append((time, station, values))
+            if accepted:
+                self._apply(self._batch(accepted), last)
+            self.received += len(accepted)
+            self.rejected += len(records) - len(accepted)
+        return len(accepted)
+
+    def _batch(self, accepted):
+        times = np.unique([time for time, _, _ in accepted])
+        values = np.full((len(times), len(self.columns)), np.nan)
+        for time, station, row in accepted:
+            values[times.searchsorted(time), self._positions[station]] = row
+        return pd.DataFrame(values, index=pd.DatetimeIndex(times, name=self.history.index.name), columns=self.columns)
+
+    def _apply(self, batch, last):
+        """Add `batch`, whose rows `ingest` checked against the buffer, and take `last` as the newest intervals"""
+        values = batch.to_numpy()
+        for time, row in zip(batch.index.values, values):
+            self.buffer.put(time, row)
+        self.last = last
+
+        # Computed in full before any is replaced, so a failure leaves the old totals
+        self.rollups = {period: _add_buckets(totals, resample_data(batch, period))
+                        for period, totals in self.rollups.items()}
+
+        for station, positions in self._positions.items():
+            rows = ~np.isnan(values[:, positions]).all(axis=1)
+            if not rows.any():
+                continue
+            df = reactive_frame(batch[rows], station)
+            self.ratios[station].append(df)
+            self._update_exceedance(station, df)
+
+        if self.engine is not None:
+            self.engine.evaluate(batch)
+
+    def _update_exceedance(self, station, df):
+        state = self.exceedance[station]
+        for time, ea, er_plus in zip(df.index, df['EA'].to_numpy(), df['ER+'].to_numpy()):
+            ratio = er_plus / ea if ea >= MIN_ENERGY else np.nan
+            level = 'x3' if ratio > LIMIT_X3 else 'x1' if ratio > LIMIT_X1 else None
+            if level and state['level'] is None:
+                state['since'] = time
+                state['excursions'] += 1
+            elif level is None:
+                state['since'] = None
+            state.update(time=time, ratio=ratio, level=level)
+
+    # Reads for the page; each returns a copy taken under the lock
+
+    def status(self):
+        with self.lock:
+            return {
+                'received': self.received,
+                'rejected': self.rejected,
+                'buffered': self.buffer.n,
+                'history_end': self.history.index[-1] if len(self.history) else None,
+                'last': {station: pd.Timestamp(time) for station, time in self.last.items()},
+                'exceedance': {station: dict(state) for station, state in self.exceedance.items()},
+                'error': self.error,
+            }
+
+    def rollup(self, period, buckets):
+        """The last `buckets` totals of `period`, with flattened 'measure - location' columns"""
+        with self.lock:
+            df = self.rollups[period].iloc[-buckets:].copy()
+        df.columns = [f"{col[0]} - {col[1]}" for col in df.columns]
+        return df
+
+    def recent(self, since):
+        """History from `since` followed by the received intervals"""
+        history = self.history.loc[pd.Timestamp(since):]
+        with self.lock:
+            live = self.buffer.frame()
+        return pd.concat([history, live]) if len(live) else history
+
+    def ratio(self, station, window, since):
+        """Rolling or to-date ratios of `station` from `since`, including the received intervals"""
+        with self.lock:
+            return self.ratios[station].ratio(window, start=since)
+
+
+def _read_records(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    records.append(None)
+    return records
+
+
+async def watch_directory(tail, directory, poll=POLL_SECONDS):
+    """
+    Ingest `*.jsonl` files dropped in `directory`, oldest name first. A file that
+    fails is reported in `tail.error` and renamed like the others, so it is not
+    read again and the files after it still are
+    """
+    os.makedirs(directory, exist_ok=True)
+    while True:
+        for path in sorted(glob.glob(os.path.join(directory, '*.jsonl'))):
+            try:
+                tail.ingest(await asyncio.to_thread(_read_records, path))
+            except Exception as exc:
+                tail.error = f"{os.path.basename(path)}: {type(exc).__name__}: {exc}"
+                print(f"Live feed: {tail.error}", file=sys.stderr)
+            os.replace(path, path + DONE_SUFFIX)
+        await asyncio.sleep(poll)
+
+
+async def serve_socket(tail, host, port):
+    """Ingest JSON lines sent by any number of clients connecting to host:port"""
+    async def handle(reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                tail.ingest([record])
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_source(source):
+    """('dir', path) or ('tcp', host, port) from 'dir:PATH' or 'tcp:HOST:PORT'"""
+    kind, _, rest = source.partition(':')
+    if kind == 'dir' and rest:
+        return kind, rest
+    if kind == 'tcp':
+        host, _, port = rest.rpartition(':')
+        if host and port.isdigit():
+            return kind, host, int(port)
+    raise ValueError(f"Invalid live source: {source}")
+
+
+def _run_feed(tail, source):
+    kind, *args = parse_source(source)
+    feed = watch_directory(tail, *args) if kind == 'dir' else serve_socket(tail, *args)
+    try:
+        asyncio.run(feed)
+    except Exception as exc:  # shown on the page instead of dying silently
+        tail.error = f"{type(exc).__name__}: {exc}"
+
+
+@st.cache_resource
+def start_live(data_path=DATA_PATH, source=LIVE_SOURCE, forecast_path=None):
+    """
+    The live tail of `data_path`, fed from `source` by a background thread started on
+    first use, with the alert rules evaluated on every new batch
+    """
+    parse_source(source)
+    history = load_data(data_path)
+    tail = LiveTail(history)
+    forecast = load_forecast_data(forecast_path) if forecast_path else None
+    tail.engine = AlertEngine(load_rules(history), FileOutbox(outbox_path(data_path)), forecast).prime(history)
+    threading.Thread(target=_run_feed, args=(tail, source), name='live-feed', daemon=True).start()
+    return tail
+
+
+# Stand-in for the meter concentrator
+
+def replay_records(history, intervals, start=None):
+    """
+    `intervals` feed records per station continuing after `start` (by default the end
+    of `history`), replaying the last week of `history` to give them a realistic shape.
+    """
+    interval = pd.Timedelta('15min')
+    week = history.iloc[-7 * 96:]
+    start = pd.Timestamp(start) if start is not None else history.index[-1]
+    for i in range(intervals):
+        row = week.iloc[i % len(week)]
+        batch = []
+        for station in history.columns.get_level_values('location').unique():
+            record = {'time': (start + (i + 1) * interval).isoformat(), 'location': station}
+            record.update({measure: float(row[(measure, station)]) for measure in row.index.get_level_values(0).unique()})
+            batch.append(record)
+        yield batch
+
+
+def _send(source, batches, every):
+    kind, *args = parse_source(source)
+    if kind == 'dir':
+        os.makedirs(args[0], exist_ok=True)
+        for batch in batches:
+            name = os.path.join(args[0], pd.Timestamp(batch[0]['time']).strftime('%Y%m%dT%H%M%S') + '.jsonl')
+            with open(name + '.tmp', 'w') as f:
+                f.writelines(json.dumps(record) + '\n' for record in batch)
+            os.replace(name + '.tmp', name)
+            print(name)
+            time.sleep(every)
+        return
+
+    async def send():
+        _, writer = await asyncio.open_connection(*args)
+        for batch in batches:
+            writer.writelines(json.dumps(record).encode() + b'\n' for record in batch)
+            await writer.drain()
+            print(batch[0]['time'])
+            await asyncio.sleep(every)
+        writer.close()
+        await writer.wait_closed()
+    asyncio.run(send())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the last week of a dataset into a live feed")
+    parser.add_argument('--to', default=LIVE_SOURCE, help="dir:PATH or tcp:HOST:PORT")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--start', help="send intervals after this time (default: end of the dataset)")
+    parser.add_argument('--intervals', type=int, default=96)
+    parser.add_argument('--every', type=float, default=1.0, help="seconds between intervals")
+    args = parser.parse_args()
+    history = load_data(args.data)
+    _send(args.to, replay_records(history, args.intervals, args.start), args.every)
+
+
+if __name__ == '__main__':
+    main()
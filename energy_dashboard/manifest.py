@@ -0,0 +1,179 @@
+"""
+Small JSON manifest next to each dataset file, so metadata questions (is there any
+data, which stations and quantities, what time range) are answered without reading
+the data or importing pandas.
+
+    {"version": "...", "format": "feather", "layout": "feather", "rows": 35136,
+     "start": "2024-01-01T00:15:00", "end": "2025-01-01T00:00:00",
+     "stations": [...], "quantities": [...]}
+
+The manifest lives at `<data file>.manifest.json`. It is rebuilt from the file's
+metadata and index column whenever the dataset version no longer matches, and is
+only written when the directory is writable.
+
+This module only uses the standard library at import time.
+"""
+import json
+import os
+
+# Default (Tetarom) dataset files
+DATA_PATH = 'data/tetarom_clean_merged_data.feather'
+FORECAST_DATA_PATH = 'data/tetarom_ea_forecasts.feather'
+
+MANIFEST_SUFFIX = '.manifest.json'
+# Bumped when fields are added, so older manifests get rebuilt
+MANIFEST_SCHEMA = 3
+
+# Manifests already read by this process, by (path, version)
+_MANIFESTS = {}
+
+
+def dataset_version(data_path=DATA_PATH):
+    """Identifies the current contents of a data file; changes whenever it is replaced"""
+    try:
+        stat = os.stat(data_path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def manifest_path(data_path):
+    return f"{data_path}{MANIFEST_SUFFIX}"
+
+
+def file_format(data_path):
+    """'parquet' or 'feather' (Arrow IPC), from the file's magic bytes rather than its name"""
+    try:
+        with open(data_path, 'rb') as f:
+            magic = f.read(6)
+    except OSError:
+        magic = b''
+    if magic.startswith(b'PAR1'):
+        return 'parquet'
+    if magic.startswith(b'ARROW1'):
+        return 'feather'
+    return 'parquet' if str(data_path).endswith('.parquet') else 'feather'
+
+
+def build_manifest(data_path):
+    """
+    Manifest of `data_path` from its schema and index column, without loading the
+    values. Stations are the 'location' level of the columns and quantities the other
+    level ('measure' in the merged data, 'feature' in the forecasts).
+    """
+    import ast
+    import pyarrow.compute as pc
+    from .storage import file_layout
+    from .utils import strip_unit
+
+    fmt = file_format(data_path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(data_path)
+        schema = source.schema_arrow
+        rows = source.metadata.num_rows
+        index_names = index_columns(schema)
+        index = source.read(columns=index_names[:1]).column(0) if index_names else None
+    else:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        with pa.memory_map(data_path) as source:
+            schema = pa.ipc.open_file(source).schema
+        index_names = index_columns(schema)
+        # Only the index column is read (and decompressed); an empty projection still gives the row count
+        table = feather.read_table(data_path, columns=index_names[:1], memory_map=True)
+        rows = table.num_rows
+        index = table.column(0) if index_names else None
+
+    start = end = None
+    if index is not None and rows:
+        bounds = pc.min_max(index)
+        start, end = bounds['min'].as_py().isoformat(), bounds['max'].as_py().isoformat()
+
+    level_names = column_level_names(schema)
+    station_level = level_names.index('location') if 'location' in level_names else 1
+    stations, quantities = [], []
+    for name in schema.names:
+        if not name.startswith('('):
+            continue
+        levels = ast.literal_eval(name)
+        location, quantity = levels[station_level], strip_unit(levels[1 - station_level])
+        if location not in stations:
+            stations.append(location)
+        if quantity not in quantities:
+            quantities.append(quantity)
+
+    return {
+        'schema': MANIFEST_SCHEMA,
+        'version': dataset_version(data_path),
+        'format': fmt,
+        # Files not written by energy_dashboard.storage only record their container format
+        'layout': file_layout(schema) or fmt,
+        'rows': rows,
+        'start': start,
+        'end': end,
+        'stations': stations,
+        'quantities': quantities,
+    }
+
+
+def column_level_names(schema):
+    """Names of the column levels pandas stored, e.g. ['measure', 'location']"""
+    metadata = json.loads((schema.metadata or {}).get(b'pandas', b'{}'))
+    return [level.get('name') for level in metadata.get('column_indexes', [])]
+
+
+def index_columns(schema):
+    """Names of the columns pandas stored the index in"""
+    metadata = json.loads((schema.metadata or {}).get(b'pandas', b'{}'))
+    return [c for c in metadata.get('index_columns', []) if isinstance(c, str)]
+
+
+def read_manifest(data_path):
+    """The stored manifest, or None if it is missing, unreadable or out of date"""
+    try:
+        with open(manifest_path(data_path)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get('schema') != MANIFEST_SCHEMA or manifest.get('version') != dataset_version(data_path):
+        return None
+    return manifest
+
+
+def write_manifest(data_path, manifest):
+    path = manifest_path(data_path)
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass  # read-only data directory: the manifest is rebuilt on the next start instead
+
+
+def load_manifest(data_path=DATA_PATH):
+    """Current manifest of `data_path`, rebuilt if needed; None if the file does not exist"""
+    key = (data_path, dataset_version(data_path))
+    if key[1] is None:
+        return None
+    if key not in _MANIFESTS:
+        manifest = read_manifest(data_path)
+        if manifest is None:
+            manifest = build_manifest(data_path)
+            write_manifest(data_path, manifest)
+        _MANIFESTS[key] = manifest
+    return _MANIFESTS[key]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Write the manifest of one or more dataset files")
+    parser.add_argument('paths', nargs='*', default=[DATA_PATH])
+    for path in parser.parse_args().paths:
+        manifest = build_manifest(path)
+        write_manifest(path, manifest)
+        print(path, json.dumps(manifest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Station-parallel execution: one call per `location`, spread over a worker pool,
+with the results merged into one structure.
+
+    results = map_stations(task, stations, data_path, mode='thread')
+    table = station_table(results)
+
+`task(tetarom_df, station, **kwargs)` receives the whole dataset and one station.
+
+    'thread'   for work that spends its time in NumPy/pandas kernels, which release
+               the GIL; the tasks share the loaded frame
+    'process'  for Python-level loops, which hold the GIL; each worker loads the
+               dataset itself (once per dataset version, through `load_data`), so
+               only the station name and the result are pickled. `task` must be a
+               module-level function.
+
+The pools are created on first use and shared by all sessions. ENERGY_WORKERS sets
+their size, by default the CPU count.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import streamlit as st
+
+from .utils import DATA_PATH, load_data
+
+MODES = ('thread', 'process')
+WORKERS = int(os.environ.get('ENERGY_WORKERS', 0)) or os.cpu_count() or 1
+
+
+@st.cache_resource
+def get_pool(mode, workers=WORKERS):
+    if mode == 'thread':
+        return ThreadPoolExecutor(workers, thread_name_prefix='stations')
+    if mode == 'process':
+        # Forking the threaded server process could copy held locks into the workers
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    raise ValueError(f"Invalid mode: {mode}")
+
+
+def _run(task, data_path, station, kwargs):
+    # Runs in a process worker, whose own dataset cache keeps the frame between tasks
+    return task(load_data(data_path), station, **kwargs)
+
+
+def map_stations(task, stations, data_path=DATA_PATH, mode='thread', workers=WORKERS, **kwargs):
+    """`task` for each station on a `mode` pool, as {station: result} in the order of `stations`"""
+    stations = list(stations)
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode: {mode}")
+    if workers <= 1 or len(stations) <= 1:
+        tetarom_df = load_data(data_path)
+        return {station: task(tetarom_df, station, **kwargs) for station in stations}
+
+    if mode == 'thread':
+        tetarom_df = load_data(data_path)
+        pool = get_pool(mode, workers)
+        futures = {station: pool.submit(task, tetarom_df, station, **kwargs) for station in stations}
+        return {station: future.result() for station, future in futures.items()}
+
+    try:
+        pool = get_pool(mode, workers)
+        futures = {station: pool.submit(_run, task, data_path, station, kwargs) for station in stations}
+        return {station: future.result() for station, future in futures.items()}
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        get_pool.clear()
+        raise
+
+
+def station_table(*results):
+    """
+    Merge {station: dict or Series} mappings from one or more `map_stations` calls
+    into one frame, a row per station and a column per field.
+    """
+    rows = {}
+    for result in results:
+        for station, values in result.items():
+            rows.setdefault(station, {}).update(values)
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('location')
@@ -0,0 +1,193 @@
+"""
+Peak-demand analytics on the per-station EA+ series.
+
+Demand is the average power over an interval: EA+ [kWh] per 15 minutes times 4, in
+kW. Every function works on the (intervals x stations) demand matrix at once:
+
+    load_duration_curve  demand sorted from highest to lowest, against share of time
+    top_peaks            the N highest intervals per station, via a partial sort
+    grouped_quantiles    exact quantiles per (group, station) from one sort of the
+                         whole matrix, e.g. p95/p99 for every month
+    build_sketches       mergeable quantile sketches per (group, station); summing
+                         them over months gives the yearly sketch without touching
+                         the raw data again
+
+The sketches use logarithmic buckets, so any quantile read from them is within
+SKETCH_ACCURACY (relative) of a value of the right rank.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .calendar_index import load_calendar, month_periods
+from .utils import DATA_PATH, dataset_version, load_data, station_totals
+
+QUANTILES = (0.95, 0.99)
+TOP_N = 20
+
+# Relative accuracy of the sketches, and the range of values they resolve; smaller
+# values count as zero and larger ones fall into the last bucket
+SKETCH_ACCURACY = 0.01
+SKETCH_MIN = 1e-2
+SKETCH_MAX = 1e7
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+_FIRST_BUCKET = int(np.ceil(np.log(SKETCH_MIN) / _LOG_GAMMA))
+# Bucket 0 holds zeros, bucket k > 0 holds (gamma^(k + first - 2), gamma^(k + first - 1)]
+SKETCH_BUCKETS = int(np.ceil(np.log(SKETCH_MAX) / _LOG_GAMMA)) - _FIRST_BUCKET + 2
+
+
+def demand_frame(tetarom_df, include_total=True):
+    """Average demand in kW per interval, one column per station (and 'Total')"""
+    interval_hours = pd.Timedelta('15min') / pd.Timedelta('1h')
+    demand = tetarom_df['EA+'] / interval_hours
+    if include_total:
+        demand['Total'] = station_totals(tetarom_df)['EA+'] / interval_hours
+    demand.columns.name = 'location'
+    return demand
+
+
+def load_duration_curve(demand, points=None):
+    """
+    Demand of each station sorted from highest to lowest, indexed by the share of
+    time (0-100 %) it is exceeded. With `points`, only that many evenly spaced ranks
+    are kept, which is all a chart needs.
+    """
+    values = -np.sort(-demand.to_numpy(dtype=np.float64), axis=0)  # NaN last
+    n = len(values)
+    ranks = np.arange(n) if points is None or points >= n else np.linspace(0, n - 1, points).round().astype(int)
+    share = pd.Index(100 * (ranks + 1) / max(n, 1), name='share_of_time')
+    return pd.DataFrame(values[ranks], index=share, columns=demand.columns)
+
+
+def top_peaks(demand, n=TOP_N):
+    """The `n` highest intervals of each station, as (location, rank, time, demand) rows"""
+    values = np.nan_to_num(demand.to_numpy(dtype=np.float64), nan=-np.inf)
+    n = min(n, len(values))
+    if n == 0:
+        return pd.DataFrame(columns=['location', 'rank', 'time', 'demand'])
+    # Partial sort: only the n largest rows of each column are ordered
+    top = np.argpartition(-values, n - 1, axis=0)[:n]
+    order = np.argsort(-np.take_along_axis(values, top, axis=0), axis=0, kind='stable')
+    rows = np.take_along_axis(top, order, axis=0)
+    peaks = np.take_along_axis(values, rows, axis=0)
+
+    cols = np.broadcast_to(np.arange(values.shape[1]), rows.shape)
+    found = np.isfinite(peaks)
+    return pd.DataFrame({
+        'location': demand.columns[cols[found]],
+        'rank': np.broadcast_to(np.arange(1, n + 1)[:, None], rows.shape)[found],
+        'time': demand.index[rows[found]],
+        'demand': peaks[found],
+    }).sort_values(['location', 'rank'], kind='stable', ignore_index=True)
+
+
+def grouped_quantiles(demand, codes, quantiles=QUANTILES):
+    """
+    Exact quantiles (linear interpolation, like np.quantile) of each column within
+    each group of integer `codes`, for all groups at once.
+
+    Returns a frame indexed by group code with (quantile, location) columns.
+    """
+    values = demand.to_numpy(dtype=np.float64)
+    codes = np.asarray(codes)
+    groups, group_codes = np.unique(codes, return_inverse=True)
+    # One sort orders every column by group and then value, NaN last within a group
+    order = np.lexsort((values, np.broadcast_to(group_codes[:, None], values.shape)), axis=0)
+    ordered = np.take_along_axis(values, order, axis=0)
+
+    sizes = np.bincount(group_codes, minlength=len(groups))
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    valid = np.stack([np.bincount(group_codes, weights=np.isfinite(values[:, j]), minlength=len(groups))
+                      for j in range(values.shape[1])], axis=1).astype(np.int64)
+
+    out = {}
+    for q in quantiles:
+        pos = q * np.maximum(valid - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, np.maximum(valid - 1, 0))
+        cols = np.arange(values.shape[1])
+        low = ordered[starts[:, None] + lo, cols]
+        high = ordered[starts[:, None] + hi, cols]
+        result = low + (pos - lo) * (high - low)
+        result[valid == 0] = np.nan
+        for j, location in enumerate(demand.columns):
+            out[(q, location)] = result[:, j]
+    columns = pd.MultiIndex.from_tuples(out, names=['quantile', 'location'])
+    return pd.DataFrame(np.column_stack(list(out.values())), index=pd.Index(groups, name='group'), columns=columns)
+
+
+def _buckets(values):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.ceil(np.log(values) / _LOG_GAMMA) - _FIRST_BUCKET + 1
+    k = np.where(values >= SKETCH_MIN, np.clip(k, 1, SKETCH_BUCKETS - 1), 0)
+    return k.astype(np.int64)
+
+
+def build_sketches(demand, codes, n_groups=None):
+    """
+    Bucket counts of shape (groups, stations, SKETCH_BUCKETS) for integer group
+    `codes` in 0 .. n_groups - 1. NaN readings are left out. Sketches of different
+    groups merge by adding their counts.
+    """
+    values = demand.to_numpy(dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int64)
+    n_groups = int(codes.max(initial=-1)) + 1 if n_groups is None else n_groups
+    n_cols = values.shape[1]
+
+    cells = (codes[:, None] * n_cols + np.arange(n_cols)) * SKETCH_BUCKETS + _buckets(values)
+    cells = cells[np.isfinite(values)]
+    counts = np.bincount(cells, minlength=n_groups * n_cols * SKETCH_BUCKETS)
+    return counts.reshape(n_groups, n_cols, SKETCH_BUCKETS)
+
+
+def sketch_quantiles(counts, quantiles=QUANTILES):
+    """Quantiles of each sketch in `counts` (..., SKETCH_BUCKETS), shape (..., len(quantiles))"""
+    cumulative = np.cumsum(counts, axis=-1)
+    total = cumulative[..., -1:]
+    out = []
+    for q in quantiles:
+        rank = np.floor(q * np.maximum(total - 1, 0))
+        k = (cumulative <= rank).sum(axis=-1)
+        # Representative value of bucket k: the midpoint in relative terms
+        upper = _GAMMA ** (k + _FIRST_BUCKET - 1)
+        value = np.where(k == 0, 0.0, 2 * upper / (_GAMMA + 1))
+        out.append(np.where(total[..., 0] > 0, value, np.nan))
+    return np.stack(out, axis=-1)
+
+
+def peak_stats(tetarom_df, calendar, quantiles=QUANTILES):
+    """Monthly peaks and quantiles, and the yearly ones merged from the monthly sketches"""
+    demand = demand_frame(tetarom_df)
+    month_ids = calendar['month_id'].to_numpy()
+    months = month_periods(np.unique(month_ids))
+
+    monthly = grouped_quantiles(demand, month_ids, quantiles)
+    monthly.index = months
+    peaks = demand.groupby(month_ids).max()
+    peaks.index = months
+    monthly = pd.concat([monthly, pd.concat({'max': peaks}, axis=1, names=['quantile'])], axis=1)
+
+    first = month_ids.min() if len(month_ids) else 0
+    n_months = month_ids.max() - first + 1 if len(month_ids) else 0
+    sketches = build_sketches(demand, month_ids - first, n_months)
+    # Merge the monthly sketches of each year by summing their counts
+    years = (np.arange(len(sketches)) + first) // 12 + 1970
+    yearly_counts = np.stack([sketches[years == y].sum(axis=0) for y in np.unique(years)]) \
+        if len(sketches) else np.zeros((0, demand.shape[1], SKETCH_BUCKETS), dtype=np.int64)
+    yearly_values = sketch_quantiles(yearly_counts, quantiles)
+    yearly = pd.DataFrame(
+        yearly_values.transpose(0, 2, 1).reshape(len(yearly_counts), -1),
+        index=pd.Index(np.unique(years), name='year'),
+        columns=pd.MultiIndex.from_product([quantiles, demand.columns], names=['quantile', 'location']),
+    )
+    return {'demand': demand, 'monthly': monthly, 'yearly': yearly, 'sketches': sketches}
+
+
+def load_peak_stats(data_path=DATA_PATH):
+    return _load_peak_stats(data_path, dataset_version(data_path))
+
+
+@st.cache_data
+def _load_peak_stats(data_path, version):
+    return peak_stats(load_data(data_path), load_calendar(data_path))
@@ -0,0 +1,205 @@
+"""
+Data-quality checks over the merged dataset.
+
+All checks work on the full (intervals x columns) value matrix at once, using
+cumulative sums for the rolling windows, so the cost does not depend on how many
+stations or quantities there are beyond the size of the array.
+
+`check_quality` returns
+    issues        one row per contiguous problem, indexed by (location, measure, check),
+                  with severity, first/last interval and interval count. Problems that
+                  affect whole rows (duplicated or missing intervals) use 'All' for
+                  location and measure.
+    completeness  boolean frame on the regular 15-minute grid, one column per station,
+                  True where every quantity of that station has a finite reading.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .utils import DATA_PATH, dataset_version, load_data
+
+INTERVAL = pd.Timedelta('15min')
+
+# Identical non-zero readings for this many intervals in a row look like a stuck meter
+STUCK_MIN_INTERVALS = 12  # 3 hours
+# A reading more than SPIKE_Z standard deviations above the mean of the preceding
+# SPIKE_WINDOW intervals is a spike
+SPIKE_WINDOW = 96  # 1 day
+SPIKE_Z = 6.0
+SPIKE_MEASURES = ('EA+', 'ER+')
+# Gaps at least this long are errors rather than warnings
+LONG_GAP = pd.Timedelta('1D')
+
+SEVERITIES = pd.CategoricalDtype(['info', 'warning', 'error'], ordered=True)
+ISSUE_COLUMNS = ['location', 'measure', 'check', 'severity', 'start', 'end', 'n_intervals']
+
+
+def _rolling_sum(a, window):
+    """Trailing sums over `window` rows along axis 0; rows with a short window are NaN"""
+    out = np.full(a.shape, np.nan)
+    if len(a) < window:
+        return out
+    cs = np.cumsum(a, axis=0, dtype=np.float64)
+    out[window - 1] = cs[window - 1]
+    out[window:] = cs[window:] - cs[:-window]
+    return out
+
+
+def _runs(mask):
+    """
+    Runs of True down each column of a 2D mask, as (first_row, last_row, column)
+    arrays ordered by column and then row.
+    """
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype=np.int8)
+    padded[1:-1] = mask
+    edges = np.diff(padded, axis=0)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    end_rows, end_cols = np.nonzero(edges == -1)
+    start_order = np.lexsort((start_rows, start_cols))
+    end_order = np.lexsort((end_rows, end_cols))
+    return start_rows[start_order], end_rows[end_order] - 1, start_cols[start_order]
+
+
+def _issues_from_mask(mask, index, columns, check, severity):
+    first, last, cols = _runs(mask)
+    return pd.DataFrame({
+        'location': columns.get_level_values('location')[cols],
+        'measure': columns.get_level_values('measure')[cols],
+        'check': check,
+        'severity': severity,
+        'start': index[first],
+        'end': index[last],
+        'n_intervals': last - first + 1,
+    })
+
+
+def stuck_mask(values, min_intervals=STUCK_MIN_INTERVALS):
+    """True for readings inside a run of at least `min_intervals` identical non-zero values"""
+    n = len(values)
+    mask = np.zeros(values.shape, dtype=bool)
+    if n < min_intervals:
+        return mask
+    # NaN never equals itself, so gaps break runs
+    same = (values[1:] == values[:-1]) & (values[1:] != 0)
+    # A full window of equal steps ends a qualifying run at step j, i.e. at row j + 1
+    full = _rolling_sum(same, min_intervals - 1) == min_intervals - 1
+    ends = np.zeros(values.shape, dtype=np.int32)
+    ends[1:] = full
+    # Row r is covered if any run ending in rows r .. r + min_intervals - 1 qualifies
+    reach = np.cumsum(ends[::-1], axis=0)[::-1]
+    covered = reach.copy()
+    covered[:n - min_intervals] -= reach[min_intervals:]
+    return covered > 0
+
+
+def spike_mask(values, window=SPIKE_WINDOW, z=SPIKE_Z):
+    """True for readings far above the mean of the preceding `window` readings"""
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0.0)
+    count = _rolling_sum(valid, window)
+    total = _rolling_sum(filled, window)
+    squares = _rolling_sum(filled * filled, window)
+
+    mask = np.zeros(values.shape, dtype=bool)
+    if len(values) <= window:
+        return mask
+    # Statistics of the window that ends just before each reading
+    count, total, squares = count[window - 1:-1], total[window - 1:-1], squares[window - 1:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean * mean, 0))
+        current = values[window:]
+        mask[window:] = (count >= window // 2) & (std > 0) & (current > mean + z * std)
+    return mask
+
+
+_ALL_COLUMNS = pd.MultiIndex.from_tuples([('All', 'All')], names=['measure', 'location'])
+
+
+def _row_issues(index):
+    """Duplicated and missing intervals, which affect every column"""
+    frames = []
+
+    duplicated = index.duplicated(keep='first')
+    if duplicated.any():
+        dup = _issues_from_mask(duplicated[:, None], index, _ALL_COLUMNS, 'duplicate_interval', 'error')
+        frames.append(dup)
+
+    unique = index[~duplicated]
+    if len(unique) > 1:
+        steps = np.diff(unique.asi8)
+        gaps = np.nonzero(steps > INTERVAL.value)[0]
+        if len(gaps):
+            start = unique[gaps] + INTERVAL
+            end = unique[gaps + 1] - INTERVAL
+            frames.append(pd.DataFrame({
+                'location': 'All',
+                'measure': 'All',
+                'check': 'missing_interval',
+                'severity': np.where(end - start + INTERVAL >= LONG_GAP, 'error', 'warning'),
+                'start': start,
+                'end': end,
+                'n_intervals': steps[gaps] // INTERVAL.value - 1,
+            }))
+    return frames
+
+
+def check_quality(tetarom_df):
+    """(issues, completeness) for a frame shaped like `load_data()`"""
+    index = tetarom_df.index
+    columns = tetarom_df.columns
+    values = tetarom_df.to_numpy(dtype=np.float64)
+    measures = columns.get_level_values('measure')
+
+    frames = _row_issues(index)
+    frames.append(_issues_from_mask(~np.isfinite(values), index, columns, 'missing_value', 'warning'))
+    frames.append(_issues_from_mask(values < 0, index, columns, 'negative_value', 'error'))
+    frames.append(_issues_from_mask(stuck_mask(values), index, columns, 'stuck_meter', 'warning'))
+
+    spike_cols = np.asarray(measures.isin(SPIKE_MEASURES))
+    if spike_cols.any():
+        spikes = np.zeros(values.shape, dtype=bool)
+        spikes[:, spike_cols] = spike_mask(values[:, spike_cols])
+        frames.append(_issues_from_mask(spikes, index, columns, 'spike', 'info'))
+
+    issues = pd.concat([f for f in frames if len(f)] or [pd.DataFrame(columns=ISSUE_COLUMNS)], ignore_index=True)
+    issues['severity'] = issues['severity'].astype(SEVERITIES)
+    issues['n_intervals'] = issues['n_intervals'].astype(np.int64)
+    issues = issues.sort_values(['location', 'measure', 'check', 'start'], kind='stable')
+    issues = issues.set_index(['location', 'measure', 'check'])
+
+    return issues, completeness(tetarom_df)
+
+
+def completeness(tetarom_df):
+    """Per-station bitmap on the regular 15-minute grid: True where all quantities are present"""
+    df = tetarom_df[~tetarom_df.index.duplicated(keep='first')]
+    if df.empty:
+        return pd.DataFrame(dtype=bool)
+    grid = pd.date_range(df.index[0], df.index[-1], freq=INTERVAL, name=df.index.name)
+    present = np.isfinite(df.reindex(grid).to_numpy(dtype=np.float64))
+
+    locations = df.columns.get_level_values('location')
+    stations = locations.unique()
+    # AND the columns of each station together with one reduceat over a station-sorted order
+    codes = stations.get_indexer(locations)
+    order = np.argsort(codes, kind='stable')
+    starts = np.r_[0, np.nonzero(np.diff(codes[order]))[0] + 1]
+    complete = np.logical_and.reduceat(present[:, order], starts, axis=1)
+    return pd.DataFrame(complete, index=grid, columns=pd.Index(stations[codes[order][starts]], name='location'))
+
+
+def incomplete_ranges(complete):
+    """(start, end) of each run of missing slots in one station's completeness column"""
+    first, last, _ = _runs(~complete.to_numpy()[:, None])
+    return list(zip(complete.index[first], complete.index[last]))
+
+
+def load_quality(data_path=DATA_PATH):
+    return _load_quality(data_path, dataset_version(data_path))
+
+
+@st.cache_data
+def _load_quality(data_path, version):
+    return check_quality(load_data(data_path))
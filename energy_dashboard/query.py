@@ -0,0 +1,117 @@
+"""
+SQL over the dashboard datasets, backed by DuckDB.
+
+The data files are exposed as two views, scanned straight from disk through Arrow
+datasets so a query only reads the columns and batches it needs:
+
+    readings(time, location, "EA+", "EA-", "ER+", "ER-")
+    forecasts(time, location, yhat, yhat_lower, yhat_upper)
+
+Example:
+
+    SELECT location, date_trunc('month', time) AS month, max("EA+") AS peak
+    FROM readings
+    WHERE dayofweek(time) BETWEEN 1 AND 5 AND hour(time) BETWEEN 7 AND 21
+    GROUP BY ALL ORDER BY ALL
+
+External file access is switched off once the views exist, so queries can only
+see these two datasets.
+"""
+import ast
+
+import pyarrow.dataset as ds
+import streamlit as st
+
+from .manifest import file_format
+from .utils import DATA_PATH, FORECAST_DATA_PATH, dataset_version, strip_unit
+
+# Upper bound on rows returned to the page; the query itself still runs in full
+MAX_RESULT_ROWS = 100_000
+
+
+def _dataset(data_path):
+    return ds.dataset(data_path, format=file_format(data_path))
+
+
+def _column_pairs(schema):
+    # Columns are stored as stringified tuples, e.g. "('EA+[kWh]', 'Statia Jucu 1')"
+    pairs = {}
+    for name in schema.names:
+        if name.startswith('('):
+            pairs[name] = ast.literal_eval(name)
+    return pairs
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _long_view(source, schema, level, fields):
+    """
+    SQL that turns a wide (a, b)-tuple column layout into one row per `level` value.
+
+    `level` is the tuple position holding the location, `fields` maps the output
+    column name to the value taken from the other tuple position.
+    """
+    by_location = {}
+    for name, pair in _column_pairs(schema).items():
+        location = pair[level]
+        field = fields(pair[1 - level])
+        by_location.setdefault(location, {})[field] = name
+
+    selects = []
+    for location, columns in by_location.items():
+        cols = ', '.join(f"{_quote(column)} AS {_quote(field)}" for field, column in columns.items())
+        selects.append(f"SELECT time, {_literal(location)} AS location, {cols} FROM {source}")
+    return '\nUNION ALL\n'.join(selects)
+
+
+def connect(data_path=DATA_PATH, forecast_path=FORECAST_DATA_PATH):
+    """DuckDB connection with the `readings` and `forecasts` views registered"""
+    import duckdb
+
+    con = duckdb.connect()
+    readings = _dataset(data_path)
+    con.register('readings_source', readings)
+    con.execute(f"CREATE VIEW readings AS {_long_view('readings_source', readings.schema, 1, strip_unit)}")
+
+    # Not every site has forecasts
+    if forecast_path is not None:
+        forecasts = _dataset(forecast_path)
+        con.register('forecasts_source', forecasts)
+        con.execute(f"CREATE VIEW forecasts AS {_long_view('forecasts_source', forecasts.schema, 0, str)}")
+
+    con.execute("SET enable_external_access = false")
+    con.execute("SET lock_configuration = true")
+    return con
+
+
+def run_query(sql, data_path=DATA_PATH, forecast_path=FORECAST_DATA_PATH):
+    """Run `sql` against the datasets; results are cached per query text and dataset version"""
+    version = (dataset_version(data_path), forecast_path and dataset_version(forecast_path))
+    return _run_query(sql.strip(), data_path, forecast_path, version)
+
+
+@st.cache_data(max_entries=64)
+def _run_query(sql, data_path, forecast_path, version):
+    con = connect(data_path, forecast_path)
+    try:
+        return con.execute(sql).fetch_df_chunk(MAX_RESULT_ROWS // 2048 + 1)[:MAX_RESULT_ROWS]
+    finally:
+        con.close()
+
+
+def describe_tables(data_path=DATA_PATH, forecast_path=FORECAST_DATA_PATH):
+    """Column names and types of the queryable views"""
+    con = connect(data_path, forecast_path)
+    try:
+        return con.execute(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "WHERE table_name IN ('readings', 'forecasts') ORDER BY table_name, ordinal_position"
+        ).fetch_df()
+    finally:
+        con.close()
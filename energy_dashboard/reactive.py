@@ -0,0 +1,247 @@
+"""
+Reactive energy ratio over windows of accumulated energy.
+
+The grid operator bills reactive energy on the ratio of the reactive to the active
+energy accumulated over a period, not per 15-minute interval. `ReactiveRatio` keeps
+running totals of EA, ER+ and ER- for one station, so the energy in any window is
+the difference of two totals and costs O(1) whatever its length:
+
+    rolling(window)   sum ER / sum EA over the trailing `window` (e.g. 24 hours)
+    to_date(period)   sum ER / sum EA from the start of the day, week or month
+
+New intervals are added with `append`, which only extends the running totals. A
+digest of every interval added lets `extends` tell whether a newer dataset only
+gained intervals at the end, or also changed one already added.
+Ratios are NaN where the accumulated EA is below MIN_ENERGY, instead of blowing up
+where EA is close to zero.
+
+`load_station_overview` summarises every station at once for the overview grid: the
+ratio and limit statistics are NumPy work and run on threads, the excursion segments
+come from the Python loop behind the ratio chart and run on processes.
+"""
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .figures import LIMIT_X1, LIMIT_X3, reactive_frame, ratio_frame, ratio_segments
+from .parallel import map_stations, station_table
+from .utils import DATA_PATH, dataset_version, load_data
+
+COLUMNS = ['EA', 'ER+', 'ER-']
+# Accumulated active energy below this many kWh gives no ratio
+MIN_ENERGY = 1.0
+
+# Choices offered on the Reactive Energy page; None is the per-interval ratio
+RATIO_WINDOWS = {
+    "Interval": None,
+    "Rolling 24 h": pd.Timedelta('1D'),
+    "Rolling 7 days": pd.Timedelta('7D'),
+    "Day to date": 'Day',
+    "Week to date": 'Week',
+    "Month to date": 'Month',
+}
+
+
+def _period_starts(times, period):
+    """Start of the day, week (Monday) or month of each datetime64[ns] in `times`"""
+    if period == 'Day':
+        return times.astype('datetime64[D]').astype('datetime64[ns]')
+    if period == 'Week':
+        days = times.astype('datetime64[D]')
+        # 1970-01-01 was a Thursday
+        return (days - (days.astype(np.int64) + 3) % 7).astype('datetime64[ns]')
+    if period == 'Month':
+        return times.astype('datetime64[M]').astype('datetime64[ns]')
+    raise ValueError(f"Invalid period: {period}")
+
+
+class ReactiveRatio:
+    """Running totals of EA, ER+ and ER- of one station; see the module docstring"""
+
+    def __init__(self, df=None):
+        self.n = 0
+        self._times = np.empty(16, dtype='datetime64[ns]')
+        # Row i holds the totals of the first i intervals, so row 0 is all zeros
+        self._totals = np.zeros((17, len(COLUMNS)))
+        # Digests of the times and values added so far, in order
+        self._digests = (hashlib.blake2b(), hashlib.blake2b())
+        if df is not None:
+            self.append(df)
+
+    @property
+    def times(self):
+        return self._times[:self.n]
+
+    @property
+    def totals(self):
+        return self._totals[:self.n + 1]
+
+    def _reserve(self, n):
+        if n <= len(self._times):
+            return
+        capacity = max(n, 2 * len(self._times))
+        times = np.empty(capacity, dtype='datetime64[ns]')
+        times[:self.n] = self._times[:self.n]
+        totals = np.zeros((capacity + 1, len(COLUMNS)))
+        totals[:self.n + 1] = self._totals[:self.n + 1]
+        self._times, self._totals = times, totals
+
+    def append(self, df):
+        """Add the intervals of `df` (EA, ER+ and ER- columns), which must follow the last one"""
+        if df.empty:
+            return self
+        times = df.index.values.astype('datetime64[ns]')
+        if self.n and times[0] <= self._times[self.n - 1]:
+            raise ValueError("Appended intervals must come after the existing ones")
+        # Missing readings count as no energy
+        values = np.nan_to_num(df[COLUMNS].to_numpy(dtype=np.float64))
+        for digest, array in zip(self._digests, (times, values)):
+            digest.update(np.ascontiguousarray(array).tobytes())
+
+        end = self.n + len(times)
+        self._reserve(end)
+        self._times[self.n:end] = times
+        self._totals[self.n + 1:end + 1] = self._totals[self.n] + np.cumsum(values, axis=0)
+        self.n = end
+        return self
+
+    def extends(self, df):
+        """Whether `df` starts with exactly the intervals already added, so only its tail is new"""
+        if len(df) < self.n:
+            return False
+        if self.n == 0:
+            return True
+        # Every interval already added, not only the last one: a corrected reading
+        # anywhere in them changes all the totals after it
+        prefix = df.iloc[:self.n]
+        times = prefix.index.values.astype('datetime64[ns]')
+        values = np.nan_to_num(prefix[COLUMNS].to_numpy(dtype=np.float64))
+        return all(hashlib.blake2b(np.ascontiguousarray(array).tobytes()).digest() == digest.digest()
+                   for digest, array in zip(self._digests, (times, values)))
+
+    def window_sums(self, starts, ends):
+        """EA, ER+ and ER- summed over rows [start, end) for each pair"""
+        totals = self.totals
+        return totals[ends] - totals[starts]
+
+    def _span(self, start, end):
+        times = self.times
+        lo = 0 if start is None else times.searchsorted(pd.Timestamp(start).to_datetime64(), side='left')
+        hi = self.n if end is None else times.searchsorted(pd.Timestamp(end).to_datetime64(), side='right')
+        return lo, hi
+
+    def _frame(self, rows, starts):
+        sums = self.window_sums(starts, rows + 1)
+        ea = sums[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios = np.where((ea >= MIN_ENERGY)[:, None], sums[:, 1:] / ea[:, None], np.nan)
+        return pd.DataFrame({
+            'ER+ %age': ratios[:, 0],
+            'ER- %age': ratios[:, 1],
+            'EA': ea,
+        }, index=pd.DatetimeIndex(self.times[rows], name='time'))
+
+    def rolling(self, window, start=None, end=None):
+        """Ratios over the trailing `window` for each interval between `start` and `end`"""
+        lo, hi = self._span(start, end)
+        rows = np.arange(lo, hi)
+        times = self.times
+        # An interval belongs to the window ending at t if its end time is after t - window
+        starts = times.searchsorted(times[rows] - pd.Timedelta(window).to_timedelta64(), side='right')
+        return self._frame(rows, starts)
+
+    def to_date(self, period, start=None, end=None):
+        """Ratios accumulated since the start of the day, week or month of each interval"""
+        lo, hi = self._span(start, end)
+        rows = np.arange(lo, hi)
+        times = self.times
+        starts = times.searchsorted(_period_starts(times[rows], period), side='left')
+        return self._frame(rows, starts)
+
+    def ratio(self, window, start=None, end=None):
+        """`rolling` for a Timedelta, `to_date` for 'Day', 'Week' or 'Month'"""
+        if isinstance(window, str):
+            return self.to_date(window, start, end)
+        return self.rolling(window, start, end)
+
+
+@st.cache_resource
+def _ratio_store():
+    return {}, threading.Lock()
+
+
+def load_ratio(station, data_path=DATA_PATH):
+    """
+    Running totals of one station, shared by all sessions. When the data file only
+    gained intervals at the end, the totals are extended instead of rebuilt.
+    """
+    version = dataset_version(data_path)
+    store, lock = _ratio_store()
+    with lock:
+        cached_version, ratio = store.get((data_path, station), (None, None))
+        if ratio is not None and cached_version == version:
+            return ratio
+        df = reactive_frame(load_data(data_path), station)
+        if ratio is not None and ratio.extends(df):
+            ratio.append(df.iloc[ratio.n:])
+        else:
+            ratio = ReactiveRatio(df)
+        store[(data_path, station)] = (version, ratio)
+        return ratio
+
+
+# All stations
+
+def ratio_summary(tetarom_df, station, limit_x1=LIMIT_X1, limit_x3=LIMIT_X3):
+    """Ratios over the whole dataset, and how often intervals and months exceed the limits"""
+    df = reactive_frame(tetarom_df, station)
+    values = np.nan_to_num(df.to_numpy(dtype=np.float64))
+    ea, er_plus, er_minus = values.T
+    total_ea = ea.sum()
+    valid = ea >= MIN_ENERGY
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus = np.where(valid, er_plus / ea, np.nan)
+        minus = np.where(valid, er_minus / ea, np.nan)
+    intervals = max(int(valid.sum()), 1)
+
+    monthly = df.resample('ME').sum()
+    billed = monthly['EA'] >= MIN_ENERGY
+    monthly_ratio = monthly['ER+'][billed] / monthly['EA'][billed]
+    return {
+        'EA MWh': total_ea / 1000,
+        'ER+ / EA': er_plus.sum() / total_ea if total_ea >= MIN_ENERGY else np.nan,
+        'ER- / EA': er_minus.sum() / total_ea if total_ea >= MIN_ENERGY else np.nan,
+        'ER+ over x1 %': 100 * np.count_nonzero(plus > limit_x1) / intervals,
+        'ER+ over x3 %': 100 * np.count_nonzero(plus > limit_x3) / intervals,
+        'ER- over x1 %': 100 * np.count_nonzero(minus > limit_x1) / intervals,
+        'Months ER+ over x1': int((monthly_ratio > limit_x1).sum()),
+        'Months': int(billed.sum()),
+    }
+
+
+def segment_summary(tetarom_df, station, limit=LIMIT_X1):
+    """Stretches of the interval ratio above `limit`, split as on the ratio chart"""
+    erpc = ratio_frame(reactive_frame(tetarom_df, station))
+    summary = {}
+    for column, measure in [('ER+ %age', 'ER+'), ('ER- %age', 'ER-')]:
+        segments, dates, colors = ratio_segments(erpc[column], limit, None)
+        over = [segment_dates for segment_dates, color in zip(dates, colors) if color == 'red']
+        summary[f'{measure} excursions'] = len(over)
+        summary[f'{measure} hours over x1'] = sum((d[-1] - d[0]).total_seconds() for d in over) / 3600
+    return summary
+
+
+def load_station_overview(data_path=DATA_PATH):
+    return _station_overview(data_path, dataset_version(data_path))
+
+
+@st.cache_data
+def _station_overview(data_path, version):
+    stations = load_data(data_path).columns.get_level_values('location').unique()
+    return station_table(
+        map_stations(ratio_summary, stations, data_path, mode='thread'),
+        map_stations(segment_summary, stations, data_path, mode='process'),
+    )
@@ -0,0 +1,81 @@
+"""
+Per-session handle on the data of the selected site.
+
+`st.cache_data` hands every rerun a fresh unpickled copy of what it caches, which
+for the full dataset and the tables derived from it costs more than the page work
+on many reruns. `data_handle(site)` gives each session
+
+    frame         the shared, read-only dataset (`load_data`)
+    forecast      the shared forecast frame (`load_forecast_data`)
+    calendar      the calendar table (`load_calendar`)
+    special_days  holidays, shutdowns and special days (`load_special_days`)
+    derived       anything else computed from the dataset, via `handle.derived(loader, ...)`
+
+The handle holds none of them. Each is looked up in the shared `DatasetCache` on
+every use, which costs no copy: `frame` and `forecast` under their file, the other
+tables under a derived key of the data file, `<data path>#<loader><args>`, as the API
+keeps its totals and rollups. The derived tables are computed once for all sessions,
+and count against ENERGY_MEMORY_BUDGET_MB with the frames, so the cache can drop the
+least recently used of them; a session holding its own references would keep them in
+memory regardless. The home page creates the handle at login without loading
+anything; the handle is replaced when another site is selected or its data or
+forecast file changes. Like the cached frames, nothing obtained from it may be
+modified in place.
+
+The data modules are imported on first use, so the home page can create the
+handle without importing pandas.
+"""
+import streamlit as st
+
+from .manifest import dataset_version, load_manifest
+
+SESSION_KEY = 'data_handle'
+
+
+class DataHandle:
+    """The data of one site at one version of its files; see the module docstring"""
+
+    def __init__(self, site):
+        self.site = site
+        self.version = site.version
+
+    @property
+    def manifest(self):
+        return self.derived(load_manifest, self.site.data_path)
+
+    @property
+    def frame(self):
+        from .utils import load_data
+        return load_data(self.site.data_path)
+
+    @property
+    def forecast(self):
+        from .utils import load_forecast_data
+        return load_forecast_data(self.site.forecast_path)
+
+    @property
+    def calendar(self):
+        from .calendar_index import load_calendar
+        return self.derived(load_calendar, self.site.data_path)
+
+    @property
+    def special_days(self):
+        from .special_days import SPECIAL_DAYS_FILE, load_special_days
+        # Keyed on the version of the calendar file too, so edits show up in the same session
+        return self.derived(load_special_days, self.site.data_path, SPECIAL_DAYS_FILE,
+                            dataset_version(SPECIAL_DAYS_FILE))
+
+    def derived(self, loader, *args):
+        """`loader(*args)`, computed once for all sessions and kept in the dataset cache"""
+        from .utils import dataset_cache
+        key = f"{self.site.data_path}#{loader.__module__}.{loader.__qualname__}{args!r}"
+        return dataset_cache().get((key, self.version), lambda: loader(*args))
+
+
+def data_handle(site):
+    """The session's handle on `site`, replaced when the site or its data or forecast file changes"""
+    handle = st.session_state.get(SESSION_KEY)
+    if handle is None or handle.site != site or handle.version != site.version:
+        handle = DataHandle(site)
+        st.session_state[SESSION_KEY] = handle
+    return handle
@@ -0,0 +1,112 @@
+"""
+Registry of the sites (industrial parks) the dashboard can show.
+
+Sites are listed in a JSON file, `data/sites.json` by default or the file named by
+ENERGY_SITES_FILE:
+
+    {
+        "tetarom": {
+            "name": "Tetarom",
+            "data_path": "data/tetarom_clean_merged_data.feather",
+            "forecast_path": "data/tetarom_ea_forecasts.feather",
+            "description": "Tetarom industrial park, Jucu"
+        },
+        ...
+    }
+
+Without that file the registry holds the single Tetarom site. Nothing is read when
+the registry is built: each dataset is loaded by `load_data` on first use and kept
+in the shared `dataset_cache`, which drops the least recently used datasets once
+they take more than ENERGY_MEMORY_BUDGET_MB together.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import streamlit as st
+
+from .manifest import DATA_PATH, FORECAST_DATA_PATH, dataset_version
+
+SITES_FILE = os.environ.get('ENERGY_SITES_FILE', 'data/sites.json')
+DEFAULT_SITE = 'tetarom'
+
+
+@dataclass(frozen=True)
+class Site:
+    key: str
+    name: str
+    data_path: str
+    forecast_path: str | None = None
+    description: str = ''
+
+    @property
+    def version(self):
+        """Versions of the data file and of the forecast file"""
+        return dataset_version(self.data_path), self.forecast_path and dataset_version(self.forecast_path)
+
+
+def _default_sites():
+    return {
+        DEFAULT_SITE: Site(DEFAULT_SITE, "Tetarom", DATA_PATH, FORECAST_DATA_PATH,
+                           "Tetarom industrial park, Jucu"),
+    }
+
+
+def read_sites(path=SITES_FILE):
+    """Sites by key, in the order of the file; the built-in default if there is no file"""
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return _default_sites()
+    sites = {}
+    for key, entry in entries.items():
+        if 'data_path' not in entry:
+            raise ValueError(f"Site '{key}' in {path} has no data_path")
+        sites[key] = Site(
+            key=key,
+            name=entry.get('name', key),
+            data_path=entry['data_path'],
+            forecast_path=entry.get('forecast_path'),
+            description=entry.get('description', ''),
+        )
+    if not sites:
+        raise ValueError(f"No sites in {path}")
+    return sites
+
+
+def load_sites(path=SITES_FILE):
+    return _load_sites(path, dataset_version(path))
+
+
+@st.cache_data
+def _load_sites(path, version):
+    return read_sites(path)
+
+
+def get_site(key=None, path=SITES_FILE):
+    """Site `key`, or the first one; raises KeyError for an unknown key"""
+    sites = load_sites(path)
+    if key is None:
+        return next(iter(sites.values()))
+    return sites[key]
+
+
+def site_selector():
+    """
+    Site picker in the sidebar, shared by all pages through the session state.
+    With a single site nothing is shown.
+    """
+    sites = load_sites()
+    keys = list(sites)
+    # Kept under a key of its own: widget state does not survive switching pages
+    if st.session_state.get('selected_site') not in sites:
+        st.session_state.selected_site = keys[0]
+    if len(keys) > 1:
+        st.session_state.selected_site = st.sidebar.selectbox(
+            "Site",
+            options=keys,
+            index=keys.index(st.session_state.selected_site),
+            format_func=lambda key: sites[key].name
+        )
+    return sites[st.session_state.selected_site]
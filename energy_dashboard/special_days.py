@@ -0,0 +1,152 @@
+"""
+Public holidays, plant shutdowns and other special days, as tables over the data index.
+
+The calendar is the Romanian public holidays plus the entries of a JSON file,
+`data/special_days.json` by default or the file named by ENERGY_SPECIAL_DAYS_FILE:
+
+    {
+        "public_holidays": {"before": 1, "after": 1},
+        "days": [
+            {"name": "Summer shutdown", "start": "2024-08-05", "end": "2024-08-16", "kind": "shutdown"},
+            {"name": "Inventory", "start": "2024-12-30", "kind": "special", "after": 1}
+        ]
+    }
+
+`kind` is 'holiday', 'shutdown' or 'special' (the default); `before` and `after`
+are the number of days around each day of the entry that get their own window
+columns, e.g. the bridge days around a holiday. `"public_holidays": false` leaves
+the public holidays out.
+
+`load_special_days(data_path)` returns a `SpecialDays`, built once per version of
+the dataset and of the calendar file:
+
+    events   one row per day of each entry (day, name, kind, before, after)
+    table    bool, aligned row for row with `load_data()`; one column per
+             (kind, name, offset), offset 0 for the day itself and -before .. after
+             for its window
+
+`mask()` gives the rows to leave out of averages and model fits (holidays and
+shutdowns by default), `prophet_holidays()` the same schedule in the `holidays`
+format of Prophet, with `lower_window` / `upper_window`.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from .calendar_index import load_calendar, public_holidays
+from .utils import DATA_PATH, dataset_version
+
+SPECIAL_DAYS_FILE = os.environ.get('ENERGY_SPECIAL_DAYS_FILE', 'data/special_days.json')
+KINDS = ('holiday', 'shutdown', 'special')
+# Kinds left out of intra-week averages and forecast fits
+EXCLUDED_KINDS = ('holiday', 'shutdown')
+# Window of the public holidays when the file does not set one
+HOLIDAY_WINDOW = {'before': 0, 'after': 0}
+
+EVENT_COLUMNS = ['day', 'name', 'kind', 'before', 'after']
+
+
+def read_special_days(path=SPECIAL_DAYS_FILE):
+    """The calendar file, or the public holidays alone if there is none"""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {'public_holidays': HOLIDAY_WINDOW, 'days': []}
+    for entry in config.get('days', []):
+        if entry.get('kind', 'special') not in KINDS:
+            raise ValueError(f"{path}: unknown kind {entry['kind']!r} of {entry.get('name')!r}, "
+                             f"expected one of {', '.join(KINDS)}")
+    return config
+
+
+def special_day_events(years, config):
+    """One row per day of each calendar entry falling in `years`"""
+    frames = []
+    window = config.get('public_holidays', HOLIDAY_WINDOW)
+    if window is not False:
+        window = HOLIDAY_WINDOW if window is True else {**HOLIDAY_WINDOW, **window}
+        names = public_holidays(years)
+        frames.append(pd.DataFrame({'day': names.index, 'name': names.to_numpy(), 'kind': 'holiday',
+                                    'before': window['before'], 'after': window['after']}))
+    for entry in config.get('days', []):
+        days = pd.date_range(entry['start'], entry.get('end', entry['start']), freq='D')
+        frames.append(pd.DataFrame({'day': days, 'name': entry['name'], 'kind': entry.get('kind', 'special'),
+                                    'before': entry.get('before', 0), 'after': entry.get('after', 0)}))
+    events = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=EVENT_COLUMNS)
+    events = events[EVENT_COLUMNS].astype({'day': 'datetime64[ns]', 'before': np.int32, 'after': np.int32})
+    events = events[events['day'].dt.year.isin(list(years))]
+    return events.sort_values(['day', 'kind', 'name'], ignore_index=True)
+
+
+def special_day_table(day_ids, events, index=None):
+    """
+    Indicator (offset 0) and window columns of `events` for rows on the days
+    `day_ids` (days since 1970-01-01, the `day_id` column of `calendar_table`)
+    """
+    day_ids = np.asarray(day_ids, dtype=np.int64)
+    # Each event day spread over its window: one (day, column) pair per offset
+    widths = (events['before'] + events['after'] + 1).to_numpy(np.int64)
+    rows = np.repeat(np.arange(len(events)), widths)
+    offsets = np.arange(widths.sum()) - np.repeat(np.cumsum(widths) - widths, widths) \
+        - events['before'].to_numpy(np.int64)[rows]
+    spread = pd.DataFrame({'kind': events['kind'].to_numpy()[rows], 'name': events['name'].to_numpy()[rows],
+                           'offset': offsets})
+    columns = pd.MultiIndex.from_frame(spread.drop_duplicates().sort_values(['kind', 'name', 'offset']))
+    codes = columns.get_indexer(pd.MultiIndex.from_frame(spread))
+    targets = events['day'].to_numpy('datetime64[D]').astype(np.int64)[rows] + offsets
+
+    # Flags per calendar day, then one lookup per row
+    first = day_ids.min() if len(day_ids) else 0
+    n_days = day_ids.max() - first + 1 if len(day_ids) else 0
+    grid = np.zeros((n_days, len(columns)), dtype=bool)
+    inside = (targets >= first) & (targets < first + n_days)
+    grid[targets[inside] - first, codes[inside]] = True
+    return pd.DataFrame(grid[day_ids - first], index=index, columns=columns)
+
+
+@dataclass(frozen=True)
+class SpecialDays:
+    """The special-day calendar over one dataset; see the module docstring"""
+    events: pd.DataFrame
+    table: pd.DataFrame
+
+    def mask(self, kinds=EXCLUDED_KINDS, windows=False):
+        """Rows on a day of one of `kinds`, and with `windows` also on the days around it"""
+        columns = self.table.columns
+        selected = columns.get_level_values('kind').isin(kinds)
+        if not windows:
+            selected &= columns.get_level_values('offset') == 0
+        return self.table.to_numpy()[:, selected].any(axis=1)
+
+    def prophet_holidays(self):
+        """The calendar as a Prophet `holidays` frame"""
+        return pd.DataFrame({
+            'holiday': self.events['name'],
+            'ds': self.events['day'],
+            'lower_window': -self.events['before'],
+            'upper_window': self.events['after'],
+        })
+
+
+def load_special_days(data_path=DATA_PATH, days_path=SPECIAL_DAYS_FILE, days_version=None):
+    """
+    The calendar over the dataset at `data_path`. `days_version` is the version of
+    the calendar file, looked up when not given
+    """
+    if days_version is None:
+        days_version = dataset_version(days_path)
+    return _load_special_days(data_path, dataset_version(data_path), days_path, days_version)
+
+
+@st.cache_data
+def _load_special_days(data_path, version, days_path, days_version):
+    calendar = load_calendar(data_path)
+    # One more year than the data, so a model fit on it has the holidays of its forecast horizon
+    years = range(calendar.index.min().year, calendar.index.max().year + 2) if len(calendar) else range(0)
+    events = special_day_events(years, read_special_days(days_path))
+    return SpecialDays(events, special_day_table(calendar['day_id'].to_numpy(), events, calendar.index))
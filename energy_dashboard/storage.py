@@ -0,0 +1,150 @@
+"""
+On-disk layouts of the datasets, and the reader `load_data` goes through.
+
+Every layout holds the same Arrow table (with the pandas metadata that restores the
+time index and column levels), so any of them loads into an identical frame:
+
+    feather              Arrow IPC, uncompressed (memory mappable)
+    feather-lz4          Arrow IPC, LZ4 frames
+    feather-zstd         Arrow IPC, ZSTD
+    parquet-dict         Parquet, dictionary encoding, Snappy
+    parquet-zstd         Parquet, dictionary encoding, ZSTD
+    parquet-delta-zstd   Parquet, delta-encoded timestamps, byte-stream-split floats, ZSTD
+
+The layout name is stored in the file's schema metadata and copied into the
+manifest, which also records the container format read by `read_frame`. To switch a
+site to another layout, rewrite its files and point `data/sites.json` at them:
+
+    python -m energy_dashboard.storage data/tetarom_clean_merged_data.feather --layouts parquet-zstd
+
+`benchmarks/storage_formats.py` compares the layouts on size, load time and memory.
+"""
+import argparse
+import ast
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from .manifest import build_manifest, file_format, index_columns, write_manifest
+
+LAYOUT_KEY = b'energy_dashboard.layout'
+
+# Layout name -> (format, writer options)
+LAYOUTS = {
+    'feather': ('feather', {'compression': 'uncompressed'}),
+    'feather-lz4': ('feather', {'compression': 'lz4'}),
+    'feather-zstd': ('feather', {'compression': 'zstd'}),
+    'parquet-dict': ('parquet', {'compression': 'snappy'}),
+    'parquet-zstd': ('parquet', {'compression': 'zstd'}),
+    'parquet-delta-zstd': ('parquet', {'compression': 'zstd', 'use_dictionary': False, 'delta': True}),
+}
+EXTENSIONS = {'feather': '.feather', 'parquet': '.parquet'}
+
+# Rows per feather record batch / parquet row group, a year of 15-minute data
+DEFAULT_BATCH_ROWS = 35_136
+
+
+def _parquet_encodings(schema):
+    # Delta encoding only applies to integers and timestamps, floats get split into byte streams
+    encodings = {}
+    for field in schema:
+        if pa.types.is_timestamp(field.type) or pa.types.is_integer(field.type):
+            encodings[field.name] = 'DELTA_BINARY_PACKED'
+        elif pa.types.is_floating(field.type):
+            encodings[field.name] = 'BYTE_STREAM_SPLIT'
+    return encodings
+
+
+def write_frame(df, path, layout='feather', batch_rows=DEFAULT_BATCH_ROWS):
+    """Write `df` to `path` in `layout`, including its index"""
+    fmt, options = LAYOUTS[layout]
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), LAYOUT_KEY: layout.encode()})
+    if fmt == 'feather':
+        feather.write_feather(table, path, chunksize=batch_rows, **options)
+    else:
+        options = dict(options)
+        if options.pop('delta', False):
+            options['column_encoding'] = _parquet_encodings(table.schema)
+        pq.write_table(table, path, row_group_size=batch_rows, **options)
+    return path
+
+
+def file_layout(schema):
+    """Layout name stored in an Arrow schema, None for files not written by `write_frame`"""
+    layout = (schema.metadata or {}).get(LAYOUT_KEY)
+    return layout.decode() if layout else None
+
+
+def station_columns(schema, stations):
+    """Index columns and the (measure, location) columns of `stations`, in file order"""
+    index = index_columns(schema)
+    columns = []
+    for name in schema.names:
+        if name in index:
+            columns.append(name)
+        elif name.startswith('(') and ast.literal_eval(name)[1] in stations:
+            columns.append(name)
+    return columns
+
+
+def read_schema(path, fmt=None):
+    fmt = fmt or file_format(path)
+    if fmt == 'parquet':
+        return pq.read_schema(path)
+    return pa.ipc.open_file(pa.memory_map(str(path))).schema
+
+
+def read_frame(path, fmt=None, stations=None):
+    """
+    Load a dataset written in any layout as a DataFrame, like `pd.read_feather`.
+    `fmt` is the container format ('feather' or 'parquet'), by default taken from the
+    file itself; `stations` limits the read to the columns of those locations.
+    """
+    fmt = fmt or file_format(path)
+    columns = None
+    if stations is not None:
+        columns = station_columns(read_schema(path, fmt), stations)
+    if fmt == 'parquet':
+        table = pq.read_table(path, columns=columns)
+    else:
+        table = feather.read_table(path, columns=columns)
+    return table.to_pandas()
+
+
+def rewrite(path, layouts, out_dir=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Rewrite the dataset at `path` in each of `layouts`, next to it or in `out_dir`,
+    as `<name>.<layout>.<ext>`. Returns the written paths by layout.
+    """
+    df = read_frame(path)
+    base = os.path.splitext(os.path.basename(path))[0]
+    out_dir = out_dir or os.path.dirname(path)
+    written = {}
+    for layout in layouts:
+        fmt = LAYOUTS[layout][0]
+        dest = os.path.join(out_dir, f"{base}.{layout}{EXTENSIONS[fmt]}")
+        write_frame(df, dest, layout, batch_rows)
+        write_manifest(dest, build_manifest(dest))
+        written[layout] = dest
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite datasets in other storage layouts")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--layouts', nargs='+', choices=list(LAYOUTS), default=list(LAYOUTS))
+    parser.add_argument('--out', help="output directory (default: next to each dataset)")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    for path in args.paths:
+        for layout, dest in rewrite(path, args.layouts, args.out, args.batch_rows).items():
+            print(f"{layout:<20} {os.path.getsize(dest) / 2**20:8.2f} MB  {dest}")
+
+
+if __name__ == '__main__':
+    main()
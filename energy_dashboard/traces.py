@@ -0,0 +1,105 @@
+import os
+
+import plotly.graph_objects as go
+
+from .utils import COLORS
+
+# Traces with more points than this are drawn with WebGL instead of SVG.
+# Can be overridden per deployment through the environment.
+WEBGL_THRESHOLD = int(os.getenv('WEBGL_THRESHOLD', 5000))
+
+# Scatter features that Scattergl either cannot draw or draws differently.
+# 'tonexty'-style fills between a GL trace and an SVG trace do not line up,
+# and spline smoothing is SVG only.
+SVG_ONLY_FILLS = ('tonexty', 'tonextx', 'tonext', 'toself')
+SVG_ONLY_LINE_SHAPES = ('spline',)
+
+
+def _n_points(y):
+    if y is None:
+        return 0
+    try:
+        return len(y)
+    except TypeError:
+        return 0
+
+
+def needs_svg(line=None, fill=None):
+    """True if the requested styling is only supported by SVG traces"""
+    if fill in SVG_ONLY_FILLS:
+        return True
+    if line and line.get('shape') in SVG_ONLY_LINE_SHAPES:
+        return True
+    return False
+
+
+def use_webgl(n_points, line=None, fill=None, threshold=None):
+    if threshold is None:
+        threshold = WEBGL_THRESHOLD
+    if needs_svg(line, fill):
+        return False
+    return n_points > threshold
+
+
+def make_trace(x, y, name=None, color=None, line=None, marker=None, fill=None,
+               webgl=None, webgl_threshold=None, color_map=COLORS, **kwargs):
+    """
+    Build a scatter trace, switching to Scattergl above `webgl_threshold` points.
+
+    `color` defaults to the entry for `name` in `color_map` and is applied to the
+    line and, when given, the marker. `webgl` forces the trace type (True/False);
+    leave it as None to pick automatically.
+    """
+    line = dict(line or {})
+    if color is None and name in color_map:
+        color = color_map[name]
+    if color is not None:
+        line.setdefault('color', color)
+
+    if marker is not None:
+        marker = dict(marker)
+        if color is not None:
+            marker.setdefault('color', color)
+        kwargs['marker'] = marker
+
+    if fill is not None:
+        kwargs['fill'] = fill
+
+    if webgl is None:
+        webgl = use_webgl(_n_points(y), line, fill, webgl_threshold)
+    elif webgl and needs_svg(line, fill):
+        webgl = False
+
+    if webgl:
+        # Scattergl has no smoothing; drop it so the same line dict works for both
+        line.pop('smoothing', None)
+        return go.Scattergl(x=x, y=y, name=name, line=line, **kwargs)
+    return go.Scatter(x=x, y=y, name=name, line=line, **kwargs)
+
+
+def make_band(x, upper, lower, name=None, fillcolor='rgba(68, 68, 68, 0.1)', **kwargs):
+    """
+    Shaded band between `upper` and `lower`, as two traces to add in order.
+
+    Both are kept as SVG: the lower trace fills 'tonexty' to the upper one, which
+    only lines up when neither of them is drawn with WebGL.
+    """
+    invisible = dict(color='rgba(0,0,0,0)')
+    upper_trace = make_trace(
+        x, upper,
+        name=name,
+        line=invisible,
+        showlegend=False,
+        webgl=False,
+        **kwargs
+    )
+    lower_trace = make_trace(
+        x, lower,
+        name=name,
+        line=invisible,
+        fill='tonexty',
+        fillcolor=fillcolor,
+        webgl=False,
+        **kwargs
+    )
+    return upper_trace, lower_trace
@@ -1,6 +1,15 @@
+import dataclasses
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from .manifest import DATA_PATH, FORECAST_DATA_PATH, dataset_version, load_manifest
+from .storage import read_frame
+
 COLORS = {
     'EA+': '#1f77b4',     # blue
     'EA-': '#ff7f0e',     # orange
@@ -22,17 +31,96 @@ def strip_unit_tup(x):
     a = strip_unit(a)
     return (a, b)
 
-def resample_data(df, period):
-    if period == "Day (6H)" or period == "6-hours":
-        return df.resample('6h').sum()
-    elif period == "Day":
-        return df.resample('d').sum()
-    elif period == "Week":
-        return df.resample('W').sum()
-    elif period == "Month":
-        return df.resample('ME').sum()
-    else:
+# Resample rule behind each aggregation period offered by the pages
+RESAMPLE_RULES = {
+    "6-hours": '6h',
+    "Day (6H)": '6h',
+    "Day": 'd',
+    "Week": 'W',
+    "Month": 'ME',
+}
+
+# Calendar code that identifies the buckets of a period, and the label rule pandas uses
+CALENDAR_BUCKETS = {
+    "Day": ('day_id', 'd'),
+    "Week": ('week_id', 'W'),
+    "Month": ('month_id', 'ME'),
+}
+
+def resample_data(df, period, calendar=None):
+    if period not in RESAMPLE_RULES:
         raise ValueError(f"Invalid period: {period}")
+    if calendar is not None and period in CALENDAR_BUCKETS and _aligned(calendar, df.index) \
+            and all(pd.api.types.is_float_dtype(t) for t in df.dtypes):
+        return _calendar_sum(df, period, calendar)
+    return df.resample(RESAMPLE_RULES[period]).sum()
+
+def _aligned(calendar, index):
+    return calendar.index is index or calendar.index.equals(index)
+
+def _calendar_sum(df, period, calendar):
+    """`df.resample(...).sum()` for calendar periods, summing runs of equal bucket codes"""
+    code_col, rule = CALENDAR_BUCKETS[period]
+    codes = calendar[code_col].to_numpy()
+    values = np.nan_to_num(df.to_numpy(dtype=np.float64))
+    if not len(codes):
+        return df.resample(rule).sum()
+    starts = np.r_[0, np.nonzero(np.diff(codes))[0] + 1]
+    # Empty buckets between the first and last one sum to zero, as with resample
+    sums = np.zeros((codes[-1] - codes[0] + 1, values.shape[1]))
+    sums[codes[starts] - codes[0]] = np.add.reduceat(values, starts, axis=0)
+    # Day buckets are labelled by their start, week (Sunday) and month buckets by their last day
+    first = df.index[0].normalize() if period == "Day" else \
+        pd.Period(df.index[0], rule.rstrip('E')).end_time.normalize()
+    labels = pd.date_range(first, periods=len(sums), freq=rule, name=df.index.name, unit=df.index.unit)
+    return pd.DataFrame(sums, index=labels, columns=df.columns)
+
+def station_totals(df):
+    """Sum of each measure across all stations, one column per measure"""
+    measures = df.columns.get_level_values('measure').unique()
+    return pd.DataFrame({measure: df[measure].sum(axis=1) for measure in measures}, index=df.index)
+
+def intra_week_pattern(series, aggregation_period, calendar=None, exclude=None):
+    """
+    Mean value per time-in-week slot (rows) for each week or month (columns).
+
+    Grouping goes through the integer codes of `calendar_table`; pass the cached
+    table from `load_calendar()` when `series` is aligned with the full dataset.
+    Rows where the boolean array `exclude` (aligned with `series`, e.g.
+    `SpecialDays.mask()`) is set are left out of the means.
+    """
+    if calendar is None or not _aligned(calendar, series.index):
+        from .calendar_index import calendar_table
+        calendar = calendar_table(series.index)
+    slots_per_day = calendar.attrs['slots_per_day']
+    slot_of_week = calendar['dow'].to_numpy(np.int64) * slots_per_day + calendar['slot'].to_numpy()
+
+    # Group by selected period
+    group_col = 'month' if aggregation_period == "Month" else 'week'
+    period_ids = calendar[f'{group_col}_id'].to_numpy(np.int64)
+    first = period_ids.min() if len(period_ids) else 0
+    n_periods = period_ids.max() - first + 1 if len(period_ids) else 1
+
+    values = series.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    if exclude is not None:
+        valid &= ~np.asarray(exclude, dtype=bool)
+    cells = slot_of_week[valid] * n_periods + (period_ids[valid] - first)
+    size = 7 * slots_per_day * n_periods
+    sums = np.bincount(cells, weights=values[valid], minlength=size).reshape(-1, n_periods)
+    counts = np.bincount(cells, minlength=size).reshape(-1, n_periods)
+
+    # Like pivot_table, keep only the slots and periods that have data
+    rows = np.nonzero(counts.any(axis=1))[0]
+    cols = np.nonzero(counts.any(axis=0))[0]
+    sums, counts = sums[np.ix_(rows, cols)], counts[np.ix_(rows, cols)]
+    means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+    interval = pd.Timedelta(days=1) // slots_per_day
+    index = pd.TimedeltaIndex(rows * interval.value, name='time_in_week')
+    freq = 'M' if group_col == 'month' else 'W'
+    columns = pd.PeriodIndex.from_ordinals(cols + first, freq=freq, name=group_col)
+    return pd.DataFrame(means, index=index, columns=columns)
 
 def update_plot_style(fig, color_map=COLORS):
     # Check if dark mode is enabled by checking the background color
@@ -94,25 +182,120 @@ def update_plot_style(fig, color_map=COLORS):
     )
     return fig
 
-@st.cache_data
-def load_data():
-    data_path = 'data/tetarom_clean_merged_data.feather'
+def window_slice(index, start, end):
+    """Positional slice of the rows of a sorted DatetimeIndex that fall within [start, end]"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start.tz is not None or end.tz is not None:
+        # to_datetime64 would silently give UTC, against an index in local time
+        raise ValueError("Window bounds must be naive local times")
+    values = index.values
+    lo = values.searchsorted(start.to_datetime64(), side='left')
+    hi = values.searchsorted(end.to_datetime64(), side='right')
+    return slice(lo, hi)
+
+# Memory the raw datasets of all sites may take together before the least recently
+# used ones are dropped
+MEMORY_BUDGET_MB = float(os.environ.get('ENERGY_MEMORY_BUDGET_MB', 1024))
+
+def nbytes(obj):
+    """Memory held by the frames and arrays of `obj`, looking into containers and dataclasses"""
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(index=True, deep=True) if not isinstance(obj, pd.Index) else obj.memory_usage(deep=True)
+        return int(np.sum(usage))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(value) for value in obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sum(nbytes(getattr(obj, field.name)) for field in dataclasses.fields(obj))
+    return 0
+
+class DatasetCache:
+    """
+    Loaded frames, and tables derived from them, keyed by (path, version), evicting
+    the least recently used ones once their total size (`nbytes`) exceeds `budget`
+    bytes. The entry just loaded is always kept, even if it alone is over budget.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key][0]
+        # Load outside the lock so other datasets stay available meanwhile
+        frame = load()
+        size = nbytes(frame)
+        with self._lock:
+            # Older versions of the same file are of no further use
+            for old in [k for k in self._frames if k[0] == key[0] and k != key]:
+                del self._frames[old]
+            self._frames[key] = (frame, size)
+            self._frames.move_to_end(key)
+            while len(self._frames) > 1 and self.nbytes > self.budget:
+                self._frames.popitem(last=False)
+        return frame
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size in self._frames.values())
+
+    def keys(self):
+        with self._lock:
+            return list(self._frames)
+
+@st.cache_resource
+def dataset_cache():
+    return DatasetCache(MEMORY_BUDGET_MB * 2**20)
+
+def load_data(data_path=DATA_PATH):
+    # Frames are shared between sessions: callers must not modify them in place
+    return dataset_cache().get((data_path, dataset_version(data_path)), lambda: _read_data(data_path))
+
+def _data_format(data_path):
+    # Container format declared by the manifest; the reader fails below if the file is missing
+    manifest = load_manifest(data_path)
+    return manifest['format'] if manifest else None
+
+def _read_data(data_path):
     try:
-        tetarom_df = pd.read_feather(data_path)
+        tetarom_df = read_frame(data_path, _data_format(data_path))
         tetarom_df.columns = tetarom_df.columns.map(strip_unit_tup)
+        # Window lookups binary search the index, so keep it sorted
+        if not tetarom_df.index.is_monotonic_increasing:
+            tetarom_df = tetarom_df.sort_index()
         return tetarom_df
     except FileNotFoundError:
         st.error(f"Data file not found: {data_path}")
         st.info("Please ensure the data file exists in the correct location.")
         return pd.DataFrame()  # Return empty DataFrame
 
+def load_day_options(data_path=DATA_PATH):
+    return _day_options(data_path, dataset_version(data_path))
+
 @st.cache_data
-def load_forecast_data():
-    data_path = 'data/tetarom_ea_forecasts.feather'
+def _day_options(data_path, version):
+    # One 'YYYY-MM-DD' entry per calendar day covered by the dataset, from the manifest
+    manifest = load_manifest(data_path)
+    if not manifest or not manifest['rows']:
+        return []
+    days = pd.date_range(pd.Timestamp(manifest['start']).normalize(), pd.Timestamp(manifest['end']).normalize(), freq='D')
+    return days.strftime('%Y-%m-%d').tolist()
+
+def load_forecast_data(data_path=FORECAST_DATA_PATH):
+    return dataset_cache().get((data_path, dataset_version(data_path)), lambda: _read_forecast_data(data_path))
+
+def _read_forecast_data(data_path):
     try:
-        forecast_df = pd.read_feather(data_path)
+        forecast_df = read_frame(data_path, _data_format(data_path))
         return forecast_df
     except FileNotFoundError:
         st.error(f"Forecast data file not found: {data_path}")
         st.info("Please ensure the forecast data file exists in the correct location.")
-        return pd.DataFrame()  # Return empty DataFrame
\ No newline at end of file
+        return pd.DataFrame()  # Return empty DataFrame
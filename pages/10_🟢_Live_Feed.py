@@ -0,0 +1,85 @@
+import streamlit as st
+
+# Set page config
+st.set_page_config(
+    layout="wide",
+    page_title="Live Feed",
+    initial_sidebar_state="expanded",
+    page_icon="⚡"
+)
+
+# Check authentication
+if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+    st.error("Please log in from the home page to access this content.")
+    st.stop()
+
+# Data and plotting modules are only imported once the user is logged in
+import pandas as pd
+
+from energy_dashboard.live import LIVE_SOURCE, ROLLUP_PERIODS, start_live
+from energy_dashboard.figures import overview_figure, reactive_frame, reactive_usage_figure, stations
+from energy_dashboard.sites import site_selector
+
+# Seconds between refreshes of the live section
+REFRESH_SECONDS = 5
+# Buckets and hours of intervals shown
+ROLLUP_BUCKETS = 30
+RECENT_HOURS = 48
+ALERT_ROWS = 20
+
+site = site_selector()
+
+st.title("Live Feed")
+
+tail = start_live(site.data_path, LIVE_SOURCE, site.forecast_path)
+st.caption(f"New intervals from `{LIVE_SOURCE}` are added on top of the {site.name} dataset "
+           f"(set ENERGY_LIVE_SOURCE to change the feed).")
+
+col1, col2 = st.columns([1, 1])
+with col1:
+    period = st.segmented_control("Buckets", options=ROLLUP_PERIODS, default="Day") or "Day"
+with col2:
+    station = st.segmented_control("Select Station", options=tail.stations, default=tail.stations[0]) \
+        or tail.stations[0]
+
+
+# Only this part reruns on every refresh; the widgets above keep their state
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_view():
+    status = tail.status()
+    if status['error']:
+        st.error(f"Live feed stopped: {status['error']}")
+
+    columns = st.columns(len(tail.stations) + 1)
+    columns[0].metric("Intervals received", status['received'], help=f"{status['rejected']} rejected (late or malformed)")
+    for column, name in zip(columns[1:], tail.stations):
+        state = status['exceedance'][name]
+        ratio = "-" if pd.isna(state['ratio']) else f"{state['ratio']:.2%}"
+        column.metric(f"{name} ER+ / EA", ratio,
+                      delta=f"over {state['level']} since {state['since']:%d %b %H:%M}" if state['level'] else None,
+                      delta_color="inverse")
+        column.caption(f"Last interval {status['last'][name]:%Y-%m-%d %H:%M}, "
+                       f"{state['excursions']} excursions since the feed started")
+
+    # Trailing buckets, history and live together
+    rollup = tail.rollup(period, ROLLUP_BUCKETS) / 1000
+    fig1 = overview_figure(rollup, period, "MWh", stations(tail.history))
+    fig1.update_layout(height=450)
+    st.plotly_chart(fig1, use_container_width=True)
+
+    history_end = status['history_end']
+    recent = tail.recent(history_end - pd.Timedelta(hours=RECENT_HOURS))
+    fig2 = reactive_usage_figure(reactive_frame(recent, station), station)
+    fig2.add_vline(x=history_end, line_dash="dot", line_color="gray")
+    st.plotly_chart(fig2, use_container_width=True)
+
+    st.subheader("Recent alerts")
+    alerts = tail.engine.outbox.recent(ALERT_ROWS)
+    if alerts:
+        table = pd.DataFrame(alerts[::-1])[['time', 'station', 'kind', 'message']]
+        st.dataframe(table, use_container_width=True, hide_index=True)
+    else:
+        st.info(f"No alerts yet ({len(tail.engine.rules)} rules).")
+
+
+live_view()
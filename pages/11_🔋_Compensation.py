@@ -0,0 +1,82 @@
+import streamlit as st
+
+# Set page config
+st.set_page_config(
+    layout="wide",
+    page_title="Compensation",
+    initial_sidebar_state="expanded",
+    page_icon="⚡"
+)
+
+# Check authentication
+if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+    st.error("Please log in from the home page to access this content.")
+    st.stop()
+
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.compensation import BANK_MODES, N_SIZES, load_bank_savings, load_compensation
+from energy_dashboard.figures import LIMIT_X1, bank_sizing_figure, kvar_distribution_figure
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
+
+site = site_selector()
+data = data_handle(site)
+
+st.title("Power Factor and Compensation")
+
+with st.spinner('Loading and processing data...'):
+    compensation = data.derived(load_compensation, site.data_path)
+    station_options = list(compensation['kvar'].columns)
+
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        station = st.segmented_control(
+            "Select Station",
+            options=station_options,
+            default=station_options[0]
+        ) or station_options[0]
+    with col2:
+        mode = st.segmented_control(
+            "Bank",
+            options=BANK_MODES,
+            default=BANK_MODES[0],
+            help="A switched bank only supplies what brings each interval down to the x1 limit; "
+                 "a fixed bank supplies its full output all the time"
+        ) or BANK_MODES[0]
+    with col3:
+        price = st.number_input("Reactive energy price (lei/kvarh)", min_value=0.0, value=0.0, step=0.01,
+                                help="Leave at 0 to see the savings in kvarh only")
+
+    cos_phi = compensation['cos_phi'][station]
+    kvar = compensation['kvar'][station]
+    monthly = compensation['monthly'][station]
+
+    cols = st.columns(4)
+    cols[0].metric("Median cos φ", f"{cos_phi.median():.3f}")
+    cols[1].metric("Worst month cos φ", f"{monthly['cos φ'].min():.3f}")
+    # Out of the intervals with EA of at least MIN_ENERGY, where cos φ is defined, as in the sizing table
+    cols[2].metric(f"Intervals over x1 ({LIMIT_X1})", f"{(kvar[cos_phi.notna()] > 0).mean():.2%}")
+    cols[3].metric("Largest requirement", f"{kvar.max():,.0f} kvar")
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.plotly_chart(kvar_distribution_figure(kvar, station), use_container_width=True)
+    with col2:
+        st.subheader("Monthly billing")
+        table = monthly.round(0)
+        table['cos φ'] = monthly['cos φ'].round(3)
+        table.index = table.index.astype(str)
+        st.dataframe(table, use_container_width=True)
+
+    # Every candidate size at once, from no bank to the largest requirement
+    savings = data.derived(load_bank_savings, station, mode, N_SIZES, site.data_path)
+    st.plotly_chart(bank_sizing_figure(savings, station, mode), use_container_width=True)
+
+    # Within half a kvarh of the largest saving
+    saved = savings['Saved kvarh']
+    smallest = saved.index[saved >= saved.max() - 0.5][0]
+    summary = f"The smallest {mode} bank with the largest saving is **{smallest:,.0f} kvar**, " \
+              f"saving {saved[smallest]:,.0f} kvarh of billed reactive energy"
+    if price > 0:
+        summary += f" ({saved[smallest] * price:,.0f} lei)"
+    st.markdown(summary + " over the dataset.")
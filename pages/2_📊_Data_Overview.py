@@ -1,7 +1,4 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-from energy_dashboard import strip_unit_tup, resample_data, update_plot_style, load_data
 
 # Set page config
 st.set_page_config(
@@ -16,6 +13,14 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.error("Please log in from the home page to access this content.")
     st.stop()
 
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
+from energy_dashboard.figures import overview_frame, overview_figure, stations
+
+site = site_selector()
+data = data_handle(site)
+
 # Create placeholder for the title
 title_placeholder = st.empty()
 title_placeholder.title("Data Overview")
@@ -25,11 +30,7 @@ main_placeholder = st.empty()
 
 with st.spinner('Loading and processing data...'):
     # Load data
-    tetarom_df = load_data()
-
-    # Convert MultiIndex DataFrame to regular DataFrame with flattened column names
-    flat_df = tetarom_df.copy()
-    flat_df.columns = [f"{col[0]} - {col[1]}" for col in tetarom_df.columns]
+    tetarom_df = data.frame
 
     # Prepare all the data and create the figure
     with main_placeholder.container():
@@ -45,10 +46,6 @@ with st.spinner('Loading and processing data...'):
                 label_visibility="hidden"
             )
 
-        # Apply resampling
-
-        resampled_df = resample_data(flat_df, resample_period)
-
         # Add unit selection
         with col2:
             unit = st.segmented_control(
@@ -58,146 +55,9 @@ with st.spinner('Loading and processing data...'):
                 label_visibility="hidden"
             )
 
-    # Convert to MWh only if selected
-    if unit == "MWh":
-        resampled_df = resampled_df / 1000
-
-    # Create figure with custom colors
-    fig1 = go.Figure()
-
-    # Color scheme for stations
-    station_colors = {
-        'Statia Jucu 1': '#1f77b4',  # blue
-        'Statia Jucu 2': '#2ca02c',  # green
-    }
-
-    # Add traces with consistent colors
-    for station in ['Statia Jucu 1', 'Statia Jucu 2']:
-        # EA+ solid line
-        fig1.add_trace(go.Scatter(
-            x=resampled_df.index,
-            y=resampled_df[f'EA+ - {station}'],
-            name=f'EA+ - {station}',
-            mode='lines+markers',
-            marker=dict(
-                color=station_colors[station],
-                size=1
-            ),
-            line=dict(
-                color=station_colors[station],
-                shape='linear'
-            ),
-            connectgaps=False,
-            legendgroup=f'group_{station}'
-        ))
-        
-        # EA- dashed line
-        fig1.add_trace(go.Scatter(
-            x=resampled_df.index,
-            y=resampled_df[f'EA- - {station}'],
-            name=f'EA- - {station}',
-            mode='lines+markers',
-            marker=dict(
-                color=station_colors[station],
-                size=1,
-                symbol='x'
-            ),
-            line=dict(
-                color=station_colors[station],
-                dash='dash',
-                shape='linear'
-            ),
-            connectgaps=False,
-            legendgroup=f'group_{station}'
-        ))
-        
-        # ER+ dotted line
-        fig1.add_trace(go.Scatter(
-            x=resampled_df.index,
-            y=resampled_df[f'ER+ - {station}'],
-            name=f'ER+ - {station}',
-            mode='lines+markers',
-            marker=dict(
-                color=station_colors[station],
-                size=1,
-                symbol='diamond'
-            ),
-            line=dict(
-                color=station_colors[station],
-                dash='dot',
-                shape='linear'
-            ),
-            connectgaps=False,
-            opacity=0.7,
-            legendgroup=f'group_{station}'
-        ))
-        
-        # ER- dash-dot line
-        fig1.add_trace(go.Scatter(
-            x=resampled_df.index,
-            y=resampled_df[f'ER- - {station}'],
-            name=f'ER- - {station}',
-            mode='lines+markers',
-            marker=dict(
-                color=station_colors[station],
-                size=1,
-                symbol='triangle-up'
-            ),
-            line=dict(
-                color=station_colors[station],
-                dash='dashdot',
-                shape='linear'
-            ),
-            connectgaps=False,
-            opacity=0.7,
-            legendgroup=f'group_{station}'
-        ))
-
-    fig1.update_layout(
-        height=600,
-        showlegend=True,
-        xaxis_title="Time",
-        yaxis_title=f"Energy Consumption ({unit})",
-        hovermode='x unified',
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        title=dict(
-            text=f"Energy Consumption Overview ({resample_period}ly)",
-            y=0.98,
-            x=0.5,
-            xanchor='center',
-            yanchor='top'
-        ),
-        margin=dict(l=50, r=20, t=80, b=20),
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01,
-            bgcolor='rgba(255,255,255,0.8)',
-            groupclick="toggleitem"
-        ),
-        xaxis=dict(
-            type="date"
-        )
-    )
-
-    # Update axes formatting
-    fig1.update_yaxes(
-        gridcolor='rgba(128,128,128,0.1)',
-        zeroline=False,
-        tickformat=",.1f",
-        ticksuffix=f" {unit}"
-    )
-
-    fig1.update_xaxes(gridcolor='rgba(128,128,128,0.1)', zeroline=False)
-
-    # Update hover template
-    fig1.update_traces(
-        hovertemplate="%{y:,.1f} " + unit + "<br>%{x}<extra></extra>"
-    )
+    # Apply resampling and unit conversion
+    resampled_df = overview_frame(tetarom_df, resample_period, unit, data.calendar)
 
-    # Apply the styling
-    fig1 = update_plot_style(fig1)
+    fig1 = overview_figure(resampled_df, resample_period, unit, stations(tetarom_df))
 
-    st.plotly_chart(fig1, use_container_width=True) 
\ No newline at end of file
+    st.plotly_chart(fig1, use_container_width=True)
\ No newline at end of file
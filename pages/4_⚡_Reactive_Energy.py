@@ -1,9 +1,4 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
-from energy_dashboard.utils import load_data, update_plot_style, COLORS
 
 # Set page config
 st.set_page_config(
@@ -18,16 +13,20 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.error("Please log in from the home page to access this content.")
     st.stop()
 
-# Load data outside spinner to make it available for the whole session
-@st.cache_data
-def get_data():
-    return load_data()
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.utils import load_day_options, window_slice
+from energy_dashboard.figures import reactive_frame, ratio_frame, reactive_usage_figure, reactive_ratio_figure, \
+    add_incomplete_overlay, LIMIT_X1, LIMIT_X3
+from energy_dashboard.quality import load_quality, incomplete_ranges
+from energy_dashboard.reactive import RATIO_WINDOWS, load_ratio, load_station_overview
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
 
-tetarom_df = get_data()
+site = site_selector()
+data = data_handle(site)
 
-# Define limits
-limit_x1 = 0.4843  # 48.43%
-limit_x3 = 1.1691  # 116.91%
+# Shared read-only frame, no copy per rerun
+tetarom_df = data.frame
 
 st.header("Reactive Energy Usage")
 
@@ -39,292 +38,71 @@ station = st.segmented_control(
     label_visibility='hidden'
 )
 
-# Wrap the data processing and visualization in the spinner
-with st.spinner('Loading and processing data...'):
-    # Filter data for selected station
-    df = tetarom_df.loc[:, pd.IndexSlice[:, station]].copy().droplevel('location', axis=1)
-    df['EA'] = df['EA+'] - df['EA-']
-    df = df[['EA', 'ER+', 'ER-']]
-
-    # First plot - Reactive Energy Usage
-    fig1 = px.line(df,
-                   title=f"{station} Energy Usage",
-                   template="plotly_white")
-
-    fig1.update_layout(
-        height=500,
-        xaxis_title="Time",
-        yaxis_title="Energy",
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01
-        ),
-        xaxis=dict(
-            type="date"
-        )
-    )
-
-    # Add traces to the rangeslider
-    for column in df.columns:
-        fig1.add_trace(
-            go.Scatter(
-                x=df.index,
-                y=df[column],
-                name=column,
-                showlegend=False,
-                xaxis='x',
-                yaxis='y2'
-            )
-        )
-
-    fig1 = update_plot_style(fig1)
-    # Calculate percentages
-    erpc = pd.DataFrame({
-        'ER+ %age': df['ER+'] / df['EA'],
-        'ER- %age': df['ER-'] / df['EA'],
-        'EA': df['EA']
-    })
-
-    fig2 = make_subplots(specs=[[{"secondary_y": True}]])
-
-    def find_intersection_point(x1, y1, x2, y2, limit):
-        """Find the point where the line crosses the limit"""
-        if pd.isna(y1) or pd.isna(y2):  # Handle NaN values
-            return None
-        
-        if (y1 > limit and y2 < limit) or (y1 < limit and y2 > limit):
-            # Linear interpolation to find exact crossing point
-            try:
-                dx = (x2 - x1).total_seconds()
-                dy = y2 - y1
-                slope = dy / dx
-                dx_intersection = (limit - y1) / slope
-                x_intersection = x1 + pd.Timedelta(seconds=float(dx_intersection))
-                return x_intersection, limit
-            except (ValueError, TypeError):
-                return None
-        return None
-
-    # ER+ line with color segments based on limit
-    erp_segments = []
-    erp_dates = []
-    erp_colors = []
-    current_segment = []
-    current_dates = []
-
-    for i in range(len(erpc.index) - 1):
-        date = erpc.index[i]
-        next_date = erpc.index[i + 1]
-        value = erpc['ER+ %age'].iloc[i]
-        next_value = erpc['ER+ %age'].iloc[i + 1]
-        
-        if pd.isna(value) or pd.isna(next_value):
-            if current_segment:
-                erp_segments.append(current_segment)
-                erp_dates.append(current_dates)
-                erp_colors.append('red' if current_segment[-1] > limit_x1 else COLORS['ER+'])
-                current_segment = []
-                current_dates = []
-            continue
-        
-        if not current_segment:
-            current_segment.append(value)
-            current_dates.append(date)
-        
-        intersection = find_intersection_point(date, value, next_date, next_value, limit_x1)
-        
-        if intersection:
-            # Add the intersection point to current segment and start new segment
-            current_segment.append(limit_x1)
-            current_dates.append(intersection[0])
-            erp_segments.append(current_segment)
-            erp_dates.append(current_dates)
-            erp_colors.append('red' if value > limit_x1 else COLORS['ER+'])
-            
-            # Start new segment from intersection point
-            current_segment = [limit_x1, next_value]
-            current_dates = [intersection[0], next_date]
-        else:
-            current_segment.append(next_value)
-            current_dates.append(next_date)
-
-    if current_segment:
-        erp_segments.append(current_segment)
-        erp_dates.append(current_dates)
-        erp_colors.append('red' if current_segment[-1] > limit_x1 else COLORS['ER+'])
-
-    # ER- line with color segments (similar logic)
-    ern_segments = []
-    ern_dates = []
-    ern_colors = []
-    current_segment = []
-    current_dates = []
-
-    for i in range(len(erpc.index) - 1):
-        date = erpc.index[i]
-        next_date = erpc.index[i + 1]
-        value = erpc['ER- %age'].iloc[i]
-        next_value = erpc['ER- %age'].iloc[i + 1]
-        
-        if pd.isna(value) or pd.isna(next_value):
-            if current_segment:
-                ern_segments.append(current_segment)
-                ern_dates.append(current_dates)
-                ern_colors.append('red' if current_segment[-1] > limit_x1 else COLORS['ER-'])
-                current_segment = []
-                current_dates = []
-            continue
-        
-        if not current_segment:
-            current_segment.append(value)
-            current_dates.append(date)
-        
-        intersection = find_intersection_point(date, value, next_date, next_value, limit_x1)
-        
-        if intersection:
-            # Add the intersection point to current segment and start new segment
-            current_segment.append(limit_x1)
-            current_dates.append(intersection[0])
-            ern_segments.append(current_segment)
-            ern_dates.append(current_dates)
-            ern_colors.append('red' if value > limit_x1 else COLORS['ER-'])
-            
-            # Start new segment from intersection point
-            current_segment = [limit_x1, next_value]
-            current_dates = [intersection[0], next_date]
-        else:
-            current_segment.append(next_value)
-            current_dates.append(next_date)
-
-    if current_segment:
-        ern_segments.append(current_segment)
-        ern_dates.append(current_dates)
-        ern_colors.append('red' if current_segment[-1] > limit_x1 else COLORS['ER-'])
-
-    # Add traces for ER+
-    first_erp = True  # Track first ER+ segment
-    for segment, dates, color in zip(erp_segments, erp_dates, erp_colors):
-        fig2.add_trace(
-            go.Scatter(
-                x=dates,
-                y=segment,
-                name="ER+ %age",
-                line=dict(width=2, color=color),
-                mode='lines',
-                showlegend=first_erp,  # Show legend only for first segment
-                connectgaps=False,
-                hovertemplate="<b>Time</b>: %{x}<br>" +
-                            "<b>ER+ %age</b>: %{y:.4f}<br><extra></extra>"
-            ),
-            secondary_y=False
-        )
-        first_erp = False
-
-    # Add traces for ER-
-    first_ern = True  # Track first ER- segment
-    for segment, dates, color in zip(ern_segments, ern_dates, ern_colors):
-        fig2.add_trace(
-            go.Scatter(
-                x=dates,
-                y=segment,
-                name="ER- %age",
-                line=dict(width=2, color=color),
-                mode='lines',
-                showlegend=first_ern,  # Show legend only for first segment
-                connectgaps=False,
-                hovertemplate="<b>Time</b>: %{x}<br>" +
-                            "<b>ER- %age</b>: %{y:.4f}<br><extra></extra>"
-            ),
-            secondary_y=False
-        )
-        first_ern = False
-
-    # Add EA trace with hover template
-    fig2.add_trace(
-        go.Scatter(
-            x=erpc.index, 
-            y=erpc['EA'], 
-            name="EA", 
-            line=dict(color=COLORS['EA'], width=1), 
-            opacity=0.1,
-            hovertemplate="<b>Time</b>: %{x}<br>" +
-                         "<b>EA</b>: %{y:.4f}<br><extra></extra>"
-        ),
-        secondary_y=True
-    )
-
-    # Add limit lines with names in legend
-    fig2.add_trace(
-        go.Scatter(
-            x=[None],
-            y=[None],
-            name="Limit x1 (0.4843)",
-            line=dict(color="red", dash="dash"),
-            showlegend=True,
-            legendgroup="limits"
-        )
-    )
-    fig2.add_trace(
-        go.Scatter(
-            x=[None],
-            y=[None],
-            name="Limit x3 (1.1691)",
-            line=dict(color="black", dash="dash"),
-            showlegend=True,
-            legendgroup="limits"
-        )
-    )
+# Day list only depends on the dataset, not on the station or the selected window
+day_options = data.derived(load_day_options, site.data_path)
+date_range = st.select_slider(
+    "Select Date Range",
+    options=day_options,
+    value=(day_options[0], day_options[-1]),
+    label_visibility='hidden'
+)
 
-    # Add the actual limit lines (without legend entries)
-    fig2.add_hline(y=limit_x1, line_dash="dash", line_color="red", showlegend=False)
-    fig2.add_hline(y=limit_x3, line_dash="dash", line_color="black", showlegend=False)
+# Billing looks at energy accumulated over a period rather than single intervals
+ratio_window = st.segmented_control(
+    "Ratio over",
+    options=list(RATIO_WINDOWS),
+    default="Interval"
+) or "Interval"
 
-    fig2.update_layout(
-        height=500,
-        title=f"{station} Reactive Energy %age Usage",
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01,
-            title_text="Data Series"
-        ),
-        xaxis=dict(
-            type="date"
-        )
-    )
+# Wrap the data processing and visualization in the spinner
+with st.spinner('Loading and processing data...'):
+    # Only the rows inside the selected window are processed and sent to the browser
+    x_range = (f"{date_range[0]} 00:00:00", f"{date_range[1]} 23:59:59")
+    window = window_slice(tetarom_df.index, *x_range)
 
-    fig2.update_yaxes(title_text="Percentage", secondary_y=False)
-    fig2.update_yaxes(title_text="EA", secondary_y=True)
+    # Filter data for selected station
+    df = reactive_frame(tetarom_df.iloc[window], station)
 
-    fig2 = update_plot_style(fig2)
+    fig1 = reactive_usage_figure(df, station)
 
-    # Replace date_input with slider
-    min_date = pd.Timestamp(df.index.min().normalize().date())  # normalize() sets time to midnight
-    max_date = pd.Timestamp(df.index.max().normalize().date())
-    date_range = st.select_slider(
-        "Select Date Range",
-        options=[d.strftime('%Y-%m-%d') for d in pd.date_range(min_date, max_date, freq='D')],
-        value=(min_date.strftime('%Y-%m-%d'), max_date.strftime('%Y-%m-%d')),
-        label_visibility='hidden'
-    )
+    # Calculate percentages, per interval or over accumulated energy
+    if RATIO_WINDOWS[ratio_window] is None:
+        erpc = ratio_frame(df)
+    else:
+        erpc = load_ratio(station, site.data_path).ratio(RATIO_WINDOWS[ratio_window], *x_range)
+    fig2 = reactive_ratio_figure(erpc, station)
 
-    # Update both figures with the same x-axis range
-    if len(date_range) == 2:  # Only update when both dates are selected
-        fig1.update_layout(
-            xaxis=dict(
-                range=[f"{date_range[0]} 00:00:00", f"{date_range[1]} 23:59:59"]
-            )
-        )
+    # Shade intervals where the station has no complete reading
+    _, complete = data.derived(load_quality, site.data_path)
+    gaps = incomplete_ranges(complete[station].iloc[window_slice(complete.index, *x_range)])
+    add_incomplete_overlay(fig1, gaps)
+    add_incomplete_overlay(fig2, gaps)
 
-        fig2.update_layout(
-            xaxis=dict(
-                range=[f"{date_range[0]} 00:00:00", f"{date_range[1]} 23:59:59"]
-            )
-        )
+    # Pin both x-axes to the full selected days
+    fig1.update_layout(xaxis=dict(range=list(x_range)))
+    fig2.update_layout(xaxis=dict(range=list(x_range)))
 
     # Display plots
     st.plotly_chart(fig1, use_container_width=True)
-    st.plotly_chart(fig2, use_container_width=True) 
\ No newline at end of file
+    st.plotly_chart(fig2, use_container_width=True)
+
+# Whole-dataset summary of every station, computed in parallel and shared by all sessions
+st.subheader("All stations")
+with st.spinner('Summarising all stations...'):
+    overview = data.derived(load_station_overview, site.data_path)
+st.dataframe(
+    overview,
+    use_container_width=True,
+    column_config={
+        'EA MWh': st.column_config.NumberColumn(format="%.1f"),
+        'ER+ / EA': st.column_config.NumberColumn(format="%.4f"),
+        'ER- / EA': st.column_config.NumberColumn(format="%.4f"),
+        'ER+ over x1 %': st.column_config.NumberColumn(format="%.2f"),
+        'ER+ over x3 %': st.column_config.NumberColumn(format="%.2f"),
+        'ER- over x1 %': st.column_config.NumberColumn(format="%.2f"),
+        'ER+ hours over x1': st.column_config.NumberColumn(format="%.1f"),
+        'ER- hours over x1': st.column_config.NumberColumn(format="%.1f"),
+    }
+)
+st.caption(f"Ratios over the whole dataset; intervals and months are compared with limit x1 ({LIMIT_X1}) and x3 ({LIMIT_X3}). "
+           "Excursions are the stretches drawn red on the ratio chart.")
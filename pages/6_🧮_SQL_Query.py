@@ -0,0 +1,51 @@
+import streamlit as st
+
+# Set page config
+st.set_page_config(
+    layout="wide",
+    page_title="SQL Query",
+    initial_sidebar_state="expanded",
+    page_icon="⚡"
+)
+
+# Check authentication
+if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+    st.error("Please log in from the home page to access this content.")
+    st.stop()
+
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.query import run_query, describe_tables, MAX_RESULT_ROWS
+from energy_dashboard.sites import site_selector
+
+site = site_selector()
+
+st.title("SQL Query")
+
+EXAMPLE_QUERY = """SELECT location, date_trunc('month', time) AS month, max("EA+") AS peak_ea
+FROM readings
+WHERE dayofweek(time) BETWEEN 1 AND 5 AND hour(time) BETWEEN 7 AND 21
+GROUP BY ALL
+ORDER BY ALL"""
+
+with st.expander("Available tables"):
+    st.dataframe(describe_tables(site.data_path, site.forecast_path), hide_index=True, use_container_width=True)
+
+query = st.text_area("Query", value=EXAMPLE_QUERY, height=200, label_visibility='hidden')
+
+if st.button("Run query"):
+    with st.spinner('Running query...'):
+        try:
+            result = run_query(query, site.data_path, site.forecast_path)
+        except Exception as e:
+            st.error(f"Query failed: {e}")
+            st.stop()
+
+    if len(result) == MAX_RESULT_ROWS:
+        st.info(f"Showing the first {MAX_RESULT_ROWS:,} rows.")
+    st.dataframe(result, hide_index=True, use_container_width=True)
+    st.download_button(
+        "Download CSV",
+        data=result.to_csv(index=False),
+        file_name="query_result.csv",
+        mime="text/csv"
+    )
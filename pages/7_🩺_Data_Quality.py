@@ -0,0 +1,59 @@
+import streamlit as st
+
+# Set page config
+st.set_page_config(
+    layout="wide",
+    page_title="Data Quality",
+    initial_sidebar_state="expanded",
+    page_icon="⚡"
+)
+
+# Check authentication
+if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+    st.error("Please log in from the home page to access this content.")
+    st.stop()
+
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.quality import load_quality
+from energy_dashboard.figures import completeness_figure
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
+
+site = site_selector()
+data = data_handle(site)
+
+st.title("Data Quality")
+
+with st.spinner('Checking data...'):
+    issues, complete = data.derived(load_quality, site.data_path)
+
+    # Summary by severity
+    counts = issues['severity'].value_counts()
+    cols = st.columns(len(counts) + 1)
+    cols[0].metric("Completeness", f"{complete.to_numpy().mean():.2%}")
+    for col, severity in zip(cols[1:], reversed(counts.index.categories)):
+        col.metric(severity.capitalize(), int(counts.get(severity, 0)))
+
+    st.plotly_chart(completeness_figure(complete), use_container_width=True)
+
+    # Issue table with filters
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        location = st.segmented_control(
+            "Station",
+            options=["All stations"] + list(complete.columns),
+            default="All stations"
+        )
+    with col2:
+        checks = st.multiselect(
+            "Checks",
+            options=sorted(issues.index.get_level_values('check').unique()),
+            default=sorted(issues.index.get_level_values('check').unique())
+        )
+
+    table = issues[issues.index.get_level_values('check').isin(checks)]
+    if location and location != "All stations":
+        # Whole-row issues ('All') affect every station
+        table = table[table.index.get_level_values('location').isin([location, 'All'])]
+
+    st.dataframe(table.reset_index(), hide_index=True, use_container_width=True)
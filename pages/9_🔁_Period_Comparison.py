@@ -0,0 +1,75 @@
+import streamlit as st
+
+# Set page config
+st.set_page_config(
+    layout="wide",
+    page_title="Period Comparison",
+    initial_sidebar_state="expanded",
+    page_icon="⚡"
+)
+
+# Check authentication
+if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+    st.error("Please log in from the home page to access this content.")
+    st.stop()
+
+# Data and plotting modules are only imported once the user is logged in
+from energy_dashboard.compare import PERIOD_KINDS, REFERENCES, load_aligned, load_comparison, \
+    reference_periods, default_period
+from energy_dashboard.figures import comparison_figure
+from energy_dashboard.session import data_handle
+from energy_dashboard.sites import site_selector
+
+site = site_selector()
+data = data_handle(site)
+
+st.title("Period Comparison")
+
+kind = st.segmented_control("Compare", options=PERIOD_KINDS, default="Week") or "Week"
+
+with st.spinner('Loading and processing data...'):
+    periods, cube, present, columns = data.derived(load_aligned, kind, site.data_path)
+    if not len(periods):
+        st.error("No data to compare.")
+        st.stop()
+
+    labels = list(periods.astype(str))
+    default = default_period(periods, present)
+
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        current = st.selectbox(kind, options=labels, index=labels.index(str(default)) if default is not None else len(labels) - 1)
+    current = periods[labels.index(current)]
+    with col2:
+        choices = st.multiselect("Against", options=list(REFERENCES[kind]), default=list(REFERENCES[kind])[:1])
+    with col3:
+        others = st.multiselect("Other periods", options=[label for label in labels if label != str(current)])
+
+    references = reference_periods(periods, current, kind, choices)
+    references += [periods[labels.index(label)] for label in others if periods[labels.index(label)] not in references]
+    if not references:
+        st.info("Select at least one period to compare with.")
+        st.stop()
+
+    result = load_comparison(kind, current, references, site.data_path)
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        measure = st.segmented_control(
+            "Quantity",
+            options=list(columns.get_level_values('measure').unique()),
+            default="EA+"
+        ) or "EA+"
+    with col2:
+        location = st.segmented_control(
+            "Station",
+            options=list(columns.get_level_values('location').unique()),
+            default="Total"
+        ) or "Total"
+
+    st.plotly_chart(comparison_figure(result, measure, location, kind), use_container_width=True)
+
+    # Summary for every station and quantity
+    summary = result['summary']
+    summary = summary.set_axis([f"{reference} {value}".strip() for reference, value in summary.columns], axis=1)
+    st.dataframe(summary.round(1), use_container_width=True)